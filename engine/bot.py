@@ -4,10 +4,12 @@ import pandas as pd
 from typing import Dict, Optional, List
 
 from .data import ensure_dt, resample_ohlcv, fetch_ccxt_hist, fetch_ccxt_hist_range, synthetic_hourly, mintick
-from .indicators import rsi_wilder
-from .divergence import bull_divergence, bear_divergence, valuewhen
-from .filters import dxy_ok, htf_bias, mid_chop, bb_squeeze
+from .divergence import DivergenceStream
+from .htf_gate import htf_gate
+from .indicator_cache import cached_rsi_wilder
+from .filters import dxy_ok
 from .executor import Executor3M
+from .mtf import MTFContext
 
 log = logging.getLogger("engine-bot")
 logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
@@ -62,69 +64,58 @@ class RemixBot:
             if len(m3) < 500:
                 log.info(f"{symbol}: insufficient 3m candles"); continue
 
-            # Build HTF gate on 30m (stateless), forward-fill to LTF (3m)
+            # HTF gate on 30m (stateless), forward-filled to LTF (3m)
             try:
-                htf_tf = "30m"
-                htf = resample_ohlcv(dfh, htf_tf)
-                rsi_len = self.cfg["rsi_length"]; lb_left=self.cfg["lb_left"]; lb_right=self.cfg["lb_right"]
-                range_low=self.cfg["range_low"]; range_up=self.cfg["range_up"]
-                rsi_htf = rsi_wilder(htf["close"], rsi_len).fillna(50)
-                bull_htf = bull_divergence(rsi_htf, htf["low"], lb_left, lb_right, range_low, range_up)
-                cond_htf = (rsi_htf < self.cfg["rsi_oversold"])            
-                idx = np.arange(len(htf), dtype=float)
-                last_true = np.where(cond_htf.values, idx, np.nan)
-                last_true = pd.Series(last_true, index=htf.index).ffill().values
-                bars_since = idx - np.where(np.isnan(last_true), np.inf, last_true)
-                recently_armed_htf = pd.Series(bars_since <= float(self.cfg["max_wait_bars"]), index=htf.index)
-                prev = rsi_htf.shift(1)
-                htf_close_sig = (prev >= self.cfg["rsi_overbought"]) & (rsi_htf < self.cfg["rsi_overbought"])  # crossunder
-                htf_enter_sig = bull_htf & recently_armed_htf
-                # Gate with HTF 20% stop
-                gate_vals = []
-                gate_open = True
-                htf_entry_price = np.nan
-                htf_stop_price = np.nan
-                for j in range(len(htf)):
-                    if gate_open and not np.isnan(htf_stop_price):
-                        if float(htf["low"].iloc[j]) <= float(htf_stop_price):
-                            gate_open = False
-                            htf_entry_price = np.nan
-                            htf_stop_price = np.nan
-                    if bool(htf_close_sig.iloc[j]):
-                        gate_open = False
-                        htf_entry_price = np.nan
-                        htf_stop_price = np.nan
-                    if bool(htf_enter_sig.iloc[j]):
-                        gate_open = True
-                        htf_entry_price = float(htf["close"].iloc[j])
-                        htf_stop_price = htf_entry_price * (1.0 - 0.20)
-                    gate_vals.append(gate_open)
-                gate_htf = pd.Series(gate_vals, index=htf.index)
-                gate_ltf = gate_htf.reindex(m3.index, method="ffill").fillna(True)
+                gate_ltf = htf_gate(dfh, "30m", self.cfg["rsi_length"], self.cfg["rsi_overbought"],
+                                    self.cfg["rsi_oversold"], self.cfg["lb_left"], self.cfg["lb_right"],
+                                    self.cfg["range_low"], self.cfg["range_up"], self.cfg["max_wait_bars"],
+                                    0.20, index=m3.index, symbol=symbol)
             except Exception:
                 gate_ltf = pd.Series(True, index=m3.index)
 
-            for i in range(max(400, self.cfg["lb_left"]+self.cfg["lb_right"]+60), len(m3)):
-                m3_slice = m3.iloc[:i+1]
-                last = m3_slice.iloc[-1]
-                df = dfh[dfh.index <= last.name]
+            # Incremental context: HTF bars/filters follow dfh[dfh.index <= t] and
+            # the 3m divergence stream sees the same bars the prefix would.
+            ctx = MTFContext(dfh, self.cfg["bb_period"], self.cfg["bb_std"],
+                             self.cfg["ema_short"], self.cfg["ema_long"], self.cfg["chop_length"])
+            prefix_rows = dfh.index.searchsorted(m3.index, side="right")
+            # Wilder RSI is causal, so one pass equals re-running it on every prefix
+            rsi3_all = cached_rsi_wilder(m3["close"], self.cfg["rsi_length"],
+                                         symbol=symbol, timeframe="3m").to_numpy(dtype=float)
+            m3_low = m3["low"].to_numpy(dtype=float)
+            m3_high = m3["high"].to_numpy(dtype=float)
+            m3_close = m3["close"].to_numpy(dtype=float)
+            lb_right = int(self.cfg["lb_right"])
+            stream = DivergenceStream(self.cfg["lb_left"], lb_right,
+                                      self.cfg["range_low"], self.cfg["range_up"])
+            gate_ok = gate_ltf.to_numpy(dtype=bool)
+            min_stop_dist = 3.0*mintick(symbol)
+            wave_low = float('nan')
+            start = max(400, self.cfg["lb_left"]+self.cfg["lb_right"]+60)
+
+            for i in range(len(m3)):
+                # Flags of bar i on the prefix m3[:i+1]: a pivot needs `lag` later
+                # bars, so they are only ever set when the stream reports bar i itself.
+                bull = bear = False
+                out = stream.update(rsi3_all[i], m3_low[i], m3_high[i])
+                if out is not None:
+                    j, bull_j, bear_j = out
+                    # valuewhen(bull, low.shift(lb_right), 0) on the prefix
+                    if bull_j and j >= lb_right and not np.isnan(m3_low[j - lb_right]):
+                        wave_low = float(m3_low[j - lb_right])
+                    if j == i:
+                        bull, bear = bull_j, bear_j
+                if i < start:
+                    continue
+
+                ctx.advance(prefix_rows[i])
 
                 # Prefilter: BB squeeze on 1h
-                if not bb_squeeze(resample_ohlcv(df, "1h"), self.cfg["bb_period"], self.cfg["bb_std"]):
+                if not ctx.bb_squeeze():
                     continue
 
                 # Engines
-                bias, bias_conf = htf_bias(df, self.cfg["ema_short"], self.cfg["ema_long"])
-                trad, trad_conf = mid_chop(df, self.cfg["chop_length"])
-
-                # Divergences on 3m
-                rsi3 = rsi_wilder(m3_slice["close"], self.cfg["rsi_length"])
-                bull = bull_divergence(rsi3, m3_slice["low"],
-                                       self.cfg["lb_left"], self.cfg["lb_right"],
-                                       self.cfg["range_low"], self.cfg["range_up"]).iloc[-1]
-                bear = bear_divergence(rsi3, m3_slice["high"],
-                                       self.cfg["lb_left"], self.cfg["lb_right"],
-                                       self.cfg["range_low"], self.cfg["range_up"]).iloc[-1]
+                bias, bias_conf = ctx.htf_bias()
+                trad, trad_conf = ctx.mid_chop()
 
                 # Sizing: percent-of-equity notionally (align with Pine default_qty_type/value)
                 C = 0.5
@@ -134,28 +125,19 @@ class RemixBot:
                     return float(max(0.0, qty)), pct
 
                 # Pine-style stop candidate at this bar: min(last wave low at bull pivot, pct stop)
-                rsi3_full = rsi_wilder(m3["close"].iloc[:i+1], self.cfg["rsi_length"])
-                bull_series = bull_divergence(rsi3_full, m3["low"].iloc[:i+1],
-                                              self.cfg["lb_left"], self.cfg["lb_right"],
-                                              self.cfg["range_low"], self.cfg["range_up"])
-                lowR = m3["low"].iloc[:i+1].shift(self.cfg["lb_right"])
-                try:
-                    wave_low = float(valuewhen(bull_series, lowR, 0).iloc[-1])
-                except Exception:
-                    wave_low = float('nan')
-                entry_price = float(last["close"])
+                entry_price = float(m3_close[i])
                 pct_stop_price = entry_price * (1 - float(self.cfg["pct_stop"]))
                 stop_cand = pct_stop_price if np.isnan(wave_low) else min(wave_low, pct_stop_price)
-                min_allowed = entry_price - 3.0*mintick(symbol)
+                min_allowed = entry_price - min_stop_dist
                 if stop_cand > min_allowed:
                     stop_cand = min_allowed
 
                 evt = self.execs[symbol].on_bar(
                     symbol=symbol,
-                    bar_high=float(last["high"]),
-                    bar_low=float(last["low"]),
-                    bar_close=float(last["close"]),
-                    rsi=float(rsi3.iloc[-1]),
+                    bar_high=float(m3_high[i]),
+                    bar_low=float(m3_low[i]),
+                    bar_close=float(m3_close[i]),
+                    rsi=float(rsi3_all[i]),
                     bullCond=bool(bull),
                     bearCond=bool(bear),
                     bias=bias,
@@ -165,14 +147,15 @@ class RemixBot:
                     stop_candidate=float(stop_cand),
                     equity=self.equity,
                     size_fn=size_fn,
-                    gate_open=bool(gate_ltf.iloc[i])
+                    gate_open=bool(gate_ok[i])
                 )
 
                 if evt:
+                    t = m3.index[i]
                     if evt["type"] == "enter_long":
                         fee = evt["entry"]*evt["qty"]*(self.fee_bps/10_000)
                         self.equity -= fee
-                        self.trades.append({"symbol":symbol, "t":last.name, "type":"enter", "price":evt["entry"], "qty":evt["qty"]})
+                        self.trades.append({"symbol":symbol, "t":t, "type":"enter", "price":evt["entry"], "qty":evt["qty"]})
                         log.info(f"{symbol} ENTER long @{evt['entry']:.2f} stop {evt['stop']:.2f} qty {evt['qty']:.4f} (risk {evt['risk_pct']*100:.2f}%)")
 
                     elif evt["type"] in ("exit_normal","exit_sl"):
@@ -183,7 +166,7 @@ class RemixBot:
                         fee = exit_p*qty*(self.fee_bps/10_000)
                         pnl -= fee
                         self.equity += pnl
-                        self.trades.append({"symbol":symbol, "t":last.name, "type":evt["type"], "price":exit_p, "qty":qty, "pnl":pnl})
+                        self.trades.append({"symbol":symbol, "t":t, "type":evt["type"], "price":exit_p, "qty":qty, "pnl":pnl})
                         log.info(f"{symbol} EXIT {evt['type']} @{exit_p:.2f} PnL {pnl:.2f} | equity {self.equity:.2f}")
 
         return self.report()
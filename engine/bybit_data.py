@@ -142,6 +142,25 @@ def fetch_instruments_all(base_url: Optional[str] = None) -> list[str]:
         return sorted(out)
 
 
+def fetch_instruments_info(category: str = "linear", base_url: Optional[str] = None) -> list[dict]:
+    """Return full Bybit instrument info dicts for a category, paginated (raises on HTTP errors)."""
+    out: list[dict] = []
+    cursor = None
+    while True:
+        params = {"category": category, "limit": 1000}
+        if cursor:
+            params["cursor"] = cursor
+        with _client(base_url) as client:
+            r = client.get("/v5/market/instruments-info", params=params)
+            r.raise_for_status()
+            body = r.json().get("result", {}) or {}
+        out.extend(body.get("list", []) or [])
+        cursor = body.get("nextPageCursor") or body.get("nextpagecursor")
+        if not cursor:
+            break
+    return out
+
+
 def fetch_tickers(category: str = "linear", base_url: Optional[str] = None) -> list[dict]:
     """Return Bybit tickers for a category (linear/spot/etc.)."""
     try:
@@ -0,0 +1,216 @@
+"""
+Columnar Parquet store for OHLCV bars, an alternative to the SQLite tables.
+
+Reading a multi-year 1m/3m range from SQLite goes through fetchall() and
+one Python tuple per bar. Here every (table, symbol, timeframe, month) is
+one Parquet file,
+
+    <root>/<table>/symbol=<symbol, URI-encoded>/timeframe=<tf>/month=YYYY-MM/part.parquet
+
+sorted by ts, and a range read opens only the months it touches, projects
+the requested columns and pushes the ts bounds down to the row groups, so
+the bars arrive as Arrow/NumPy arrays without per-row objects. The tables
+mirror SQLite's `ohlcv` (ts, open, high, low, close, volume) and
+`raw_ohlcv` (ts, open, high, low, close, volume_base, volume_quote,
+is_closed, ingested_at); writes replace bars with the same ts, like
+INSERT OR REPLACE, by rewriting the touched month files atomically.
+
+engine.storage switches to this store with MYSTRIX_OHLCV_BACKEND=parquet
+(default sqlite); the files live under MYSTRIX_PARQUET_ROOT, default
+ohlcv_parquet/ next to data_cache.db. tools/migrate_parquet.py copies an
+existing data_cache.db over. Needs pyarrow.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except Exception:
+    pa = None
+    ds = None
+    pq = None
+
+COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "ohlcv": ("open", "high", "low", "close", "volume"),
+    "raw_ohlcv": ("open", "high", "low", "close", "volume_base", "volume_quote", "is_closed", "ingested_at"),
+}
+
+
+_MAX_MS = 253_402_300_799_999  # 9999-12-31, keeps YYYY-MM names comparable
+
+
+def bars_digest(count: int, first_ts: int, last_ts: int, totals: Iterable[float]) -> Optional[str]:
+    """Fingerprint of a bar range from its count, first/last ts and column totals; None when empty.
+
+    Every bar store computes its data fingerprint here (ParquetStore,
+    SegmentStore and the SQLite query in engine.result_cache), so the same
+    bars give the same digest whatever the backend.
+    """
+    if not count:
+        return None
+    row = (int(count), int(first_ts), int(last_ts), *(float(t) for t in totals))
+    return hashlib.blake2b(repr(row).encode(), digest_size=16).hexdigest()
+
+
+def array_digest(ts: np.ndarray, cols: Dict[str, np.ndarray]) -> Optional[str]:
+    """bars_digest of bars read as (ts, {column: values}) arrays."""
+    if ts.size == 0:
+        return None
+    return bars_digest(ts.size, ts[0], ts[-1], (np.sum(v) for v in cols.values()))
+
+
+_STORES: Dict[Tuple[type, str], object] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def shared_store(cls: type, root: Path):
+    """One shared cls(root) instance (and so one write lock) per resolved root directory."""
+    key = str(Path(root).resolve())
+    with _STORES_LOCK:
+        store = _STORES.get((cls, key))
+        if store is None:
+            store = _STORES[(cls, key)] = cls(Path(key))
+        return store
+
+
+def _month(ts_ms: int) -> str:
+    return str(np.datetime64(min(max(int(ts_ms), 0), _MAX_MS), "ms").astype("datetime64[M]"))
+
+
+def _month_keys(ts: np.ndarray) -> np.ndarray:
+    return ts.astype("datetime64[ms]").astype("datetime64[M]").astype(str)
+
+
+class ParquetStore:
+    def __init__(self, root: Path):
+        if pa is None:
+            raise RuntimeError("pyarrow not installed (needed for the parquet OHLCV backend)")
+        self.root = Path(root)
+        self._lock = threading.Lock()
+
+    def _series_dir(self, table: str, symbol: str, timeframe: str) -> Path:
+        return self.root / table / f"symbol={quote(symbol, safe='')}" / f"timeframe={quote(timeframe, safe='')}"
+
+    def _files(self, table: str, symbol: str, timeframe: str,
+               start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> List[Path]:
+        """Month files overlapping [start_ms, end_ms], oldest first."""
+        base = self._series_dir(table, symbol, timeframe)
+        if not base.is_dir():
+            return []
+        lo = _month(start_ms) if start_ms is not None else ""
+        hi = _month(end_ms) if end_ms is not None else "~"
+        # YYYY-MM names sort chronologically
+        return [f for f in sorted(base.glob("month=*/part.parquet")) if lo <= f.parent.name[len("month="):] <= hi]
+
+    def read(self, table: str, symbol: str, timeframe: str, start_ms: Optional[int] = None,
+             end_ms: Optional[int] = None, columns: Optional[Sequence[str]] = None) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """(ts int64, {column: float64}) for start_ms <= ts <= end_ms, sorted by ts."""
+        cols = list(columns) if columns is not None else list(COLUMNS[table])
+        files = self._files(table, symbol, timeframe, start_ms, end_ms)
+        if not files:
+            return np.empty(0, np.int64), {c: np.empty(0) for c in cols}
+        flt = None
+        if start_ms is not None:
+            flt = ds.field("ts") >= int(start_ms)
+        if end_ms is not None:
+            hi = ds.field("ts") <= int(end_ms)
+            flt = hi if flt is None else flt & hi
+        # files are whole months in order and sorted inside, so the concat is sorted
+        tbl = ds.dataset([str(f) for f in files], format="parquet").to_table(columns=["ts", *cols], filter=flt)
+        ts = tbl.column("ts").to_numpy()
+        return ts, {c: tbl.column(c).to_numpy().astype(np.float64, copy=False) for c in cols}
+
+    def frame(self, table: str, symbol: str, timeframe: str, start_ms: Optional[int] = None,
+              end_ms: Optional[int] = None, columns: Optional[Sequence[str]] = None,
+              index_name: str = "timestamp") -> pd.DataFrame:
+        ts, cols = self.read(table, symbol, timeframe, start_ms, end_ms, columns)
+        idx = pd.DatetimeIndex(ts.astype("datetime64[ms]").astype("datetime64[ns]"), name=index_name)
+        return pd.DataFrame(cols, index=idx)
+
+    def write(self, table: str, symbol: str, timeframe: str, ts: np.ndarray, cols: Dict[str, np.ndarray]) -> int:
+        """Insert or replace bars; returns the number of bars written."""
+        ts = np.asarray(ts, dtype=np.int64)
+        if ts.size == 0:
+            return 0
+        names = COLUMNS[table]
+        new = {c: np.asarray(cols.get(c, np.zeros(ts.size)), dtype=np.float64) for c in names}
+        keys = _month_keys(ts)
+        base = self._series_dir(table, symbol, timeframe)
+        with self._lock:
+            for month in np.unique(keys):
+                sel = keys == month
+                m_ts, m_cols = ts[sel], {c: v[sel] for c, v in new.items()}
+                path = base / f"month={month}" / "part.parquet"
+                if path.exists():
+                    old = pq.read_table(path)
+                    # new rows first, so the stable dedupe keeps them (INSERT OR REPLACE)
+                    m_ts = np.concatenate([m_ts, old.column("ts").to_numpy()])
+                    m_cols = {c: np.concatenate([m_cols[c], old.column(c).to_numpy()]) for c in names}
+                order = np.argsort(m_ts, kind="stable")
+                m_ts = m_ts[order]
+                keep = np.r_[True, m_ts[1:] != m_ts[:-1]]
+                # after a stable sort the first of equal ts is the newest row
+                tbl = pa.table({"ts": m_ts[keep], **{c: m_cols[c][order][keep] for c in names}})
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_name(f".part.{os.getpid()}.{threading.get_ident()}.tmp")
+                pq.write_table(tbl, tmp, compression="zstd", row_group_size=64 * 1024)
+                os.replace(tmp, path)
+        return int(ts.size)
+
+    def write_frame(self, table: str, symbol: str, timeframe: str, df: pd.DataFrame) -> int:
+        if df is None or df.empty:
+            return 0
+        ts = pd.DatetimeIndex(df.index).as_unit("ms").asi8
+        return self.write(table, symbol, timeframe, ts,
+                          {c: df[c].to_numpy(dtype=np.float64) for c in COLUMNS[table] if c in df.columns})
+
+    def bounds(self, table: str, symbol: str, timeframe: str) -> Tuple[Optional[int], Optional[int]]:
+        """(min ts, max ts) from the first and last month's file statistics."""
+        files = self._files(table, symbol, timeframe)
+        if not files:
+            return None, None
+        return self._ts_stats(files[0])[0], self._ts_stats(files[-1])[1]
+
+    @staticmethod
+    def _ts_stats(path: Path) -> Tuple[Optional[int], Optional[int]]:
+        meta = pq.ParquetFile(path).metadata
+        col = meta.schema.names.index("ts")
+        lo = hi = None
+        for g in range(meta.num_row_groups):
+            st = meta.row_group(g).column(col).statistics
+            if st is None or not st.has_min_max:
+                ts = pq.read_table(path, columns=["ts"]).column("ts").to_numpy()
+                return (int(ts.min()), int(ts.max())) if ts.size else (None, None)
+            lo = st.min if lo is None else min(lo, st.min)
+            hi = st.max if hi is None else max(hi, st.max)
+        return lo, hi
+
+    def fingerprint(self, table: str, symbol: str, timeframe: str, start_ms: int, end_ms: int) -> Optional[str]:
+        """Digest of the bars in [start_ms, end_ms] (see bars_digest); None when there are none."""
+        return array_digest(*self.read(table, symbol, timeframe, start_ms, end_ms))
+
+    def series(self, table: str) -> Iterable[Tuple[str, str]]:
+        """(symbol, timeframe) pairs stored for a table."""
+        from urllib.parse import unquote
+
+        base = self.root / table
+        if not base.is_dir():
+            return []
+        return [(unquote(s.name[len("symbol="):]), unquote(t.name[len("timeframe="):]))
+                for s in sorted(base.glob("symbol=*")) for t in sorted(s.glob("timeframe=*"))]
+
+
+def parquet_store(root: Path) -> ParquetStore:
+    """One shared ParquetStore (and write lock) per root directory."""
+    return shared_store(ParquetStore, root)
@@ -3,7 +3,9 @@ import time
 import threading
 import numpy as np
 import pandas as pd
-from typing import Optional
+from typing import Callable, Optional, Union
+
+from .compact import CompactOHLCV
 
 try:
     import ccxt
@@ -35,21 +37,33 @@ def ensure_dt(df: pd.DataFrame) -> pd.DataFrame:
         df.index = pd.to_datetime(df.index)
     return df
 
+# Use modern frequency aliases to avoid deprecation warnings
+_RULEMAP = {
+    "1w": "W",
+    "1d": "D",
+    "4h": "4h",
+    "1h": "1h",
+    "30m": "30min",
+    "15m": "15min",
+    "5m": "5min",
+    "3m": "3min",
+}
+
+
+def resample_rule(tf: str) -> str:
+    return _RULEMAP.get(tf, "H")
+
+
 def resample_ohlcv(df: pd.DataFrame, tf: str) -> pd.DataFrame:
-    # Use modern frequency aliases to avoid deprecation warnings
-    rulemap = {
-        "1w": "W",
-        "1d": "D",
-        "4h": "4h",
-        "1h": "1h",
-        "30m": "30min",
-        "15m": "15min",
-        "5m": "5min",
-        "3m": "3min",
-    }
-    rule = rulemap.get(tf, "H")
     agg = {"open":"first","high":"max","low":"min","close":"last","volume":"sum"}
-    return df.resample(rule).agg(agg).dropna()
+    return df.resample(resample_rule(tf)).agg(agg).dropna()
+
+
+def bar_ids(index: pd.DatetimeIndex, tf: str) -> np.ndarray:
+    """Position of each row's resample_ohlcv(tf) bar (0-based, empty bins skipped)."""
+    pos = pd.Series(np.arange(len(index), dtype=np.int64), index=index)
+    first = pos.resample(resample_rule(tf)).first().dropna().to_numpy(dtype=np.int64)
+    return np.searchsorted(first, np.arange(len(index)), side="right") - 1
 
 def fetch_ccxt_hist(symbol: str, timeframe="1h", since_ms: Optional[int]=None) -> pd.DataFrame:
     if ccxt is None:
@@ -61,9 +75,12 @@ def fetch_ccxt_hist(symbol: str, timeframe="1h", since_ms: Optional[int]=None) -
     df = df.set_index("timestamp")
     return df.astype(float)
 
-def fetch_ccxt_hist_range(symbol: str, timeframe: str, start: str, end: str) -> pd.DataFrame:
+def fetch_ccxt_hist_range(symbol: str, timeframe: str, start: str, end: str, compact: bool = False,
+                          progress: Optional[Callable[[int, int], None]] = None) -> Union[pd.DataFrame, CompactOHLCV]:
     """Fetch OHLCV across a custom time range by paging exchange API.
-    Returns DataFrame indexed by timestamp with columns open, high, low, close, volume.
+    Returns DataFrame indexed by timestamp with columns open, high, low, close, volume,
+    or a float32 CompactOHLCV (engine.compact) when compact=True.
+    progress(pages_done, pages_expected) is called after every page.
     """
     if ccxt is None:
         raise RuntimeError("ccxt not installed")
@@ -74,11 +91,16 @@ def fetch_ccxt_hist_range(symbol: str, timeframe: str, start: str, end: str) ->
     end_ms = int(end_dt.timestamp() * 1000)
     all_rows = []
     limit = 1000
+    pages = 0
+    expected = max(1, -(-(end_ms - since) // (ex.parse_timeframe(timeframe) * 1000 * limit)))
     while True:
         data = ex.fetch_ohlcv(symbol, timeframe=timeframe, since=since, limit=limit)
         if not data:
             break
         all_rows.extend(data)
+        pages += 1
+        if progress is not None:
+            progress(pages, max(expected, pages))
         last_ts = data[-1][0]
         # advance by one interval to avoid duplicates
         if last_ts >= end_ms:
@@ -89,6 +111,9 @@ def fetch_ccxt_hist_range(symbol: str, timeframe: str, start: str, end: str) ->
         # safety cap to prevent infinite loops
         if len(all_rows) > 1_000_000:
             break
+    if compact:
+        out = CompactOHLCV.from_rows(all_rows, ["open","high","low","close","volume"])
+        return out.between(int(start_dt.timestamp() * 1000), int(end_dt.timestamp() * 1000))
     if not all_rows:
         return pd.DataFrame(columns=["open","high","low","close","volume"], index=pd.to_datetime([]))
     df = pd.DataFrame(all_rows, columns=["timestamp","open","high","low","close","volume"])
@@ -138,40 +163,18 @@ def synthetic_hourly(start: str, end: str, seed: Optional[int] = None) -> pd.Dat
     return df
 
 def mintick(symbol: str) -> float:
+    """Price tick for symbol from the local instrument store.
+
+    No network once the store holds the exchange; on a fresh store the first
+    call loads it (blocking). 0.01 only when the exchange does not list the
+    symbol or cannot be reached, as before the store existed.
+    """
     try:
-        ex = _get_exchange()
-        market = None
-        try:
-            market = ex.market(symbol)
-        except Exception:
-            try:
-                ex.load_markets()
-                market = ex.market(symbol)
-            except Exception:
-                market = None
-        if market:
-            info = market.get("info", {})
-            for key in ("tickSize", "tick_size", "minPrice", "min_price"):
-                if key in info:
-                    try:
-                        return float(info[key])
-                    except Exception:
-                        pass
-            precision = (market.get("precision") or {}).get("price")
-            if precision is not None:
-                try:
-                    return 10 ** (-int(precision))
-                except Exception:
-                    try:
-                        return 10 ** (-float(precision))
-                    except Exception:
-                        pass
-            limits = (market.get("limits") or {}).get("price") or {}
-            if limits.get("min") is not None:
-                try:
-                    return float(limits["min"])
-                except Exception:
-                    pass
+        from .instruments import instrument_store
+
+        inst = instrument_store.get("binance", symbol, wait=True)
+        if inst is not None and inst.tick_size is not None:
+            return float(inst.tick_size)
     except Exception:
         pass
     return 0.01
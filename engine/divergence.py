@@ -1,14 +1,87 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import NamedTuple
+
 import numpy as np
 import pandas as pd
 
+def _window_extrema(x: np.ndarray, win: int, fn) -> np.ndarray:
+    """fn-extremum (np.minimum / np.maximum) of every length-`win` window of x.
+
+    van Herk / Gil-Werman: split x into blocks of `win`, take running
+    extrema forward and backward inside each block, and combine the two at
+    the ends of each window. Linear time, independent of `win`.
+    """
+    n = x.size
+    m = n - win + 1
+    pad = (-n) % win
+    fill = np.inf if fn is np.minimum else -np.inf
+    blocks = np.concatenate([x, np.full(pad, fill)]).reshape(-1, win)
+    fwd = fn.accumulate(blocks, axis=1).ravel()
+    bwd = fn.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    return fn(bwd[:m], fwd[win - 1:win - 1 + m])
+
+
+def pivot_masks(values, left: int, right: int, low: bool = True,
+                high: bool = True) -> tuple[np.ndarray | None, np.ndarray | None]:
+    """Pivot-low and pivot-high masks of a 1-D array in one call.
+
+    Same flags as pivot_low/pivot_high (including ties, which mark every
+    bar equal to the window extremum, and windows with a NaN or inf, which
+    never mark). Masks not asked for come back as None.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    n = x.size
+    win = int(left) + int(right) + 1
+    m = n - win + 1
+    out_low = np.zeros(n, dtype=bool) if low else None
+    out_high = np.zeros(n, dtype=bool) if high else None
+    if m <= 0:
+        return out_low, out_high
+    # rolling(center=True) window of start s is centred on s + win // 2, and
+    # the result is shifted back by `right` bars
+    off = win // 2 - int(right)
+    s0, s1 = max(0, -off), min(m, n - off)
+    if s1 <= s0:
+        return out_low, out_high
+    bad = ~np.isfinite(x)
+    nbad = np.r_[0, np.cumsum(bad)]
+    clean = (nbad[win:] - nbad[:m]) == 0
+    centre = x[win // 2:win // 2 + m]
+    if low:
+        mn = _window_extrema(np.where(bad, np.inf, x), win, np.minimum)
+        out_low[s0 + off:s1 + off] = (clean & (centre == mn))[s0:s1]
+    if high:
+        mx = _window_extrema(np.where(bad, -np.inf, x), win, np.maximum)
+        out_high[s0 + off:s1 + off] = (clean & (centre == mx))[s0:s1]
+    return out_low, out_high
+
+
+def pivots(series: pd.Series, left: int, right: int) -> tuple[pd.Series, pd.Series]:
+    """(pivot_low, pivot_high) of a series from one pivot_masks() call."""
+    low, high = pivot_masks(series.to_numpy(dtype=float), left, right)
+    return pd.Series(low, index=series.index), pd.Series(high, index=series.index)
+
+
 def pivot_low(series: pd.Series, left: int, right: int) -> pd.Series:
+    low, _ = pivot_masks(series.to_numpy(dtype=float), left, right, high=False)
+    return pd.Series(low, index=series.index)
+
+def pivot_high(series: pd.Series, left: int, right: int) -> pd.Series:
+    _, high = pivot_masks(series.to_numpy(dtype=float), left, right, low=False)
+    return pd.Series(high, index=series.index)
+
+def pivot_low_rolling(series: pd.Series, left: int, right: int) -> pd.Series:
+    """Reference pandas implementation of pivot_low (kept for parity checks)."""
     win = left + right + 1
     rolled = series.rolling(win, center=True)
     is_min = series.eq(rolled.min())
     # Use nullable boolean during fill to avoid FutureWarning
     return is_min.shift(-right).astype('boolean').fillna(False).astype(bool)
 
-def pivot_high(series: pd.Series, left: int, right: int) -> pd.Series:
+def pivot_high_rolling(series: pd.Series, left: int, right: int) -> pd.Series:
+    """Reference pandas implementation of pivot_high (kept for parity checks)."""
     win = left + right + 1
     rolled = series.rolling(win, center=True)
     is_max = series.eq(rolled.max())
@@ -19,11 +92,113 @@ def valuewhen(cond: pd.Series, values: pd.Series, occurrence:int) -> pd.Series:
     out = values.where(cond).groupby(idx).transform("last").shift(occurrence)
     return out.ffill()
 
+def _shift(x: np.ndarray, k: int) -> np.ndarray:
+    """x.shift(k) for k >= 0 on a float array."""
+    if k == 0:
+        return x
+    out = np.full(x.shape, np.nan)
+    out[k:] = x[:-k] if k < x.size else out[k:]
+    return out
+
+
+def _prev_value(mask: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """valuewhen(mask, values, 1): last non-NaN value at a mask bar before each bar."""
+    keep = mask & ~np.isnan(values)
+    pos = np.where(keep, np.arange(values.size), -1)
+    pos = np.r_[-1, np.maximum.accumulate(pos)[:-1]] if values.size else pos
+    return np.where(pos >= 0, values[np.maximum(pos, 0)], np.nan)
+
+
+def _divergence_side(rsi_r: np.ndarray, price_r: np.ndarray, pivot: np.ndarray,
+                     range_low: int, range_up: int, bull: bool) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Divergence mask plus the previous pivot's RSI and price for one side."""
+    prev_rsi = _prev_value(pivot, rsi_r)
+    prev_price = _prev_value(pivot, price_r)
+    with np.errstate(invalid="ignore"):
+        if bull:
+            cond = (rsi_r > prev_rsi) & (price_r < prev_price)
+        else:
+            cond = (rsi_r < prev_rsi) & (price_r > prev_price)
+    # bars since the last pivot before this bar (counted as if one sat at -2)
+    idx = np.arange(pivot.size)
+    last = np.r_[-2, np.maximum.accumulate(np.where(pivot, idx, -2))[:-1]] if pivot.size else idx
+    since = idx - last - 1
+    in_range = (since >= range_low) & (since <= range_up)
+    return pivot & cond & in_range, prev_rsi, prev_price
+
+
+class Divergences(NamedTuple):
+    """Bull and bear divergences with the pivots they were built from.
+
+    prev_* are valuewhen(pivot, x.shift(right), 1): the RSI/price of the
+    last pivot before each bar. *_pivots are the bar positions of the pivots.
+    """
+    bull: pd.Series
+    bear: pd.Series
+    pivot_low: pd.Series
+    pivot_high: pd.Series
+    prev_low_rsi: pd.Series
+    prev_low: pd.Series
+    prev_high_rsi: pd.Series
+    prev_high: pd.Series
+    low_pivots: np.ndarray
+    high_pivots: np.ndarray
+
+
+def divergences(rsi: pd.Series, low: pd.Series, high: pd.Series,
+                left: int, right: int, range_low: int, range_up: int) -> Divergences:
+    """bull_divergence and bear_divergence in one sweep over NumPy arrays.
+
+    The RSI shift and the pivot windows are shared by both sides; the masks
+    equal the two separate calls.
+    """
+    left, right = int(left), int(right)
+    r = rsi.to_numpy(dtype=float)
+    pl, ph = pivot_masks(r, left, right)
+    rsi_r = _shift(r, right)
+    bull, prev_low_rsi, prev_low = _divergence_side(
+        rsi_r, _shift(low.to_numpy(dtype=float), right), pl, range_low, range_up, True)
+    bear, prev_high_rsi, prev_high = _divergence_side(
+        rsi_r, _shift(high.to_numpy(dtype=float), right), ph, range_low, range_up, False)
+    idx = rsi.index
+    return Divergences(
+        bull=pd.Series(bull, index=idx),
+        bear=pd.Series(bear, index=idx),
+        pivot_low=pd.Series(pl, index=idx),
+        pivot_high=pd.Series(ph, index=idx),
+        prev_low_rsi=pd.Series(prev_low_rsi, index=idx),
+        prev_low=pd.Series(prev_low, index=idx),
+        prev_high_rsi=pd.Series(prev_high_rsi, index=idx),
+        prev_high=pd.Series(prev_high, index=idx),
+        low_pivots=np.flatnonzero(pl),
+        high_pivots=np.flatnonzero(ph),
+    )
+
+
 def bull_divergence(rsi: pd.Series, low: pd.Series,
                     left: int, right: int,
                     range_low: int, range_up: int) -> pd.Series:
+    r = rsi.to_numpy(dtype=float)
+    pl, _ = pivot_masks(r, left, right, high=False)
+    bull, _, _ = _divergence_side(_shift(r, int(right)), _shift(low.to_numpy(dtype=float), int(right)),
+                                  pl, range_low, range_up, True)
+    return pd.Series(bull, index=rsi.index)
+
+def bear_divergence(rsi: pd.Series, high: pd.Series,
+                    left: int, right: int,
+                    range_low: int, range_up: int) -> pd.Series:
+    r = rsi.to_numpy(dtype=float)
+    _, ph = pivot_masks(r, left, right, low=False)
+    bear, _, _ = _divergence_side(_shift(r, int(right)), _shift(high.to_numpy(dtype=float), int(right)),
+                                  ph, range_low, range_up, False)
+    return pd.Series(bear, index=rsi.index)
+
+def bull_divergence_pandas(rsi: pd.Series, low: pd.Series,
+                           left: int, right: int,
+                           range_low: int, range_up: int) -> pd.Series:
+    """Reference pandas implementation of bull_divergence (kept for parity checks)."""
     rsiR = rsi.shift(right)
-    pl = pivot_low(rsi, left, right)
+    pl = pivot_low_rolling(rsi, left, right)
     prev_rsiR = valuewhen(pl, rsiR, 1)
     lowR = low.shift(right)
     prev_lowR = valuewhen(pl, lowR, 1)
@@ -34,11 +209,12 @@ def bull_divergence(rsi: pd.Series, low: pd.Series,
     in_range = bars_since_prev.between(range_low, range_up)
     return (pl & rsiHL & priceLL & in_range).fillna(False)
 
-def bear_divergence(rsi: pd.Series, high: pd.Series,
-                    left: int, right: int,
-                    range_low: int, range_up: int) -> pd.Series:
+def bear_divergence_pandas(rsi: pd.Series, high: pd.Series,
+                           left: int, right: int,
+                           range_low: int, range_up: int) -> pd.Series:
+    """Reference pandas implementation of bear_divergence (kept for parity checks)."""
     rsiR = rsi.shift(right)
-    ph = pivot_high(rsi, left, right)
+    ph = pivot_high_rolling(rsi, left, right)
     prev_rsiR = valuewhen(ph, rsiR, 1)
     highR = high.shift(right)
     prev_highR = valuewhen(ph, highR, 1)
@@ -48,3 +224,161 @@ def bear_divergence(rsi: pd.Series, high: pd.Series,
     bars_since_prev = (~prev_ph).astype(int).groupby(prev_ph.cumsum().fillna(0)).cumsum()
     in_range = bars_since_prev.between(range_low, range_up)
     return (ph & rsiLH & priceHH & in_range).fillna(False)
+
+def wave_levels(bull: pd.Series, bear: pd.Series, low: pd.Series, high: pd.Series,
+                right: int) -> tuple[pd.Series, pd.Series]:
+    """Last pivot low at a bull divergence and last pivot high at a bear divergence.
+
+    Same values as valuewhen(bull, low.shift(right), 0) and
+    valuewhen(bear, high.shift(right), 0), built in one forward fill each so
+    engines can index them per entry instead of re-running valuewhen.
+    """
+    wave_low = low.shift(right).where(bull).ffill()
+    wave_high = high.shift(right).where(bear).ffill()
+    return wave_low, wave_high
+
+
+def confirmation_lag(left: int, right: int) -> int:
+    """Bars after bar i that bull/bear_divergence read to flag bar i.
+
+    A prefix ending at bar i + lag already gives bar i its final flag; the
+    last `lag` bars of any batch run are always False.
+    """
+    win = int(left) + int(right) + 1
+    return int(right) + (win - 1) - win // 2
+
+
+class DivergenceStream:
+    """Bar-at-a-time bull/bear divergence detector.
+
+    Feeds one (rsi, low, high) bar per update() and keeps only what the batch
+    functions need: a ring buffer of the last few bars, monotonic deques for
+    the pivot window min/max, and the previous pivot's RSI/price. Every update
+    is O(1) amortized.
+
+    pivot_low/pivot_high confirm a pivot using bars after it, so the flags of
+    bar i are final only once bar i + lag has arrived. update() therefore
+    returns (i, bull, bear) for bar i = bars_seen - 1 - lag, or None while
+    fewer than lag + 1 bars were seen. The emitted flags are identical to
+    bull_divergence/bear_divergence over the full series (the last `lag` bars
+    of a batch run are always False there).
+
+    state()/from_state() round-trip through plain JSON types so the detector
+    can be persisted per symbol and resumed without a warm-up fetch.
+    """
+
+    def __init__(self, left: int, right: int, range_low: int, range_up: int):
+        self.left = int(left)
+        self.right = int(right)
+        self.range_low = int(range_low)
+        self.range_up = int(range_up)
+        self.win = self.left + self.right + 1
+        self.half = self.win // 2  # rolling(center=True) puts win // 2 bars before the center
+        self.lag = confirmation_lag(self.left, self.right)
+        self._size = max(self.win, self.lag + self.right + 1)
+        self.k = -1  # index of the last bar fed
+        self._rsi = deque(maxlen=self._size)
+        self._low = deque(maxlen=self._size)
+        self._high = deque(maxlen=self._size)
+        self._min_q: deque = deque()  # bar indices, rsi increasing
+        self._max_q: deque = deque()  # bar indices, rsi decreasing
+        self._last_nan = -1
+        # previous pivot state (valuewhen(..., 1) keeps the last non-NaN value)
+        self._pl_last = -1
+        self._pl_rsi = np.nan
+        self._pl_low = np.nan
+        self._ph_last = -1
+        self._ph_rsi = np.nan
+        self._ph_high = np.nan
+
+    def _at(self, buf: deque, idx: int) -> float:
+        return buf[idx - (self.k - len(buf) + 1)]
+
+    def update(self, rsi: float, low: float, high: float):
+        rsi = float(rsi); low = float(low); high = float(high)
+        self.k += 1
+        k = self.k
+        self._rsi.append(rsi)
+        self._low.append(low)
+        self._high.append(high)
+        start = k - self.win + 1
+        if np.isnan(rsi):
+            self._last_nan = k
+        else:
+            while self._min_q and self._at(self._rsi, self._min_q[-1]) >= rsi:
+                self._min_q.pop()
+            self._min_q.append(k)
+            while self._max_q and self._at(self._rsi, self._max_q[-1]) <= rsi:
+                self._max_q.pop()
+            self._max_q.append(k)
+        while self._min_q and self._min_q[0] < start:
+            self._min_q.popleft()
+        while self._max_q and self._max_q[0] < start:
+            self._max_q.popleft()
+
+        i = k - self.lag
+        if i < 0:
+            return None
+        is_pl = is_ph = False
+        if start >= 0 and self._last_nan < start and self._min_q:
+            center = self._at(self._rsi, start + self.half)
+            is_pl = center == self._at(self._rsi, self._min_q[0])
+            is_ph = center == self._at(self._rsi, self._max_q[0])
+        src = i - self.right
+        if src >= 0:
+            rsiR = self._at(self._rsi, src)
+            lowR = self._at(self._low, src)
+            highR = self._at(self._high, src)
+        else:
+            rsiR = lowR = highR = np.nan
+
+        bull = bear = False
+        if is_pl:
+            since = i - self._pl_last - 1 if self._pl_last >= 0 else i + 1
+            bull = (rsiR > self._pl_rsi) and (lowR < self._pl_low) and (self.range_low <= since <= self.range_up)
+            self._pl_last = i
+            if not np.isnan(rsiR):
+                self._pl_rsi = rsiR
+            if not np.isnan(lowR):
+                self._pl_low = lowR
+        if is_ph:
+            since = i - self._ph_last - 1 if self._ph_last >= 0 else i + 1
+            bear = (rsiR < self._ph_rsi) and (highR > self._ph_high) and (self.range_low <= since <= self.range_up)
+            self._ph_last = i
+            if not np.isnan(rsiR):
+                self._ph_rsi = rsiR
+            if not np.isnan(highR):
+                self._ph_high = highR
+        return i, bool(bull), bool(bear)
+
+    def state(self) -> dict:
+        def _f(x):
+            return None if np.isnan(x) else float(x)
+        return {
+            "params": [self.left, self.right, self.range_low, self.range_up],
+            "k": self.k,
+            "rsi": [_f(x) for x in self._rsi],
+            "low": [_f(x) for x in self._low],
+            "high": [_f(x) for x in self._high],
+            "min_q": list(self._min_q),
+            "max_q": list(self._max_q),
+            "last_nan": self._last_nan,
+            "pl": [self._pl_last, _f(self._pl_rsi), _f(self._pl_low)],
+            "ph": [self._ph_last, _f(self._ph_rsi), _f(self._ph_high)],
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "DivergenceStream":
+        def _f(x):
+            return np.nan if x is None else float(x)
+        obj = cls(*state["params"])
+        obj.k = int(state["k"])
+        obj._rsi.extend(_f(x) for x in state["rsi"])
+        obj._low.extend(_f(x) for x in state["low"])
+        obj._high.extend(_f(x) for x in state["high"])
+        obj._min_q.extend(int(x) for x in state["min_q"])
+        obj._max_q.extend(int(x) for x in state["max_q"])
+        obj._last_nan = int(state["last_nan"])
+        obj._pl_last, obj._pl_rsi, obj._pl_low = int(state["pl"][0]), _f(state["pl"][1]), _f(state["pl"][2])
+        obj._ph_last, obj._ph_rsi, obj._ph_high = int(state["ph"][0]), _f(state["ph"][1]), _f(state["ph"][2])
+        return obj
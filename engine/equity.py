@@ -0,0 +1,100 @@
+"""
+Per-bar mark-to-market equity from a TradeLog.
+
+The engines track equity only when a trade closes, so a drawdown inside an
+open trade never shows up in their curves. mark_to_market() rebuilds the
+equity at every bar close from the trade events instead of tracking it in
+the bar loop:
+
+    position[i] = signed quantity held after bar i (entries add, exits remove)
+    cost[i]     = entry value of that position
+    cash[i]     = initial capital + realized P&L - entry fees up to bar i
+    equity[i]   = cash[i] + position[i] * close[i] - cost[i]
+
+Each of the three is a cumulative sum of per-bar event totals (np.bincount),
+so the whole curve costs a few array passes. At bars where the book is flat
+it equals the engine's own equity (to float rounding); open positions are
+marked at the close without the exit fee.
+"""
+from __future__ import annotations
+
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from .kernels import EV_ENTER, EV_EXIT_HALF_TP
+from .tradelog import TradeLog
+
+
+class EquitySeries(NamedTuple):
+    """Equity points as parallel arrays: epoch milliseconds and equity."""
+    t_ms: np.ndarray   # int64
+    equity: np.ndarray # float64
+
+    def __len__(self) -> int:  # number of points, not tuple fields
+        return int(self.t_ms.shape[0])
+
+
+def _signed_qty(trades: TradeLog, side: str) -> np.ndarray:
+    if trades.side is not None:
+        sign = 1.0 - 2.0 * trades.side  # SIDES = ("long", "short")
+    else:
+        sign = np.full(len(trades), 1.0 if side == "long" else -1.0)
+    return np.where(trades.type == EV_ENTER, 1.0, -1.0) * sign * trades.qty
+
+
+def _entry_price(trades: TradeLog) -> np.ndarray:
+    """Entry price of the position each event belongs to."""
+    enter = trades.type == EV_ENTER
+    pos = np.arange(len(trades))
+    sides = [None] if trades.side is None else np.unique(trades.side)
+    out = np.empty(len(trades))
+    for s in sides:
+        mask = np.ones(len(trades), dtype=bool) if s is None else trades.side == s
+        last = np.maximum.accumulate(np.where(enter & mask, pos, 0))
+        out[mask] = trades.price[last[mask]]
+    return out
+
+
+def mark_to_market(trades: TradeLog, df: pd.DataFrame, initial_capital: float, fee_bps: float,
+                   side: str = "long") -> EquitySeries:
+    """Equity at every bar close of df; side is used when trades has no side column."""
+    n = len(df)
+    t_ms = pd.DatetimeIndex(df.index).as_unit("ms").asi8
+    close = df["close"].to_numpy(dtype=np.float64)
+    if len(trades) == 0 or n == 0:
+        return EquitySeries(t_ms, np.full(n, float(initial_capital)))
+    bars = np.searchsorted(t_ms, trades.t_ms)
+    enter = trades.type == EV_ENTER
+    dq = _signed_qty(trades, side)
+    # entry fees are charged when the position opens; exits book their pnl
+    cash = np.where(enter, -trades.price * trades.qty * (fee_bps / 10_000.0), trades.pnl)
+    opened = np.where(enter, 1, np.where(trades.type == EV_EXIT_HALF_TP, 0, -1))
+    position = np.cumsum(np.bincount(bars, dq, minlength=n))
+    cost = np.cumsum(np.bincount(bars, dq * _entry_price(trades), minlength=n))
+    open_count = np.cumsum(np.bincount(bars, opened, minlength=n))
+    equity = float(initial_capital) + np.cumsum(np.bincount(bars, cash, minlength=n))
+    # flat bars carry no unrealized term (drops cumsum residue)
+    equity += np.where(open_count > 0, position * close - cost, 0.0)
+    return EquitySeries(t_ms, equity)
+
+
+def max_drawdown_pct(equity: np.ndarray) -> float:
+    """Largest peak-to-trough fall of an equity array, in percent (<= 0)."""
+    if len(equity) == 0:
+        return 0.0
+    dd = equity / np.maximum.accumulate(equity) - 1.0
+    return float(min(0.0, dd.min() * 100.0))
+
+
+def downsample(series: EquitySeries, max_points: Optional[int]) -> EquitySeries:
+    """At most max_points evenly strided points, always keeping the last one."""
+    n = len(series)
+    if max_points is None or n <= max_points:
+        return series
+    if max_points <= 0:
+        return EquitySeries(series.t_ms[:0], series.equity[:0])
+    step = -(-n // max_points)
+    keep = np.arange(n - 1, -1, -step)[::-1]
+    return EquitySeries(series.t_ms[keep], series.equity[keep])
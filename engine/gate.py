@@ -6,18 +6,32 @@ Composite score = 0.7 * vroc_pct + 0.3 * checks, where checks aggregates
 placeholder features (RSI, momentum, liquidity).
 
 Persist the latest ranked list in derived_info['gate_snapshot'].
+
+With incremental=True (or MYSTRIX_GATE_INCREMENTAL=1) a symbol's closed 8h
+bars go once into an IndicatorSet persisted per (symbol, base_tf), and each
+scan reads only the raw bars of the 8h bar still forming (plus any closed
+since the last scan) and peeks at it. The rows equal the full re-derivation
+as long as already-closed 8h bars are not rewritten afterwards.
 """
 from __future__ import annotations
 
 import json
-from dataclasses import dataclass
-from typing import List, Dict
+import os
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional
 
 import numpy as np
 import pandas as pd
 
 from .storage import raw_ohlcv, resample, save_derived, load_derived
-from .indicators import rsi_wilder
+from .indicator_cache import cached_rsi_wilder
+from .indicator_state import IndicatorSet
+
+_BUCKET_MS = 8 * 3600 * 1000
+
+
+def _incremental_default() -> bool:
+    return os.environ.get("MYSTRIX_GATE_INCREMENTAL", "").strip().lower() in ("1", "true", "yes", "on")
 
 
 @dataclass
@@ -33,17 +47,60 @@ class GateConfig:
     w_mom: float = 0.25
     w_greed: float = 0.15
     w_hype: float = 0.15
+    incremental: bool = field(default_factory=_incremental_default)
 
 
 class GateScanner:
     def __init__(self, cfg: GateConfig | None = None):
         self.cfg = cfg or GateConfig()
 
+    def _spec(self) -> Dict[str, tuple]:
+        return {
+            "rsi": ("rsi", 14),
+            "vol_ema": ("ema", max(1, int(self.cfg.vroc_span)), "volume_quote"),
+            "mom": ("mom", 8),
+            "mom_range": ("extent", "mom", 0.0),
+        }
+
+    def _scan_incremental(self, sym: str, base_tf: str) -> Optional[Dict]:
+        """The symbol's row from its persisted 8h state plus the bars since (None if too short)."""
+        ind = IndicatorSet.load(sym, f"8h:{base_tf}", self._spec())
+        # the bucket after the last committed one starts the unseen part
+        start = None if ind.last_ts is None else ind.last_ts + _BUCKET_MS
+        d8 = resample(raw_ohlcv(sym, base_tf, start_ms=start), "8H")
+        if d8.empty:
+            return None
+        # every bucket but the last is closed and committed; the last one is peeked
+        if len(d8) > 1:
+            ind.catch_up(d8.iloc[:-1])
+            ind.save()
+        if ind.bars + 1 < 20:
+            return None
+        last = d8.iloc[-1]
+        cur = ind.peek({c: float(last[c]) for c in ("high", "low", "close", "volume_quote")})
+        vol = float(last["volume_quote"])
+        ema = cur["vol_ema"]
+        vroc_raw = vol / ema - 1.0 if ema != 0 else np.nan
+        vroc_raw = 0.0 if vroc_raw != vroc_raw else vroc_raw
+        rsi = cur["rsi"] if cur["rsi"] == cur["rsi"] else 50.0
+        rsi_q = 1 - np.minimum(1.0, np.abs(rsi - 50) / 50)
+        mom = cur["mom"] if cur["mom"] == cur["mom"] else 0.0
+        lo, hi = cur["mom_range_min"], cur["mom_range_max"]
+        mom_q = (mom - lo) / (hi - lo + 1e-9)
+        return {"vroc_raw": float(vroc_raw), "rsi_q": float(rsi_q), "mom_q": float(mom_q),
+                "ts": int(d8.index[-1].timestamp() * 1000)}
+
     def scan(self, symbols: List[str], base_tf: str = "1h") -> List[Dict]:
         rows = []
         base_tf = base_tf or self.cfg.base_tf
         # Build 8H bars from RAW base timeframe
         for sym in symbols:
+            if self.cfg.incremental:
+                part = self._scan_incremental(sym, base_tf)
+                if part is not None:
+                    rows.append({"symbol": sym, "vroc_raw": part["vroc_raw"],
+                                 "checks": self._checks(part["rsi_q"], part["mom_q"]), "ts": part["ts"]})
+                continue
             df = raw_ohlcv(sym, base_tf)
             if df.empty:
                 continue
@@ -55,25 +112,14 @@ class GateScanner:
             vroc_raw = (vol / ema.replace(0, np.nan)) - 1.0
             vroc_raw = vroc_raw.fillna(0.0)
             # Checks block (0..1). OI/Greed/Hype placeholders for now
-            rsi = rsi_wilder(d8['close'], 14).fillna(50)
+            rsi = cached_rsi_wilder(d8['close'], 14, symbol=sym, timeframe='8h').fillna(50)
             rsi_q = 1 - np.minimum(1.0, np.abs(rsi - 50) / 50)  # neutral near 50
             mom = (d8['close'].pct_change().rolling(8).mean()).fillna(0)
             mom_q = (mom - mom.min()) / (mom.max() - mom.min() + 1e-9)
-            oi_q = 0.0
-            greed_q = 0.0
-            hype_q = 0.0
-            wsum = max(1e-9, (self.cfg.w_oi + self.cfg.w_rsi + self.cfg.w_mom + self.cfg.w_greed + self.cfg.w_hype))
-            chk = (
-                self.cfg.w_oi*oi_q +
-                self.cfg.w_rsi*float(rsi_q.iloc[-1]) +
-                self.cfg.w_mom*float(mom_q.iloc[-1]) +
-                self.cfg.w_greed*greed_q +
-                self.cfg.w_hype*hype_q
-            ) / wsum
             rows.append({
                 "symbol": sym,
                 "vroc_raw": float(vroc_raw.iloc[-1]),
-                "checks": float(chk),
+                "checks": self._checks(float(rsi_q.iloc[-1]), float(mom_q.iloc[-1])),
                 "ts": int(d8.index[-1].timestamp() * 1000),
             })
 
@@ -97,6 +143,21 @@ class GateScanner:
         save_derived("gate_snapshot", json.dumps(snap))
         return rows
 
+    def _checks(self, rsi_q: float, mom_q: float) -> float:
+        # OI/Greed/Hype placeholders for now
+        oi_q = 0.0
+        greed_q = 0.0
+        hype_q = 0.0
+        wsum = max(1e-9, (self.cfg.w_oi + self.cfg.w_rsi + self.cfg.w_mom + self.cfg.w_greed + self.cfg.w_hype))
+        chk = (
+            self.cfg.w_oi*oi_q +
+            self.cfg.w_rsi*rsi_q +
+            self.cfg.w_mom*mom_q +
+            self.cfg.w_greed*greed_q +
+            self.cfg.w_hype*hype_q
+        ) / wsum
+        return float(chk)
+
     def snapshot(self) -> Dict:
         raw = load_derived("gate_snapshot")
         if not raw:
@@ -1,13 +1,16 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 
-from .indicators import rsi_wilder
-from .divergence import bull_divergence, bear_divergence, valuewhen
+from .compact import as_frame
+from .equity import EquitySeries, mark_to_market
+from .kernels import hedge_kernel
+from .signals import DivergenceSignals, compute_signals
+from .tradelog import TradeLog
 
 
 @dataclass
@@ -83,24 +86,41 @@ def _pct_ret_short(px: float, entry: float) -> float:
     return (entry / px - 1.0) * 100.0
 
 
-def backtest_hedged(symbol: str, df: pd.DataFrame, params: Dict) -> Tuple[Dict, List[dict], List[Tuple[pd.Timestamp, float]]]:
+def _epoch_ms(index: pd.DatetimeIndex) -> np.ndarray:
+    return index.asi8 // 1_000_000 if index.unit == "ns" else index.as_unit("ms").asi8
+
+
+def backtest_hedged(symbol: str, df: pd.DataFrame, params: Dict,
+                    signals: Optional[DivergenceSignals] = None,
+                    use_kernel: bool = True,
+                    progress: Optional[Callable[[int, int, Dict[str, Any]], None]] = None,
+                    ) -> Tuple[Dict, TradeLog, EquitySeries, EquitySeries, EquitySeries]:
+    """Hedged long/short backtest.
+
+    Returns (metrics, trades, equity, equity_long, equity_short); trades is a
+    TradeLog and the equity series are EquitySeries arrays with one point per
+    realized exit.
+    use_kernel=False runs the reference pandas loop (kept for parity checks).
+    progress(bars_done, bars, {"Ending Equity", "Num Trades"}) is called
+    about 100 times.
+    """
     p = _coerce(HedgeParams(**params))
+    df = as_frame(df)
     if df.empty:
+        empty = EquitySeries(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
         return ({
             "Total Return (%)": 0.0,
             "Num Trades": 0,
             "Ending Equity": p.initial_capital,
-        }, [], [], [], [])
-
-    fee_factor = p.fee_bps / 10_000.0
-    equity = float(p.initial_capital)
-    trades: List[dict] = []
-    eq_series: List[Tuple[pd.Timestamp, float]] = []
+        }, TradeLog.empty(symbol, total_pnl=True), empty, empty, empty)
 
     # Indicators
-    rsi = rsi_wilder(df["close"], p.rsi_length).fillna(50)
-    bull = bull_divergence(rsi, df["low"], p.lookbackLeft, p.lookbackRight, p.rangeLower, p.rangeUpper)
-    bear = bear_divergence(rsi, df["high"], p.lookbackLeft, p.lookbackRight, p.rangeLower, p.rangeUpper)
+    sig_params = (p.rsi_length, p.lookbackLeft, p.lookbackRight, p.rangeLower, p.rangeUpper)
+    if signals is None or not signals.matches(*sig_params):
+        signals = compute_signals(df, *sig_params)
+    rsi = signals.rsi
+    bull = signals.bull
+    bear = signals.bear
     setup_bear = (rsi.shift(1) <= p.rsi_overbought) & (rsi > p.rsi_overbought)
     setup_bull = (rsi.shift(1) >= p.rsi_oversold) & (rsi < p.rsi_oversold)
 
@@ -118,6 +138,72 @@ def backtest_hedged(symbol: str, df: pd.DataFrame, params: Dict) -> Tuple[Dict,
     st_bars = idx - np.where(np.isnan(st_last), np.inf, st_last)
     st_recent = pd.Series(st_bars <= float(max(1, p.lookbackLeft + p.lookbackRight)), index=df.index)
 
+    run = _run_kernel if use_kernel else _run_loop
+    trades, equity, eq_series, eq_series_long, eq_series_short = run(
+        symbol, df, p, bull, bear, setup_bear, setup_bull, lt_recent, st_recent, progress
+    )
+
+    # Metrics
+    exits = trades.pnl[trades.is_exit]
+    total_return = (equity / p.initial_capital - 1.0) * 100.0
+    num_tr = trades.num_entries
+    win = int((exits > 0).sum())
+    winrate = (win/len(exits)*100.0) if len(exits) else 0.0
+    metrics = {
+        "Total Return (%)": round(total_return,2),
+        "Num Trades": num_tr,
+        "Win Rate (%)": round(winrate,2),
+        "Ending Equity": round(equity,2)
+    }
+    # trades carry the cumulative PnL (total_pnl)
+    return metrics, trades, eq_series, eq_series_long, eq_series_short
+
+
+def equity_curve_hedged(df: pd.DataFrame, trades: TradeLog, params: Dict) -> EquitySeries:
+    """Mark-to-market equity at every bar of df (both legs) for backtest_hedged trades."""
+    p = _coerce(HedgeParams(**params))
+    return mark_to_market(trades, as_frame(df), p.initial_capital, p.fee_bps)
+
+
+def _run_kernel(symbol: str, df: pd.DataFrame, p: HedgeParams, bull: pd.Series, bear: pd.Series,
+                setup_bear: pd.Series, setup_bull: pd.Series, lt_recent: pd.Series, st_recent: pd.Series,
+                progress=None):
+    """Same state machine as _run_loop, run by engine.kernels over plain arrays."""
+    events, curves, equity = hedge_kernel(
+        df["close"].to_numpy(dtype=float),
+        df["low"].to_numpy(dtype=float),
+        df["high"].to_numpy(dtype=float),
+        bull.to_numpy(dtype=bool),
+        bear.to_numpy(dtype=bool),
+        setup_bear.to_numpy(dtype=bool),
+        setup_bull.to_numpy(dtype=bool),
+        lt_recent.to_numpy(dtype=bool),
+        st_recent.to_numpy(dtype=bool),
+        initial_capital=float(p.initial_capital),
+        size_equity_pct=p.size_equity_pct,
+        fee_factor=p.fee_bps / 10_000.0,
+        init_stop_pct=p.init_stop_pct,
+        tp_half_pct=p.tp_half_pct,
+        cooldown_bars=int(p.cooldown_bars or 0),
+        lock_arm_pct=p.lock_arm_pct,
+        lock_profit_pct=p.lock_profit_pct,
+        progress=progress,
+    )
+    t_ms = _epoch_ms(df.index)
+    trades = TradeLog.from_events(symbol, df.index, events, total_pnl=True)
+    series = [EquitySeries(t_ms[bars], vals) for bars, vals in (curves["combined"], curves["long"], curves["short"])]
+    return (trades, equity, *series)
+
+
+def _run_loop(symbol: str, df: pd.DataFrame, p: HedgeParams, bull: pd.Series, bear: pd.Series,
+              setup_bear: pd.Series, setup_bull: pd.Series, lt_recent: pd.Series, st_recent: pd.Series,
+              progress=None):
+    """Reference bar loop over pandas series (kept for parity checks)."""
+    fee_factor = p.fee_bps / 10_000.0
+    equity = float(p.initial_capital)
+    trades: List[dict] = []
+    eq_series: List[Tuple[pd.Timestamp, float]] = []
+
     # Position state (long & short independent)
     in_long = False; long_entry = np.nan; long_stop = np.nan; long_qty = 0.0; long_peak = 0.0; long_half_tp = False
     in_short = False; short_entry = np.nan; short_stop = np.nan; short_qty = 0.0; short_peak = 0.0; short_half_tp = False
@@ -128,7 +214,13 @@ def backtest_hedged(symbol: str, df: pd.DataFrame, params: Dict) -> Tuple[Dict,
     cdL = 0  # cooldown bars remaining for long re-entry
     cdS = 0  # cooldown bars remaining for short re-entry
 
-    for i in range(len(df)):
+    n = len(df)
+    report_every = max(1, n // 100)
+
+    for i in range(n):
+        if progress is not None and i and i % report_every == 0:
+            progress(i, n, {"Ending Equity": round(equity, 2),
+                            "Num Trades": sum(1 for tr in trades if tr["type"] == "enter")})
         t = df.index[i]
         px = float(df["close"].iloc[i])
         # Cooldown ticks (decrement when flat on that side)
@@ -255,22 +347,8 @@ def backtest_hedged(symbol: str, df: pd.DataFrame, params: Dict) -> Tuple[Dict,
             in_short = True
             trades.append({"symbol":symbol, "t": t.isoformat(), "side":"short", "type":"enter", "price": short_entry, "qty": short_qty, "stop": short_stop})
 
-    # Metrics
-    exits = [t for t in trades if t.get("type","!").startswith("exit")]
-    total_return = (equity / p.initial_capital - 1.0) * 100.0
-    num_tr = sum(1 for t in trades if t.get("type")=='enter')
-    win = sum(1 for t in exits if (t.get('pnl',0)>0))
-    winrate = (win/len(exits)*100.0) if exits else 0.0
-    metrics = {
-        "Total Return (%)": round(total_return,2),
-        "Num Trades": num_tr,
-        "Win Rate (%)": round(winrate,2),
-        "Ending Equity": round(equity,2)
-    }
-    # Add cumulative PnL
-    cum = 0.0
-    for t in trades:
-        if t.get('pnl') is not None:
-            cum += float(t.get('pnl',0))
-        t['total_pnl'] = round(cum, 2)
-    return metrics, trades, eq_series, eq_series_long, eq_series_short
+    series = []
+    for pts in (eq_series, eq_series_long, eq_series_short):
+        t_ms = _epoch_ms(pd.DatetimeIndex([t for t, _ in pts])) if pts else np.empty(0, dtype=np.int64)
+        series.append(EquitySeries(np.asarray(t_ms, dtype=np.int64), np.array([v for _, v in pts], dtype=np.float64)))
+    return (TradeLog.from_dicts(symbol, trades, total_pnl=True), equity, *series)
@@ -0,0 +1,114 @@
+"""
+Higher-timeframe entry gate shared by PineLongEngine and RemixBot.
+
+The gate opens on an HTF bull divergence that follows an oversold RSI
+within `max_wait_bars`, closes on an RSI crossunder of the overbought level,
+and closes when an HTF low touches the stop armed at entry (close * (1 -
+pct_stop)). It starts open. Signals are built with array operations; the
+state walk only visits bars with an enter/close signal and finds stop hits
+with one vectorized search per open stretch. HTF state reaches LTF bars
+through a searchsorted index (same as reindex(method="ffill"), open before
+the first HTF bar).
+
+The HTF gate depends only on the candles and the gate settings, so it is
+kept in engine.indicator_cache per (symbol, timeframe, data, params).
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .data import resample_ohlcv
+from .indicator_cache import cached, cached_bull_divergence, cached_rsi_wilder
+
+
+def gate_states(low: np.ndarray, close: np.ndarray, enter_sig: np.ndarray,
+                close_sig: np.ndarray, pct_stop: float) -> np.ndarray:
+    """Gate open/closed per HTF bar.
+
+    On each bar the armed stop is checked first, then the close signal,
+    then the enter signal (which re-arms the stop from that bar's close).
+    """
+    n = len(low)
+    gate = np.empty(n, dtype=bool)
+    events = np.flatnonzero(enter_sig | close_sig)
+    is_open = True
+    stop = np.nan
+    pos = 0
+    for e in np.append(events, n):
+        if is_open and stop == stop:
+            # stop hits on quiet bars and on the event bar itself
+            hits = np.flatnonzero(low[pos:min(e + 1, n)] <= stop)
+            if hits.size:
+                hit = pos + int(hits[0])
+                gate[pos:hit] = True
+                is_open = False
+                stop = np.nan
+                pos = hit
+        gate[pos:e] = is_open
+        if e == n:
+            break
+        if close_sig[e]:
+            is_open = False
+            stop = np.nan
+        if enter_sig[e]:
+            is_open = True
+            stop = float(close[e]) * (1.0 - float(pct_stop))
+        gate[e] = is_open
+        pos = e + 1
+    return gate
+
+
+def _htf_gate_bars(df: pd.DataFrame, tf: str, rsi_length: int, overbought: float, oversold: float,
+                   left: int, right: int, range_low: int, range_up: int, max_wait_bars: int,
+                   pct_stop: float, symbol: Optional[str]) -> pd.Series:
+    htf = resample_ohlcv(df, tf)
+    rsi = cached_rsi_wilder(htf["close"], rsi_length, symbol=symbol, timeframe=tf).fillna(50)
+    bull = cached_bull_divergence(rsi, htf["low"], left, right, range_low, range_up,
+                                  symbol=symbol, timeframe=tf)
+    rsi_v = rsi.to_numpy(dtype=float)
+    # bars since RSI was last below oversold; before the first one the
+    # distance is -inf, so the gate can arm from the start (original behaviour)
+    idx = np.arange(len(rsi_v), dtype=float)
+    last_os = np.maximum.accumulate(np.where(rsi_v < oversold, idx, -np.inf)) if len(rsi_v) else idx
+    recently_armed = (idx - np.where(np.isneginf(last_os), np.inf, last_os)) <= float(max_wait_bars)
+    enter_sig = bull.to_numpy(dtype=bool) & recently_armed
+    prev = np.r_[np.nan, rsi_v[:-1]]
+    close_sig = (prev >= overbought) & (rsi_v < overbought)
+    gate = gate_states(htf["low"].to_numpy(dtype=float), htf["close"].to_numpy(dtype=float),
+                       enter_sig, close_sig, pct_stop)
+    return pd.Series(gate, index=htf.index)
+
+
+def htf_gate_bars(df: pd.DataFrame, tf: str, rsi_length: int, overbought: float, oversold: float,
+                  left: int, right: int, range_low: int, range_up: int, max_wait_bars: int,
+                  pct_stop: float, symbol: Optional[str] = None) -> pd.Series:
+    """Gate state per HTF bar of resample_ohlcv(df, tf) (cached)."""
+    args = (tf, int(rsi_length), float(overbought), float(oversold), int(left), int(right),
+            int(range_low), int(range_up), int(max_wait_bars), float(pct_stop))
+    if df.empty:
+        return _htf_gate_bars(df, *args, symbol)
+    cols = [df[c] for c in ("open", "high", "low", "close")]
+    return cached("htf_gate", cols, args, lambda: _htf_gate_bars(df, *args, symbol), symbol, tf)
+
+
+def to_ltf(gate_htf: pd.Series, index: pd.DatetimeIndex) -> pd.Series:
+    """Forward-fill HTF gate state onto LTF bars; open before the first HTF bar."""
+    pos = gate_htf.index.searchsorted(index, side="right") - 1
+    vals = gate_htf.to_numpy(dtype=bool)
+    out = np.ones(len(index), dtype=bool)
+    ok = pos >= 0
+    out[ok] = vals[pos[ok]]
+    return pd.Series(out, index=index)
+
+
+def htf_gate(df: pd.DataFrame, tf: str, rsi_length: int, overbought: float, oversold: float,
+             left: int, right: int, range_low: int, range_up: int, max_wait_bars: int,
+             pct_stop: float, index: Optional[pd.DatetimeIndex] = None,
+             symbol: Optional[str] = None) -> pd.Series:
+    """HTF gate state per LTF bar (`index`, default df.index)."""
+    gate_htf = htf_gate_bars(df, tf, rsi_length, overbought, oversold, left, right,
+                             range_low, range_up, max_wait_bars, pct_stop, symbol=symbol)
+    return to_ltf(gate_htf, df.index if index is None else index)
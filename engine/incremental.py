@@ -0,0 +1,558 @@
+"""
+Incremental versions of the pandas window primitives used by the indicators.
+
+Each object consumes one value per update() and returns the value the batch
+call would produce at that position. peek(x) returns the same thing without
+committing x, which is how a still-forming higher-timeframe bar is evaluated
+bar after bar without touching the committed state.
+
+The arithmetic follows pandas' own online algorithms (Kahan-compensated
+rolling sums, Welford variance with separate add/remove compensation, the
+normalised ewm recursion), so results are bit-identical to
+``rolling(w).sum()/mean()/var()/std()/max()/min()`` and
+``ewm(..., adjust=False).mean()``. Like pandas, they treat +/-inf as
+missing.
+
+On top of them sit the indicator objects of engine.indicators (RsiWilder,
+Ema, Atr, Bollinger), bit-identical to rsi_wilder/ema/atr/bollinger on the
+same series. Every object has state()/from_state(), which round-trip through
+plain JSON types (NaN as None); engine.indicator_state persists them per
+(symbol, timeframe).
+"""
+from __future__ import annotations
+
+import math
+from collections import deque
+
+import numpy as np
+
+
+def _j(x: float):
+    # JSON has no NaN/inf: NaN -> None, +/-inf -> "inf"/"-inf"
+    if x != x:
+        return None
+    return float(x) if math.isfinite(x) else ("inf" if x > 0 else "-inf")
+
+
+def _f(x) -> float:
+    return np.nan if x is None else float(x)
+
+
+def _finite(x: float) -> float:
+    # pandas' rolling and ewm replace +/-inf with NaN before aggregating
+    return x if math.isfinite(x) else np.nan
+
+
+class RollingSum:
+    """``Series.rolling(window).sum()`` (or ``.mean()`` with mean=True)."""
+
+    def __init__(self, window: int, mean: bool = False):
+        if int(window) < 1:
+            raise ValueError("window must be >= 1")
+        self.window = int(window)
+        self.mean = bool(mean)
+        self._buf: deque = deque()
+        self._n = 0  # values seen
+        # nobs, sum_x, comp_add, comp_remove, neg_ct, same_ct, prev_value
+        self._st = (0, 0.0, 0.0, 0.0, 0, 0, np.nan)
+
+    @staticmethod
+    def _add(st, val):
+        nobs, sx, ca, cr, neg, same, prev = st
+        if val == val:
+            nobs += 1
+            y = val - ca
+            t = sx + y
+            ca = t - sx - y
+            sx = t
+            if math.copysign(1.0, val) < 0:
+                neg += 1
+            same = same + 1 if val == prev else 1
+            prev = val
+        return nobs, sx, ca, cr, neg, same, prev
+
+    @staticmethod
+    def _remove(st, val):
+        nobs, sx, ca, cr, neg, same, prev = st
+        if val == val:
+            nobs -= 1
+            y = -val - cr
+            t = sx + y
+            cr = t - sx - y
+            sx = t
+            if math.copysign(1.0, val) < 0:
+                neg -= 1
+        return nobs, sx, ca, cr, neg, same, prev
+
+    def _step(self, x: float):
+        removed = self._buf[0] if len(self._buf) == self.window else None
+        if self._n == 0 or self.window == 1:
+            st = self._add((0, 0.0, 0.0, 0.0, 0, 0, x), x)
+        else:
+            st = self._st
+            if removed is not None:
+                st = self._remove(st, removed)
+            st = self._add(st, x)
+        return st
+
+    def _value(self, st) -> float:
+        nobs, sx, _ca, _cr, neg, same, prev = st
+        if nobs < self.window:
+            return np.nan
+        if self.mean:
+            if same >= nobs:
+                return prev
+            res = sx / nobs
+            if neg == 0 and res < 0:
+                return 0.0
+            if neg == nobs and res > 0:
+                return 0.0
+            return res
+        return prev * nobs if same >= nobs else sx
+
+    def peek(self, x: float) -> float:
+        return self._value(self._step(_finite(float(x))))
+
+    def update(self, x: float) -> float:
+        x = _finite(float(x))
+        self._st = self._step(x)
+        self._buf.append(x)
+        if len(self._buf) > self.window:
+            self._buf.popleft()
+        self._n += 1
+        return self._value(self._st)
+
+    def state(self) -> dict:
+        nobs, sx, ca, cr, neg, same, prev = self._st
+        return {"window": self.window, "mean": self.mean, "n": self._n, "buf": [_j(x) for x in self._buf],
+                "st": [nobs, _j(sx), _j(ca), _j(cr), neg, same, _j(prev)]}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "RollingSum":
+        obj = cls(state["window"], mean=state["mean"])
+        obj._n = int(state["n"])
+        obj._buf.extend(_f(x) for x in state["buf"])
+        nobs, sx, ca, cr, neg, same, prev = state["st"]
+        obj._st = (int(nobs), _f(sx), _f(ca), _f(cr), int(neg), int(same), _f(prev))
+        return obj
+
+
+class RollingVar:
+    """``Series.rolling(window).var(ddof)``; ``std()`` is sqrt of the same state."""
+
+    def __init__(self, window: int, ddof: int = 1):
+        if int(window) < 1:
+            raise ValueError("window must be >= 1")
+        self.window = int(window)
+        self.ddof = int(ddof)
+        self._buf: deque = deque()
+        self._n = 0
+        # nobs, mean_x, ssqdm_x, comp_add, comp_remove, same_ct, prev_value
+        self._st = (0, 0.0, 0.0, 0.0, 0.0, 0, np.nan)
+
+    @staticmethod
+    def _add(st, val):
+        nobs, mx, ss, ca, cr, same, prev = st
+        if val != val:
+            return st
+        nobs += 1
+        same = same + 1 if val == prev else 1
+        prev = val
+        prev_mean = mx - ca
+        y = val - ca
+        t = y - mx
+        ca = t + mx - y
+        mx = mx + t / nobs if nobs else 0.0
+        ss = ss + (val - prev_mean) * (val - mx)
+        return nobs, mx, ss, ca, cr, same, prev
+
+    @staticmethod
+    def _remove(st, val):
+        nobs, mx, ss, ca, cr, same, prev = st
+        if val != val:
+            return st
+        nobs -= 1
+        if nobs:
+            prev_mean = mx - cr
+            y = val - cr
+            t = y - mx
+            cr = t + mx - y
+            mx = mx - t / nobs
+            ss = ss - (val - prev_mean) * (val - mx)
+        else:
+            mx = 0.0
+            ss = 0.0
+        return nobs, mx, ss, ca, cr, same, prev
+
+    def _step(self, x: float):
+        removed = self._buf[0] if len(self._buf) == self.window else None
+        if self._n == 0 or self.window == 1:
+            st = self._add((0, 0.0, 0.0, 0.0, 0.0, 0, x), x)
+        else:
+            st = self._st
+            if removed is not None:
+                st = self._remove(st, removed)
+            st = self._add(st, x)
+        return st
+
+    def _value(self, st) -> float:
+        nobs, _mx, ss, _ca, _cr, same, _prev = st
+        if nobs < self.window or nobs <= self.ddof:
+            return np.nan
+        if nobs == 1 or same >= nobs:
+            return 0.0
+        return ss / (nobs - self.ddof)
+
+    @staticmethod
+    def std_of(var: float) -> float:
+        # zsqrt: negative round-off clips to zero, NaN stays NaN
+        if var != var:
+            return np.nan
+        return math.sqrt(var) if var > 0 else 0.0
+
+    def peek(self, x: float) -> float:
+        return self._value(self._step(_finite(float(x))))
+
+    def update(self, x: float) -> float:
+        x = _finite(float(x))
+        self._st = self._step(x)
+        self._buf.append(x)
+        if len(self._buf) > self.window:
+            self._buf.popleft()
+        self._n += 1
+        return self._value(self._st)
+
+    def state(self) -> dict:
+        nobs, mx, ss, ca, cr, same, prev = self._st
+        return {"window": self.window, "ddof": self.ddof, "n": self._n, "buf": [_j(x) for x in self._buf],
+                "st": [nobs, _j(mx), _j(ss), _j(ca), _j(cr), same, _j(prev)]}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "RollingVar":
+        obj = cls(state["window"], ddof=state["ddof"])
+        obj._n = int(state["n"])
+        obj._buf.extend(_f(x) for x in state["buf"])
+        nobs, mx, ss, ca, cr, same, prev = state["st"]
+        obj._st = (int(nobs), _f(mx), _f(ss), _f(ca), _f(cr), int(same), _f(prev))
+        return obj
+
+
+class RollingExtreme:
+    """``Series.rolling(window).max()`` (or ``.min()`` with kind="min").
+
+    A monotonic deque of (position, value) holds the window's candidates,
+    so each update is O(1) amortized.
+    """
+
+    def __init__(self, window: int, kind: str = "max"):
+        if int(window) < 1:
+            raise ValueError("window must be >= 1")
+        if kind not in ("max", "min"):
+            raise ValueError("kind must be 'max' or 'min'")
+        self.window = int(window)
+        self.kind = kind
+        self._q: deque = deque()  # (position, value), best first
+        self._obs: deque = deque()  # positions of observed (finite) values in the window
+        self._n = 0
+
+    def _beats(self, a: float, b: float) -> bool:
+        return a >= b if self.kind == "max" else a <= b
+
+    def _value(self, q, obs) -> float:
+        return q[0][1] if len(obs) >= self.window and q else np.nan
+
+    def peek(self, x: float) -> float:
+        x = _finite(float(x))
+        start = self._n - self.window + 1
+        q = [e for e in self._q if e[0] >= start]
+        obs = [k for k in self._obs if k >= start]
+        if x == x:
+            while q and self._beats(x, q[-1][1]):
+                q.pop()
+            q.append((self._n, x))
+            obs.append(self._n)
+        return self._value(q, obs)
+
+    def update(self, x: float) -> float:
+        x = _finite(float(x))
+        k = self._n
+        self._n += 1
+        start = k - self.window + 1
+        if x == x:
+            while self._q and self._beats(x, self._q[-1][1]):
+                self._q.pop()
+            self._q.append((k, x))
+            self._obs.append(k)
+        while self._q and self._q[0][0] < start:
+            self._q.popleft()
+        while self._obs and self._obs[0] < start:
+            self._obs.popleft()
+        return self._value(self._q, self._obs)
+
+    def state(self) -> dict:
+        return {"window": self.window, "kind": self.kind, "n": self._n,
+                "q": [[k, _j(v)] for k, v in self._q], "obs": list(self._obs)}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "RollingExtreme":
+        obj = cls(state["window"], kind=state["kind"])
+        obj._n = int(state["n"])
+        obj._q.extend((int(k), _f(v)) for k, v in state["q"])
+        obj._obs.extend(int(k) for k in state["obs"])
+        return obj
+
+
+class Ewm:
+    """``Series.ewm(com=..., adjust=False).mean()`` one value at a time."""
+
+    def __init__(self, com: float):
+        self.com = float(com)
+        self.alpha = 1.0 / (1.0 + self.com)
+        self._started = False
+        # weighted, old_wt, nobs
+        self._st = (np.nan, 1.0, 0)
+
+    @classmethod
+    def from_span(cls, span: float) -> "Ewm":
+        return cls((span - 1) / 2)
+
+    @classmethod
+    def from_alpha(cls, alpha: float) -> "Ewm":
+        return cls((1 - alpha) / alpha)
+
+    def _step(self, x: float):
+        if not self._started:
+            return x, 1.0, int(x == x)
+        weighted, old_wt, nobs = self._st
+        is_obs = x == x
+        nobs += int(is_obs)
+        if weighted == weighted:
+            old_wt *= 1.0 - self.alpha
+            if is_obs:
+                # pandas skips the arithmetic on an unchanged value but still resets old_wt
+                if weighted != x:
+                    weighted = old_wt * weighted + self.alpha * x
+                    weighted /= old_wt + self.alpha
+                old_wt = 1.0
+        elif is_obs:
+            weighted = x
+        return weighted, old_wt, nobs
+
+    @staticmethod
+    def _value(st) -> float:
+        return st[0] if st[2] >= 1 else np.nan
+
+    def peek(self, x: float) -> float:
+        return self._value(self._step(_finite(float(x))))
+
+    def update(self, x: float) -> float:
+        self._st = self._step(_finite(float(x)))
+        self._started = True
+        return self._value(self._st)
+
+    def state(self) -> dict:
+        weighted, old_wt, nobs = self._st
+        return {"com": self.com, "started": self._started, "st": [_j(weighted), _j(old_wt), nobs]}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "Ewm":
+        obj = cls(state["com"])
+        obj._started = bool(state["started"])
+        weighted, old_wt, nobs = state["st"]
+        obj._st = (_f(weighted), _f(old_wt), int(nobs))
+        return obj
+
+
+class Ema:
+    """engine.indicators.ema(series, length) one value at a time."""
+
+    def __init__(self, length: int):
+        self.length = int(length)
+        self._ewm = Ewm.from_span(self.length)
+
+    def peek(self, x: float) -> float:
+        return self._ewm.peek(x)
+
+    def update(self, x: float) -> float:
+        return self._ewm.update(x)
+
+    def state(self) -> dict:
+        return {"length": self.length, "ewm": self._ewm.state()}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "Ema":
+        obj = cls(state["length"])
+        obj._ewm = Ewm.from_state(state["ewm"])
+        return obj
+
+
+class RsiWilder:
+    """engine.indicators.rsi_wilder(close, length) one close at a time."""
+
+    def __init__(self, length: int):
+        self.length = int(length)
+        self._up = Ewm.from_alpha(1 / self.length)
+        self._down = Ewm.from_alpha(1 / self.length)
+        self._prev_close = np.nan
+
+    def _legs(self, close: float):
+        delta = close - self._prev_close
+        # Series.clip keeps NaN and the sign of zero exactly like this
+        up = delta if (delta >= 0 or delta != delta) else 0.0
+        down = -(delta if (delta <= 0 or delta != delta) else 0.0)
+        return up, down
+
+    @staticmethod
+    def _value(roll_up: float, roll_down: float) -> float:
+        if roll_down == 0:
+            roll_down = np.nan
+        with np.errstate(all="ignore"):
+            rs = np.float64(roll_up) / np.float64(roll_down)
+            return float(100 - (100 / (1 + rs)))
+
+    def peek(self, close: float) -> float:
+        up, down = self._legs(float(close))
+        return self._value(self._up.peek(up), self._down.peek(down))
+
+    def update(self, close: float) -> float:
+        close = float(close)
+        up, down = self._legs(close)
+        self._prev_close = close
+        return self._value(self._up.update(up), self._down.update(down))
+
+    def state(self) -> dict:
+        return {"length": self.length, "up": self._up.state(), "down": self._down.state(),
+                "prev_close": _j(self._prev_close)}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "RsiWilder":
+        obj = cls(state["length"])
+        obj._up = Ewm.from_state(state["up"])
+        obj._down = Ewm.from_state(state["down"])
+        obj._prev_close = _f(state["prev_close"])
+        return obj
+
+
+class Atr:
+    """engine.indicators.atr(df, length) one (high, low, close) bar at a time."""
+
+    def __init__(self, length: int = 14):
+        self.length = int(length)
+        self._ewm = Ewm.from_alpha(1 / self.length)
+        self._prev_close = np.nan
+
+    def _true_range(self, high: float, low: float) -> float:
+        pc = self._prev_close
+        # np.maximum propagates NaN, as in the batch version
+        return float(np.maximum(high - low, np.maximum(abs(high - pc), abs(low - pc))))
+
+    def peek(self, high: float, low: float, close: float) -> float:
+        return self._ewm.peek(self._true_range(float(high), float(low)))
+
+    def update(self, high: float, low: float, close: float) -> float:
+        out = self._ewm.update(self._true_range(float(high), float(low)))
+        self._prev_close = float(close)
+        return out
+
+    def state(self) -> dict:
+        return {"length": self.length, "ewm": self._ewm.state(), "prev_close": _j(self._prev_close)}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "Atr":
+        obj = cls(state["length"])
+        obj._ewm = Ewm.from_state(state["ewm"])
+        obj._prev_close = _f(state["prev_close"])
+        return obj
+
+
+class Bollinger:
+    """engine.indicators.bollinger(close, period, dev) as (upper, ma, lower) per close."""
+
+    def __init__(self, period: int = 20, dev: float = 2.0):
+        self.period = int(period)
+        self.dev = float(dev)
+        self._ma = RollingSum(self.period, mean=True)
+        self._var = RollingVar(self.period)
+
+    def _bands(self, ma: float, var: float):
+        sd = RollingVar.std_of(var)
+        return ma + self.dev * sd, ma, ma - self.dev * sd
+
+    def peek(self, close: float):
+        return self._bands(self._ma.peek(close), self._var.peek(close))
+
+    def update(self, close: float):
+        return self._bands(self._ma.update(close), self._var.update(close))
+
+    def state(self) -> dict:
+        return {"period": self.period, "dev": self.dev, "ma": self._ma.state(), "var": self._var.state()}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "Bollinger":
+        obj = cls(state["period"], state["dev"])
+        obj._ma = RollingSum.from_state(state["ma"])
+        obj._var = RollingVar.from_state(state["var"])
+        return obj
+
+
+class MeanReturn:
+    """``close.pct_change().rolling(window).mean()`` one close at a time."""
+
+    def __init__(self, window: int):
+        self.window = int(window)
+        self._mean = RollingSum(self.window, mean=True)
+        self._prev_close = np.nan
+
+    def _ret(self, close: float) -> float:
+        with np.errstate(all="ignore"):
+            return float(np.float64(close) / np.float64(self._prev_close) - 1)
+
+    def peek(self, close: float) -> float:
+        return self._mean.peek(self._ret(float(close)))
+
+    def update(self, close: float) -> float:
+        close = float(close)
+        out = self._mean.update(self._ret(close))
+        self._prev_close = close
+        return out
+
+    def state(self) -> dict:
+        return {"window": self.window, "mean": self._mean.state(), "prev_close": _j(self._prev_close)}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "MeanReturn":
+        obj = cls(state["window"])
+        obj._mean = RollingSum.from_state(state["mean"])
+        obj._prev_close = _f(state["prev_close"])
+        return obj
+
+
+class Extent:
+    """(min, max) of every value so far, NaN counted as `fill`: ``s.fillna(fill).min()/.max()``."""
+
+    def __init__(self, fill: float = 0.0):
+        self.fill = float(fill)
+        self._lo = np.inf
+        self._hi = -np.inf
+
+    def _step(self, x: float):
+        x = float(x)
+        if x != x:
+            x = self.fill
+        return min(self._lo, x), max(self._hi, x)
+
+    def peek(self, x: float):
+        return self._step(x)
+
+    def update(self, x: float):
+        self._lo, self._hi = self._step(x)
+        return self._lo, self._hi
+
+    def state(self) -> dict:
+        return {"fill": self.fill, "lo": _j(self._lo), "hi": _j(self._hi)}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "Extent":
+        obj = cls(state["fill"])
+        obj._lo, obj._hi = _f(state["lo"]), _f(state["hi"])
+        return obj
@@ -0,0 +1,270 @@
+"""
+Content-addressed cache for RSI, pivot and divergence series.
+
+The same indicator series for the same data are recomputed by /backtest,
+/pine/snapshot, /signals, the live feed, the dataset builder and the HTF
+latch. Entries here are keyed by (indicator, symbol, timeframe, first ts,
+last ts, length, data digest, params); the digest covers the input values
+and index, so two requests over identical candles share one result no
+matter which code path asked first, and a changed candle never hits.
+
+Memory is bounded by an approximate byte budget with LRU eviction. When a
+spill directory is configured, evicted entries are pickled there and read
+back on a later miss. Counters are exposed through stats().
+
+Environment:
+    MYSTRIX_INDICATOR_CACHE_MB   in-memory budget in MiB (default 256, 0 disables)
+    MYSTRIX_INDICATOR_CACHE_DIR  spill directory (unset: no disk spill)
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .indicators import rsi_wilder
+from .divergence import Divergences, bear_divergence, bull_divergence, divergences, pivot_high, pivot_low, pivots
+
+
+def _ts(x: Any) -> Any:
+    if isinstance(x, pd.Timestamp):
+        return int(x.value)
+    if isinstance(x, (np.integer, np.floating)):
+        return x.item()
+    return x
+
+
+def series_digest(series: pd.Series) -> str:
+    """Digest of a Series' values and index."""
+    h = hashlib.blake2b(digest_size=16)
+    vals = series.to_numpy()
+    if vals.dtype.kind in "biuf":
+        h.update(vals.dtype.str.encode())
+        h.update(np.ascontiguousarray(vals).tobytes())
+    else:
+        h.update(pd.util.hash_pandas_object(series, index=False).to_numpy().tobytes())
+    idx = series.index
+    if isinstance(idx, pd.DatetimeIndex):
+        h.update(str(idx.dtype).encode())
+        h.update(np.ascontiguousarray(idx.asi8).tobytes())
+    else:
+        h.update(pd.util.hash_pandas_object(idx).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _nbytes(value: Any) -> int:
+    if isinstance(value, (pd.Series, pd.DataFrame)):
+        return int(np.sum(value.memory_usage(index=True, deep=False)))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    return 64
+
+
+def _copy(value: Any) -> Any:
+    # callers own what they get back; the cached object must stay untouched
+    if isinstance(value, (pd.Series, pd.DataFrame, np.ndarray)):
+        return value.copy()
+    if isinstance(value, tuple):
+        items = [_copy(v) for v in value]
+        return type(value)(*items) if hasattr(value, "_fields") else tuple(items)
+    return value
+
+
+class IndicatorCache:
+    def __init__(self, max_bytes: int = 256 << 20, spill_dir: Optional[str] = None):
+        self.max_bytes = int(max_bytes)
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self._store: "OrderedDict[Tuple, Tuple[int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.spills = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def make_key(name: str, inputs: Sequence[pd.Series], params: Tuple,
+                 symbol: Optional[str] = None, timeframe: Optional[str] = None) -> Tuple:
+        first = inputs[0]
+        t0 = _ts(first.index[0]) if len(first) else None
+        t1 = _ts(first.index[-1]) if len(first) else None
+        digest = "-".join(series_digest(s) for s in inputs)
+        return (name, symbol, timeframe, t0, t1, len(first), digest, tuple(params))
+
+    def _spill_path(self, key: Tuple) -> Path:
+        name = hashlib.blake2b(repr(key).encode(), digest_size=20).hexdigest()
+        return self.spill_dir / f"{key[0]}-{name}.pkl"
+
+    def _spill(self, key: Tuple, value: Any) -> None:
+        if self.spill_dir is None:
+            return
+        try:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            path = self._spill_path(key)
+            if path.exists():
+                return
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            with tmp.open("wb") as fh:
+                pickle.dump((key, value), fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+            self.spills += 1
+        except Exception:
+            # spilling is best-effort; the entry is simply recomputed later
+            pass
+
+    def _load_spilled(self, key: Tuple) -> Any:
+        if self.spill_dir is None:
+            return None
+        path = self._spill_path(key)
+        if not path.exists():
+            return None
+        try:
+            with path.open("rb") as fh:
+                stored_key, value = pickle.load(fh)
+        except Exception:
+            return None
+        return value if stored_key == key else None
+
+    def _put(self, key: Tuple, value: Any) -> None:
+        size = _nbytes(value)
+        if size > self.max_bytes:
+            self._spill(key, value)
+            return
+        old = self._store.pop(key, None)
+        if old is not None:
+            self._bytes -= old[0]
+        self._store[key] = (size, value)
+        self._bytes += size
+        while self._bytes > self.max_bytes and self._store:
+            k, (sz, v) = self._store.popitem(last=False)
+            self._bytes -= sz
+            self.evictions += 1
+            self._spill(k, v)
+
+    def get_or_compute(self, key: Tuple, compute: Callable[[], Any]) -> Any:
+        if not self.enabled:
+            return compute()
+        with self._lock:
+            entry = self._store.get(key)
+            if entry is not None:
+                self._store.move_to_end(key)
+                self.hits += 1
+                return _copy(entry[1])
+        value = self._load_spilled(key)
+        if value is not None:
+            with self._lock:
+                self.disk_hits += 1
+                self._put(key, value)
+            return _copy(value)
+        value = compute()
+        with self._lock:
+            self.misses += 1
+            self._put(key, value)
+        return _copy(value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._store.clear()
+            self._bytes = 0
+            self.hits = self.disk_hits = self.misses = self.evictions = self.spills = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "items": len(self._store),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "spill_dir": str(self.spill_dir) if self.spill_dir else None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "spills": self.spills,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+def _env_cache() -> IndicatorCache:
+    try:
+        mb = float(os.environ.get("MYSTRIX_INDICATOR_CACHE_MB", "256"))
+    except ValueError:
+        mb = 256.0
+    return IndicatorCache(max_bytes=int(mb * (1 << 20)),
+                          spill_dir=os.environ.get("MYSTRIX_INDICATOR_CACHE_DIR") or None)
+
+
+indicator_cache = _env_cache()
+
+
+def cached(name: str, inputs: Sequence[pd.Series], params: Tuple, compute: Callable[[], Any],
+           symbol: Optional[str] = None, timeframe: Optional[str] = None) -> Any:
+    """compute() through the shared cache, keyed on the content of `inputs`."""
+    if not indicator_cache.enabled or len(inputs[0]) == 0:
+        return compute()
+    key = IndicatorCache.make_key(name, inputs, params, symbol, timeframe)
+    return indicator_cache.get_or_compute(key, compute)
+
+
+def cached_rsi_wilder(close: pd.Series, length: int, *,
+                      symbol: Optional[str] = None, timeframe: Optional[str] = None) -> pd.Series:
+    length = int(length)
+    return cached("rsi_wilder", (close,), (length,), lambda: rsi_wilder(close, length), symbol, timeframe)
+
+
+def cached_pivot_low(series: pd.Series, left: int, right: int, *,
+                     symbol: Optional[str] = None, timeframe: Optional[str] = None) -> pd.Series:
+    params = (int(left), int(right))
+    return cached("pivot_low", (series,), params, lambda: pivot_low(series, *params), symbol, timeframe)
+
+
+def cached_pivot_high(series: pd.Series, left: int, right: int, *,
+                      symbol: Optional[str] = None, timeframe: Optional[str] = None) -> pd.Series:
+    params = (int(left), int(right))
+    return cached("pivot_high", (series,), params, lambda: pivot_high(series, *params), symbol, timeframe)
+
+
+def cached_pivots(series: pd.Series, left: int, right: int, *,
+                  symbol: Optional[str] = None, timeframe: Optional[str] = None) -> Tuple[pd.Series, pd.Series]:
+    """(pivot_low, pivot_high) computed together."""
+    params = (int(left), int(right))
+    return cached("pivots", (series,), params, lambda: pivots(series, *params), symbol, timeframe)
+
+
+def cached_bull_divergence(rsi: pd.Series, low: pd.Series, left: int, right: int,
+                           range_low: int, range_up: int, *,
+                           symbol: Optional[str] = None, timeframe: Optional[str] = None) -> pd.Series:
+    params = (int(left), int(right), int(range_low), int(range_up))
+    return cached("bull_divergence", (rsi, low), params,
+                   lambda: bull_divergence(rsi, low, *params), symbol, timeframe)
+
+
+def cached_bear_divergence(rsi: pd.Series, high: pd.Series, left: int, right: int,
+                           range_low: int, range_up: int, *,
+                           symbol: Optional[str] = None, timeframe: Optional[str] = None) -> pd.Series:
+    params = (int(left), int(right), int(range_low), int(range_up))
+    return cached("bear_divergence", (rsi, high), params,
+                   lambda: bear_divergence(rsi, high, *params), symbol, timeframe)
+
+
+def cached_divergences(rsi: pd.Series, low: pd.Series, high: pd.Series, left: int, right: int,
+                       range_low: int, range_up: int, *,
+                       symbol: Optional[str] = None, timeframe: Optional[str] = None) -> Divergences:
+    """Bull and bear divergences with their pivots, from one divergences() sweep."""
+    params = (int(left), int(right), int(range_low), int(range_up))
+    return cached("divergences", (rsi, low, high), params,
+                   lambda: divergences(rsi, low, high, *params), symbol, timeframe)
@@ -0,0 +1,160 @@
+"""
+Incremental indicators kept per (symbol, timeframe) and persisted in SQLite.
+
+An IndicatorSet feeds closed bars into the engine.incremental objects (RSI,
+EMA, ATR, rolling max/min, Bollinger) and returns the latest value of each,
+equal to the batch indicator over every bar fed so far. Its state is saved
+to the derived_info table under "indicator_state:<symbol>:<timeframe>", so
+a restarted process only feeds the bars it has not seen instead of
+re-deriving a long warm-up window. engine.gate's incremental scan keeps
+one per symbol.
+
+spec maps an output name to (kind, *params):
+    ("rsi", length)          rsi_wilder(close, length)
+    ("ema", length[, column])   ema(df[column], length), column default close
+    ("atr", length)          atr(df, length)
+    ("max", window, column)  df[column].rolling(window).max()
+    ("min", window, column)  df[column].rolling(window).min()
+    ("bollinger", period, dev)  bollinger(close, period, dev) as
+                                <name>_upper, <name>_mid, <name>_lower
+    ("mom", window)          close.pct_change().rolling(window).mean()
+    ("extent", source, fill)    <name>_min, <name>_max: min/max so far of the
+                                output `source` (listed earlier), NaN as fill
+"""
+from __future__ import annotations
+
+import json
+import logging
+from typing import Any, Dict, Mapping, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from .incremental import Atr, Bollinger, Ema, Extent, MeanReturn, RollingExtreme, RsiWilder
+from .storage import load_derived, save_derived
+
+log = logging.getLogger("engine.indicator_state")
+
+DEFAULT_SPEC: Dict[str, Tuple] = {
+    "rsi": ("rsi", 14),
+    "ema21": ("ema", 21),
+    "ema55": ("ema", 55),
+    "atr": ("atr", 14),
+    "hh20": ("max", 20, "high"),
+    "ll20": ("min", 20, "low"),
+}
+
+_CLASSES = {"rsi": RsiWilder, "ema": Ema, "atr": Atr, "bollinger": Bollinger,
+            "max": RollingExtreme, "min": RollingExtreme, "mom": MeanReturn, "extent": Extent}
+
+
+def _make(kind: str, params: Sequence[Any]):
+    if kind in ("rsi", "ema", "atr", "mom"):
+        return _CLASSES[kind](int(params[0]))
+    if kind in ("max", "min"):
+        return RollingExtreme(int(params[0]), kind=kind)
+    if kind == "bollinger":
+        return Bollinger(int(params[0]), float(params[1]) if len(params) > 1 else 2.0)
+    if kind == "extent":
+        return Extent(float(params[1]) if len(params) > 1 else 0.0)
+    raise ValueError(f"unknown indicator kind {kind!r}")
+
+
+def _ts_ms(ts: Any) -> int:
+    return int(pd.Timestamp(ts).value // 1_000_000)
+
+
+class IndicatorSet:
+    def __init__(self, symbol: str, timeframe: str, spec: Optional[Mapping[str, Sequence[Any]]] = None):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.spec: Dict[str, Tuple] = {k: tuple(v) for k, v in (spec or DEFAULT_SPEC).items()}
+        self._ind = {name: _make(v[0], v[1:]) for name, v in self.spec.items()}
+        self.last_ts: Optional[int] = None  # epoch ms of the last bar fed
+        self.bars = 0  # bars fed so far
+        self.values: Dict[str, float] = {}
+
+    @property
+    def key(self) -> str:
+        return f"indicator_state:{self.symbol}:{self.timeframe}"
+
+    def _apply(self, bar: Mapping[str, Any], commit: bool) -> Dict[str, float]:
+        out: Dict[str, float] = {}
+        for name, (kind, *params) in self.spec.items():
+            ind = self._ind[name]
+            step = ind.update if commit else ind.peek
+            if kind == "atr":
+                out[name] = step(bar["high"], bar["low"], bar["close"])
+            elif kind in ("max", "min", "ema"):
+                out[name] = step(bar[params[1] if len(params) > 1 else "close"])
+            elif kind == "bollinger":
+                out[f"{name}_upper"], out[f"{name}_mid"], out[f"{name}_lower"] = step(bar["close"])
+            elif kind == "extent":
+                out[f"{name}_min"], out[f"{name}_max"] = step(out[params[0]])
+            else:
+                out[name] = step(bar["close"])
+        return out
+
+    def update(self, ts: Any, bar: Mapping[str, Any]) -> Dict[str, float]:
+        """Commit one closed bar; bars at or before last_ts are ignored."""
+        t = _ts_ms(ts)
+        if self.last_ts is not None and t <= self.last_ts:
+            return self.values
+        self.values = self._apply(bar, commit=True)
+        self.last_ts = t
+        self.bars += 1
+        return self.values
+
+    def peek(self, bar: Mapping[str, Any]) -> Dict[str, float]:
+        """Values with a still-forming bar on top, without committing it."""
+        return self._apply(bar, commit=False)
+
+    def catch_up(self, df: pd.DataFrame) -> Dict[str, float]:
+        """Feed the rows of df newer than last_ts (closed bars, in order)."""
+        if df.empty:
+            return self.values
+        rows = df
+        if self.last_ts is not None:
+            rows = df[df.index > pd.Timestamp(self.last_ts, unit="ms", tz=df.index.tz)]
+        cols = {c: rows[c].to_numpy(dtype=float) for c in ("high", "low", "close") if c in rows.columns}
+        for c in {v[2] for v in self.spec.values() if v[0] in ("max", "min", "ema") and len(v) > 2}:
+            cols.setdefault(c, rows[c].to_numpy(dtype=float))
+        for i, ts in enumerate(rows.index):
+            self.update(ts, {c: a[i] for c, a in cols.items()})
+        return self.values
+
+    def state(self) -> dict:
+        return {
+            "symbol": self.symbol,
+            "timeframe": self.timeframe,
+            "spec": {k: list(v) for k, v in self.spec.items()},
+            "last_ts": self.last_ts,
+            "bars": self.bars,
+            "indicators": {name: ind.state() for name, ind in self._ind.items()},
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "IndicatorSet":
+        obj = cls(state["symbol"], state["timeframe"], state["spec"])
+        for name, (kind, *_params) in obj.spec.items():
+            obj._ind[name] = _CLASSES[kind].from_state(state["indicators"][name])
+        obj.last_ts = state["last_ts"]
+        obj.bars = int(state.get("bars", 0))
+        return obj
+
+    def save(self) -> None:
+        save_derived(self.key, json.dumps(self.state(), allow_nan=False))
+
+    @classmethod
+    def load(cls, symbol: str, timeframe: str,
+             spec: Optional[Mapping[str, Sequence[Any]]] = None) -> "IndicatorSet":
+        """Saved set for (symbol, timeframe), or a fresh one if none matches spec."""
+        fresh = cls(symbol, timeframe, spec)
+        try:
+            raw = load_derived(fresh.key)
+            if raw:
+                state = json.loads(raw)
+                if {k: tuple(v) for k, v in state["spec"].items()} == fresh.spec:
+                    return cls.from_state(state)
+        except Exception:
+            log.exception("loading %s failed; starting fresh", fresh.key)
+        return fresh
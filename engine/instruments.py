@@ -0,0 +1,324 @@
+"""
+Local instrument metadata (tick size, qty step, min/max qty, min notional).
+
+Exchange filters are kept in the SQLite `instruments` table and mirrored in
+memory, so mintick() and the autotrader's order filters are a dict lookup
+with no network on the hot path. Each exchange is refreshed as a whole in a
+background thread once its last refresh is older than the TTL; lookups
+never wait for it. An exchange that has never been refreshed (fresh
+install, CLI runs) is loaded once, blocking, by the first get(..., wait=True)
+so mintick() does not hand out a default tick for a symbol it could know.
+
+Exchanges:
+    "binance"       ccxt markets (what mintick() has always used)
+    "bybit"         Bybit v5 linear instruments on mainnet
+    "bybit@<host>"  the same for another Bybit base URL (testnet, demo)
+
+Environment:
+    MYSTRIX_INSTRUMENT_TTL  refresh interval in seconds (default 21600)
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from .bybit_data import BYBIT_MAINNET, fetch_instrument_info, fetch_instruments_info
+from .storage import _WRITE_LOCK, _conn, load_derived, save_derived
+
+log = logging.getLogger("engine.instruments")
+
+
+@dataclass(frozen=True)
+class Instrument:
+    exchange: str
+    symbol: str  # compact form, e.g. BTCUSDT
+    tick_size: Optional[str] = None
+    qty_step: Optional[str] = None
+    min_qty: Optional[str] = None
+    max_qty: Optional[str] = None
+    min_notional: Optional[str] = None
+    updated_at: int = 0
+
+
+def compact_symbol(symbol: str) -> str:
+    """BTC/USDT, BTC/USDT:USDT and btcusdt all map to BTCUSDT."""
+    return str(symbol).split(":", 1)[0].replace("/", "").replace("-", "").upper()
+
+
+def bybit_exchange(base_url: Optional[str] = None) -> str:
+    """Exchange key for a Bybit REST base URL."""
+    if not base_url or base_url.rstrip("/") == BYBIT_MAINNET:
+        return "bybit"
+    return "bybit@" + (urlparse(base_url).netloc or base_url)
+
+
+def _text(val: Any) -> Optional[str]:
+    if val is None or val == "":
+        return None
+    return str(val)
+
+
+def _from_bybit(exchange: str, item: Dict[str, Any], now: int) -> Optional[Instrument]:
+    sym = item.get("symbol")
+    if not sym:
+        return None
+    price = item.get("priceFilter") or {}
+    lot = item.get("lotSizeFilter") or {}
+    return Instrument(
+        exchange=exchange,
+        symbol=compact_symbol(sym),
+        tick_size=_text(price.get("tickSize")),
+        qty_step=_text(lot.get("qtyStep")),
+        min_qty=_text(lot.get("minOrderQty")),
+        max_qty=_text(lot.get("maxOrderQty")),
+        min_notional=_text(lot.get("minNotionalValue") or lot.get("minNotional")),
+        updated_at=now,
+    )
+
+
+def _precision_step(precision: Any) -> Optional[str]:
+    # ccxt precision is either a step (0.01) or a number of decimals (2)
+    if precision is None:
+        return None
+    try:
+        p = float(precision)
+    except (TypeError, ValueError):
+        return None
+    if p >= 1 and p == int(p):
+        return repr(10 ** (-int(p)))
+    return repr(p)
+
+
+def _from_ccxt(exchange: str, market: Dict[str, Any], now: int) -> Optional[Instrument]:
+    sym = market.get("symbol")
+    if not sym:
+        return None
+    info = market.get("info") or {}
+    tick = None
+    for key in ("tickSize", "tick_size", "minPrice", "min_price"):
+        if key in info:
+            try:
+                float(info[key])
+                tick = str(info[key])
+                break
+            except Exception:
+                pass
+    precision = market.get("precision") or {}
+    limits = market.get("limits") or {}
+    if tick is None and precision.get("price") is not None:
+        # same resolution order and arithmetic as the old live mintick() lookup
+        try:
+            tick = repr(10 ** (-int(precision["price"])))
+        except Exception:
+            try:
+                tick = repr(10 ** (-float(precision["price"])))
+            except Exception:
+                tick = None
+    if tick is None:
+        tick = _text((limits.get("price") or {}).get("min"))
+    amount = limits.get("amount") or {}
+    return Instrument(
+        exchange=exchange,
+        symbol=compact_symbol(sym),
+        tick_size=tick,
+        qty_step=_precision_step(precision.get("amount")),
+        min_qty=_text(amount.get("min")),
+        max_qty=_text(amount.get("max")),
+        min_notional=_text((limits.get("cost") or {}).get("min")),
+        updated_at=now,
+    )
+
+
+def _fetch_binance() -> List[Instrument]:
+    from .data import _get_exchange, ccxt
+
+    if ccxt is None:
+        return []
+    ex = _get_exchange()
+    markets = ex.load_markets()
+    now = int(time.time())
+    out: Dict[str, Instrument] = {}
+    # spot first, so BTC/USDT wins over BTC/USDT:USDT for the compact key
+    for m in sorted(markets.values(), key=lambda m: 0 if m.get("spot") else 1):
+        inst = _from_ccxt("binance", m, now)
+        if inst is not None and inst.symbol not in out:
+            out[inst.symbol] = inst
+    return list(out.values())
+
+
+def _bybit_base_url(exchange: str) -> str:
+    if exchange == "bybit":
+        return BYBIT_MAINNET
+    return "https://" + exchange.split("@", 1)[1]
+
+
+def _fetch_bybit(exchange: str) -> List[Instrument]:
+    items = fetch_instruments_info("linear", base_url=_bybit_base_url(exchange))
+    now = int(time.time())
+    return [i for i in (_from_bybit(exchange, it, now) for it in items) if i is not None]
+
+
+def _fetch(exchange: str) -> List[Instrument]:
+    if exchange == "binance":
+        return _fetch_binance()
+    if exchange == "bybit" or exchange.startswith("bybit@"):
+        return _fetch_bybit(exchange)
+    raise ValueError(f"unknown exchange {exchange!r}")
+
+
+class InstrumentStore:
+    def __init__(self, ttl_seconds: Optional[int] = None):
+        if ttl_seconds is None:
+            try:
+                ttl_seconds = int(os.environ.get("MYSTRIX_INSTRUMENT_TTL", "21600"))
+            except ValueError:
+                ttl_seconds = 21600
+        self.ttl = int(ttl_seconds)
+        self._mem: Dict[Tuple[str, str], Instrument] = {}
+        self._loaded: set = set()
+        self._refreshed: Dict[str, float] = {}
+        self._running: set = set()
+        self._lock = threading.Lock()
+        # one refresh at a time per exchange (background or blocking)
+        self._gates: Dict[str, threading.Lock] = {}
+
+    def _load(self, exchange: str) -> None:
+        """Pull one exchange from SQLite into memory (once per process)."""
+        if exchange in self._loaded:
+            return
+        with self._lock:
+            if exchange in self._loaded:
+                return
+            try:
+                with _conn() as con:
+                    rows = con.execute(
+                        "SELECT exchange, symbol, tick_size, qty_step, min_qty, max_qty, min_notional, updated_at "
+                        "FROM instruments WHERE exchange=?", (exchange,)
+                    ).fetchall()
+                stamp = load_derived(f"instruments_refreshed:{exchange}")
+                for row in rows:
+                    inst = Instrument(*row[:7], updated_at=int(row[7] or 0))
+                    self._mem[(exchange, inst.symbol)] = inst
+                self._refreshed[exchange] = float(stamp) if stamp else 0.0
+            except Exception:
+                log.exception("loading instruments for %s failed", exchange)
+                self._refreshed.setdefault(exchange, 0.0)
+            self._loaded.add(exchange)
+
+    def _gate(self, exchange: str) -> threading.Lock:
+        with self._lock:
+            return self._gates.setdefault(exchange, threading.Lock())
+
+    def get(self, exchange: str, symbol: str, wait: bool = False) -> Optional[Instrument]:
+        """In-memory lookup; schedules a background refresh when stale.
+
+        wait=True first loads an exchange that has never been refreshed,
+        blocking (once per process; concurrent callers wait for the same load).
+        """
+        self._load(exchange)
+        if wait and not self._refreshed.get(exchange):
+            self._refresh_first(exchange)
+        self.ensure_fresh(exchange)
+        return self._mem.get((exchange, compact_symbol(symbol)))
+
+    def _refresh_first(self, exchange: str) -> None:
+        with self._gate(exchange):
+            if self._refreshed.get(exchange):
+                return  # another caller or the background refresh got there first
+            try:
+                n = self.refresh(exchange)
+                log.info("instruments loaded for %s: %d", exchange, n)
+            except Exception as exc:
+                log.warning("instrument load for %s failed: %s", exchange, exc)
+                with self._lock:
+                    self._refreshed[exchange] = time.time() - self.ttl + 300
+
+    def put_many(self, instruments: Iterable[Instrument]) -> int:
+        items = list(instruments)
+        if not items:
+            return 0
+        rows = [(i.exchange, i.symbol, i.tick_size, i.qty_step, i.min_qty, i.max_qty, i.min_notional, i.updated_at)
+                for i in items]
+        with _WRITE_LOCK:
+            with _conn() as con:
+                con.executemany(
+                    "INSERT OR REPLACE INTO instruments(exchange, symbol, tick_size, qty_step, min_qty, max_qty, "
+                    "min_notional, updated_at) VALUES (?,?,?,?,?,?,?,?)", rows
+                )
+        with self._lock:
+            for i in items:
+                self._mem[(i.exchange, i.symbol)] = i
+        return len(items)
+
+    def refresh(self, exchange: str) -> int:
+        """Fetch all instruments of an exchange now and store them."""
+        items = _fetch(exchange)
+        n = self.put_many(items)
+        now = time.time()
+        if items:
+            save_derived(f"instruments_refreshed:{exchange}", str(now))
+        with self._lock:
+            self._refreshed[exchange] = now
+        return n
+
+    def _refresh_bg(self, exchange: str) -> None:
+        try:
+            with self._gate(exchange):
+                n = self.refresh(exchange)
+            log.info("instruments refreshed for %s: %d", exchange, n)
+        except Exception as exc:
+            log.warning("instrument refresh for %s failed: %s", exchange, exc)
+            with self._lock:
+                # retry after a short back-off instead of on every lookup
+                self._refreshed[exchange] = time.time() - self.ttl + 300
+        finally:
+            with self._lock:
+                self._running.discard(exchange)
+
+    def ensure_fresh(self, exchange: str) -> None:
+        """Start a background refresh if the exchange is older than the TTL."""
+        if time.time() - self._refreshed.get(exchange, 0.0) < self.ttl:
+            return
+        with self._lock:
+            if exchange in self._running:
+                return
+            self._running.add(exchange)
+        threading.Thread(target=self._refresh_bg, args=(exchange,), daemon=True,
+                         name=f"instruments-{exchange}").start()
+
+    def warm(self, *exchanges: str) -> None:
+        """Load exchanges from SQLite and refresh stale ones in the background."""
+        for exchange in exchanges:
+            self._load(exchange)
+            self.ensure_fresh(exchange)
+
+    def fetch_one(self, exchange: str, symbol: str) -> Optional[Instrument]:
+        """Blocking single-symbol fetch for a cold miss (Bybit only)."""
+        if exchange == "bybit" or exchange.startswith("bybit@"):
+            item = fetch_instrument_info(symbol, category="linear", base_url=_bybit_base_url(exchange))
+            inst = _from_bybit(exchange, item, int(time.time())) if item else None
+            if inst is not None:
+                self.put_many([inst])
+            return inst
+        return None
+
+
+instrument_store = InstrumentStore()
+
+
+def bybit_instrument(symbol: str, base_url: Optional[str] = None) -> Optional[Instrument]:
+    """Bybit linear filters for order placement.
+
+    Served from memory; only a symbol the last full refresh did not include
+    falls back to one instrument-info request, whose result is stored.
+    """
+    exchange = bybit_exchange(base_url)
+    inst = instrument_store.get(exchange, symbol)
+    if inst is None:
+        inst = instrument_store.fetch_one(exchange, symbol)
+    return inst
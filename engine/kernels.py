@@ -0,0 +1,602 @@
+"""
+Array kernels for the Pine engines.
+
+The bar loops only need a handful of scalars per bar, so the kernels take the
+pre-computed series as contiguous NumPy arrays and run the state machine
+without touching pandas. When numba is installed the kernels are compiled on
+first use; otherwise the very same functions run as plain Python over arrays.
+
+Kernels return fixed-width event buffers (bar index, type code, price, qty,
+stop, pnl, equity after the event); the engines turn those into trade dicts.
+A kernel runs over a bar range [start, end) and keeps its state in a small
+float64 array, so a run can be split into pieces (for progress reports)
+without changing a single event.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+try:
+    import numba
+except Exception:
+    numba = None
+
+
+EV_ENTER = 0
+EV_EXIT_NORMAL = 1
+EV_EXIT_SL = 2
+EV_EXIT_HALF_TP = 3
+
+EVENT_TYPES = ("enter", "exit_normal", "exit_sl", "exit_half_tp")
+
+SIDE_LONG = 0
+SIDE_SHORT = 1
+SIDES = ("long", "short")
+
+
+def _jit(fn):
+    if numba is None:
+        return fn
+    return numba.njit(cache=True, nogil=True)(fn)
+
+
+def jit_enabled() -> bool:
+    return numba is not None
+
+
+# Kernel state carried from one bar range to the next, one float64 slot per
+# name (flags as 0/1, counters as whole numbers).
+_LONG_STATE = ("k", "awaiting_div_bear", "awaiting_bars_bear", "in_pos", "entry", "stop", "qty",
+               "in_cooldown", "cd_bars_left", "runup_peak", "equity")
+_HEDGE_STATE = ("k", "ke", "kl", "ks", "equity",
+                "in_long", "long_entry", "long_stop", "long_qty", "long_peak", "long_half_tp",
+                "in_short", "short_entry", "short_stop", "short_qty", "short_peak", "short_half_tp",
+                "eqL", "eqS", "cdL", "cdS")
+
+
+def _initial_state(names, **values) -> np.ndarray:
+    state = np.zeros(len(names), dtype=np.float64)
+    for name, val in values.items():
+        state[names.index(name)] = val
+    return state
+
+
+def _bar_ranges(n: int, progress) -> list:
+    """[start, end) pieces for one kernel run: all n bars, or about 100 pieces when reporting."""
+    if progress is None:
+        return [(0, n)]
+    step = max(1, n // 100)
+    return [(a, min(a + step, n)) for a in range(0, n, step)]
+
+
+def _report(progress, done: int, n: int, equity: float, types: np.ndarray) -> None:
+    # same partial metrics as the short engine's bar loop reports
+    if progress is not None and done < n:
+        progress(done, n, {"Ending Equity": round(float(equity), 2),
+                           "Num Trades": int(np.count_nonzero(types == EV_ENTER))})
+
+
+@_jit
+def _pine_long_kernel(close, low, bull, bear, setup_bear, armed, gate, wave_low,
+                      max_wait_bars, cooldown_bars, use_pct_stop, min_stop_dist,
+                      percent_risk, fee_factor, initial_capital,
+                      lock_arm_pct, lock_profit_pct,
+                      ev_bar, ev_type, ev_price, ev_qty, ev_stop, ev_pnl, ev_equity,
+                      start, end, state):
+    # bars [start, end) continue from `state` (see _LONG_STATE) and store back into it
+    k = int(state[0])
+    awaiting_div_bear = state[1] != 0.0
+    awaiting_bars_bear = int(state[2])
+    in_pos = state[3] != 0.0
+    entry = state[4]
+    stop = state[5]
+    qty = state[6]
+    in_cooldown = state[7] != 0.0
+    cd_bars_left = int(state[8])
+    runup_peak = state[9]
+    equity = state[10]
+
+    for i in range(start, end):
+        price = close[i]
+
+        # setups
+        if in_pos and setup_bear[i]:
+            awaiting_div_bear = True
+            awaiting_bars_bear = 0
+        if awaiting_div_bear:
+            awaiting_bars_bear += 1
+            if awaiting_bars_bear > max_wait_bars:
+                awaiting_div_bear = False
+                awaiting_bars_bear = 0
+
+        # entry
+        if (not in_pos) and bull[i] and armed[i] and (not in_cooldown) and gate[i]:
+            entry_price = price
+            pct_stop_price = entry_price * (1 - use_pct_stop)
+            stop_price = pct_stop_price
+            wl = wave_low[i]
+            if not np.isnan(wl):
+                stop_price = pct_stop_price if pct_stop_price < wl else wl
+            if stop_price >= entry_price:
+                stop_price = pct_stop_price
+            min_allowed = entry_price - min_stop_dist
+            if stop_price > min_allowed:
+                stop_price = min_allowed
+
+            risk_val = equity * percent_risk
+            q = risk_val / (entry_price if entry_price > 1e-9 else 1e-9)
+            qty = q if q > 0.0 else 0.0
+            fee = entry_price * qty * fee_factor
+            equity -= fee
+
+            in_pos = True
+            entry = entry_price
+            stop = stop_price
+            runup_peak = 0.0
+            ev_bar[k] = i
+            ev_type[k] = EV_ENTER
+            ev_price[k] = entry_price
+            ev_qty[k] = qty
+            ev_stop[k] = stop_price
+            ev_pnl[k] = np.nan
+            ev_equity[k] = equity
+            k += 1
+
+        # exits: normal via bear divergence after OB setup
+        if in_pos and awaiting_div_bear and bear[i]:
+            exit_price = price
+            pnl = (exit_price - entry) * qty
+            fee = exit_price * qty * fee_factor
+            pnl -= fee
+            equity += pnl
+            ev_bar[k] = i
+            ev_type[k] = EV_EXIT_NORMAL
+            ev_price[k] = exit_price
+            ev_qty[k] = qty
+            ev_stop[k] = np.nan
+            ev_pnl[k] = pnl
+            ev_equity[k] = equity
+            k += 1
+            in_pos = False
+            awaiting_div_bear = False
+            awaiting_bars_bear = 0
+
+        # stop loss
+        if in_pos and low[i] <= stop:
+            exit_price = stop
+            pnl = (exit_price - entry) * qty
+            fee = exit_price * qty * fee_factor
+            pnl -= fee
+            equity += pnl
+            ev_bar[k] = i
+            ev_type[k] = EV_EXIT_SL
+            ev_price[k] = exit_price
+            ev_qty[k] = qty
+            ev_stop[k] = np.nan
+            ev_pnl[k] = pnl
+            ev_equity[k] = equity
+            k += 1
+            in_pos = False
+            cd_bars_left = cooldown_bars
+            in_cooldown = cd_bars_left > 0
+
+        # experimental: lock profit stop after runup >= arm
+        if in_pos:
+            ru = (price / entry - 1.0) * 100.0 if entry != 0.0 else 0.0
+            if ru > runup_peak:
+                runup_peak = ru
+            if (lock_arm_pct > 0) and (lock_profit_pct > 0) and (runup_peak >= lock_arm_pct):
+                lock_st = entry * (1 + lock_profit_pct / 100.0)
+                if lock_st > price:
+                    lock_st = price
+                if lock_st > stop:
+                    stop = lock_st
+
+        # cooldown tick
+        if in_cooldown and not in_pos:
+            cd_bars_left = cd_bars_left - 1 if cd_bars_left > 1 else 0
+            if cd_bars_left == 0:
+                in_cooldown = False
+
+    state[0] = k
+    state[1] = 1.0 if awaiting_div_bear else 0.0
+    state[2] = awaiting_bars_bear
+    state[3] = 1.0 if in_pos else 0.0
+    state[4] = entry
+    state[5] = stop
+    state[6] = qty
+    state[7] = 1.0 if in_cooldown else 0.0
+    state[8] = cd_bars_left
+    state[9] = runup_peak
+    state[10] = equity
+    return k, equity
+
+
+def pine_long_kernel(close: np.ndarray, low: np.ndarray, bull: np.ndarray, bear: np.ndarray,
+                     setup_bear: np.ndarray, armed: np.ndarray, gate: np.ndarray, wave_low: np.ndarray,
+                     max_wait_bars: int, cooldown_bars: int, use_pct_stop: float, min_stop_dist: float,
+                     percent_risk: float, fee_factor: float, initial_capital: float,
+                     lock_arm_pct: float = 0.0, lock_profit_pct: float = 0.0,
+                     progress: Optional[Callable[[int, int, Dict[str, Any]], None]] = None):
+    """Run the PineLongEngine state machine over arrays.
+
+    Returns (events, ending_equity) where events is a dict of equally sized
+    arrays: bar, type (EV_* codes), price, qty, stop, pnl, equity.
+    With progress set the bars run in about 100 pieces that carry the
+    kernel state over, with progress(bars_done, bars, {"Ending Equity",
+    "Num Trades"}) after each but the last.
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    low = np.ascontiguousarray(low, dtype=np.float64)
+    bull = np.ascontiguousarray(bull, dtype=np.bool_)
+    bear = np.ascontiguousarray(bear, dtype=np.bool_)
+    setup_bear = np.ascontiguousarray(setup_bear, dtype=np.bool_)
+    armed = np.ascontiguousarray(armed, dtype=np.bool_)
+    gate = np.ascontiguousarray(gate, dtype=np.bool_)
+    wave_low = np.ascontiguousarray(wave_low, dtype=np.float64)
+    # entries only happen on bull bars and each entry closes at most once
+    cap = 2 * int(bull.sum()) + 2
+    ev_bar = np.empty(cap, dtype=np.int64)
+    ev_type = np.empty(cap, dtype=np.int8)
+    ev_price = np.empty(cap, dtype=np.float64)
+    ev_qty = np.empty(cap, dtype=np.float64)
+    ev_stop = np.empty(cap, dtype=np.float64)
+    ev_pnl = np.empty(cap, dtype=np.float64)
+    ev_equity = np.empty(cap, dtype=np.float64)
+    n = close.shape[0]
+    state = _initial_state(_LONG_STATE, entry=np.nan, stop=np.nan, equity=float(initial_capital))
+    k, equity = 0, float(initial_capital)
+    for a, b in _bar_ranges(n, progress):
+        k, equity = _pine_long_kernel(
+            close, low, bull, bear, setup_bear, armed, gate, wave_low,
+            int(max_wait_bars), int(cooldown_bars), float(use_pct_stop), float(min_stop_dist),
+            float(percent_risk), float(fee_factor), float(initial_capital),
+            float(lock_arm_pct), float(lock_profit_pct),
+            ev_bar, ev_type, ev_price, ev_qty, ev_stop, ev_pnl, ev_equity,
+            a, b, state,
+        )
+        _report(progress, b, n, equity, ev_type[:k])
+    events = {
+        "bar": ev_bar[:k],
+        "type": ev_type[:k],
+        "price": ev_price[:k],
+        "qty": ev_qty[:k],
+        "stop": ev_stop[:k],
+        "pnl": ev_pnl[:k],
+        "equity": ev_equity[:k],
+    }
+    return events, float(equity)
+
+
+@_jit
+def _hedge_kernel(close, low, high, bull, bear, setup_bear, setup_bull, lt_recent, st_recent,
+                  initial_capital, size_equity_pct, fee_factor, init_stop_pct, tp_half_pct,
+                  cooldown_bars, lock_arm_pct, lock_profit_pct,
+                  ev_bar, ev_side, ev_type, ev_price, ev_qty, ev_stop, ev_pnl,
+                  eq_bar, eq_val, eql_bar, eql_val, eqs_bar, eqs_val,
+                  start, end, state):
+    # bars [start, end) continue from `state` (see _HEDGE_STATE) and store back into it
+    k = int(state[0])
+    ke = int(state[1])
+    kl = int(state[2])
+    ks = int(state[3])
+    equity = state[4]
+    in_long = state[5] != 0.0
+    long_entry = state[6]
+    long_stop = state[7]
+    long_qty = state[8]
+    long_peak = state[9]
+    long_half_tp = state[10] != 0.0
+    in_short = state[11] != 0.0
+    short_entry = state[12]
+    short_stop = state[13]
+    short_qty = state[14]
+    short_peak = state[15]
+    short_half_tp = state[16] != 0.0
+    eqL = state[17]
+    eqS = state[18]
+    cdL = int(state[19])
+    cdS = int(state[20])
+
+    for i in range(start, end):
+        px = close[i]
+        # cooldown ticks (decrement when flat on that side)
+        if (not in_long) and cdL > 0:
+            cdL -= 1
+        if (not in_short) and cdS > 0:
+            cdS -= 1
+
+        # --- long: manage
+        if in_long:
+            ru = (px / long_entry - 1.0) * 100.0
+            if ru > long_peak:
+                long_peak = ru
+            if (lock_arm_pct > 0) and (lock_profit_pct > 0) and (long_peak >= lock_arm_pct):
+                lock_price = long_entry * (1 + lock_profit_pct / 100.0)
+                if lock_price > px:
+                    lock_price = px
+                if lock_price > long_stop:
+                    long_stop = lock_price
+            # partial TP (70%)
+            if (not long_half_tp) and (long_peak >= tp_half_pct):
+                part_qty = long_qty * 0.70
+                pnl = (px - long_entry) * part_qty
+                fee = (px * part_qty + long_entry * part_qty) * fee_factor
+                pnl -= fee
+                equity += pnl
+                eq_bar[ke] = i
+                eq_val[ke] = equity
+                ke += 1
+                eqL += pnl
+                eql_bar[kl] = i
+                eql_val[kl] = eqL
+                kl += 1
+                ev_bar[k] = i
+                ev_side[k] = SIDE_LONG
+                ev_type[k] = EV_EXIT_HALF_TP
+                ev_price[k] = px
+                ev_qty[k] = part_qty
+                ev_stop[k] = np.nan
+                ev_pnl[k] = pnl
+                k += 1
+                long_qty -= part_qty
+                long_half_tp = True
+            if low[i] <= long_stop:
+                # fill price must be within bar range
+                exit_p = long_stop
+                if low[i] > exit_p:
+                    exit_p = low[i]
+                if high[i] < exit_p:
+                    exit_p = high[i]
+                pnl = (exit_p - long_entry) * long_qty
+                fee = (exit_p * long_qty + long_entry * long_qty) * fee_factor
+                pnl -= fee
+                equity += pnl
+                eq_bar[ke] = i
+                eq_val[ke] = equity
+                ke += 1
+                eqL += pnl
+                eql_bar[kl] = i
+                eql_val[kl] = eqL
+                kl += 1
+                ev_bar[k] = i
+                ev_side[k] = SIDE_LONG
+                ev_type[k] = EV_EXIT_SL
+                ev_price[k] = exit_p
+                ev_qty[k] = long_qty
+                ev_stop[k] = np.nan
+                ev_pnl[k] = pnl
+                k += 1
+                in_long = False
+                cdL = cooldown_bars
+        # --- long: normal exit
+        if in_long and setup_bear[i] and bear[i]:
+            pnl = (px - long_entry) * long_qty
+            fee = (px * long_qty + long_entry * long_qty) * fee_factor
+            pnl -= fee
+            equity += pnl
+            eq_bar[ke] = i
+            eq_val[ke] = equity
+            ke += 1
+            ev_bar[k] = i
+            ev_side[k] = SIDE_LONG
+            ev_type[k] = EV_EXIT_NORMAL
+            ev_price[k] = px
+            ev_qty[k] = long_qty
+            ev_stop[k] = np.nan
+            ev_pnl[k] = pnl
+            k += 1
+            in_long = False
+
+        # --- short: manage
+        if in_short:
+            ru = (short_entry / px - 1.0) * 100.0
+            if ru > short_peak:
+                short_peak = ru
+            if (lock_arm_pct > 0) and (lock_profit_pct > 0) and (short_peak >= lock_arm_pct):
+                lock_price_s = short_entry * (1 - lock_profit_pct / 100.0)
+                if lock_price_s < short_stop:
+                    short_stop = lock_price_s
+            if (not short_half_tp) and (short_peak >= tp_half_pct):
+                part_qty = short_qty * 0.70
+                pnl = (short_entry - px) * part_qty
+                fee = (px * part_qty + short_entry * part_qty) * fee_factor
+                pnl -= fee
+                equity += pnl
+                eq_bar[ke] = i
+                eq_val[ke] = equity
+                ke += 1
+                eqS += pnl
+                eqs_bar[ks] = i
+                eqs_val[ks] = eqS
+                ks += 1
+                ev_bar[k] = i
+                ev_side[k] = SIDE_SHORT
+                ev_type[k] = EV_EXIT_HALF_TP
+                ev_price[k] = px
+                ev_qty[k] = part_qty
+                ev_stop[k] = np.nan
+                ev_pnl[k] = pnl
+                k += 1
+                short_qty -= part_qty
+                short_half_tp = True
+            if high[i] >= short_stop:
+                exit_p = short_stop
+                if low[i] > exit_p:
+                    exit_p = low[i]
+                if high[i] < exit_p:
+                    exit_p = high[i]
+                pnl = (short_entry - exit_p) * short_qty
+                fee = (exit_p * short_qty + short_entry * short_qty) * fee_factor
+                pnl -= fee
+                equity += pnl
+                eq_bar[ke] = i
+                eq_val[ke] = equity
+                ke += 1
+                eqS += pnl
+                eqs_bar[ks] = i
+                eqs_val[ks] = eqS
+                ks += 1
+                ev_bar[k] = i
+                ev_side[k] = SIDE_SHORT
+                ev_type[k] = EV_EXIT_SL
+                ev_price[k] = exit_p
+                ev_qty[k] = short_qty
+                ev_stop[k] = np.nan
+                ev_pnl[k] = pnl
+                k += 1
+                in_short = False
+                cdS = cooldown_bars
+        if in_short and setup_bull[i] and bull[i]:
+            pnl = (short_entry - px) * short_qty
+            fee = (px * short_qty + short_entry * short_qty) * fee_factor
+            pnl -= fee
+            equity += pnl
+            eq_bar[ke] = i
+            eq_val[ke] = equity
+            ke += 1
+            ev_bar[k] = i
+            ev_side[k] = SIDE_SHORT
+            ev_type[k] = EV_EXIT_NORMAL
+            ev_price[k] = px
+            ev_qty[k] = short_qty
+            ev_stop[k] = np.nan
+            ev_pnl[k] = pnl
+            k += 1
+            in_short = False
+
+        # --- entries (can be concurrent / hedged)
+        if (not in_long) and (cdL <= 0) and bull[i] and lt_recent[i]:
+            long_entry = px
+            q = (equity * size_equity_pct) / (long_entry if long_entry > 1e-9 else 1e-9)
+            long_qty = q if q > 0.0 else 0.0
+            fee = long_entry * long_qty * fee_factor
+            equity -= fee
+            long_stop = long_entry * (1 - init_stop_pct / 100.0)
+            long_peak = 0.0
+            long_half_tp = False
+            in_long = True
+            ev_bar[k] = i
+            ev_side[k] = SIDE_LONG
+            ev_type[k] = EV_ENTER
+            ev_price[k] = long_entry
+            ev_qty[k] = long_qty
+            ev_stop[k] = long_stop
+            ev_pnl[k] = np.nan
+            k += 1
+
+        if (not in_short) and (cdS <= 0) and bear[i] and st_recent[i]:
+            short_entry = px
+            q = (equity * size_equity_pct) / (short_entry if short_entry > 1e-9 else 1e-9)
+            short_qty = q if q > 0.0 else 0.0
+            fee = short_entry * short_qty * fee_factor
+            equity -= fee
+            short_stop = short_entry * (1 + init_stop_pct / 100.0)
+            short_peak = 0.0
+            short_half_tp = False
+            in_short = True
+            ev_bar[k] = i
+            ev_side[k] = SIDE_SHORT
+            ev_type[k] = EV_ENTER
+            ev_price[k] = short_entry
+            ev_qty[k] = short_qty
+            ev_stop[k] = short_stop
+            ev_pnl[k] = np.nan
+            k += 1
+
+    state[0] = k
+    state[1] = ke
+    state[2] = kl
+    state[3] = ks
+    state[4] = equity
+    state[5] = 1.0 if in_long else 0.0
+    state[6] = long_entry
+    state[7] = long_stop
+    state[8] = long_qty
+    state[9] = long_peak
+    state[10] = 1.0 if long_half_tp else 0.0
+    state[11] = 1.0 if in_short else 0.0
+    state[12] = short_entry
+    state[13] = short_stop
+    state[14] = short_qty
+    state[15] = short_peak
+    state[16] = 1.0 if short_half_tp else 0.0
+    state[17] = eqL
+    state[18] = eqS
+    state[19] = cdL
+    state[20] = cdS
+    return k, ke, kl, ks, equity
+
+
+def hedge_kernel(close: np.ndarray, low: np.ndarray, high: np.ndarray, bull: np.ndarray, bear: np.ndarray,
+                 setup_bear: np.ndarray, setup_bull: np.ndarray, lt_recent: np.ndarray, st_recent: np.ndarray,
+                 initial_capital: float, size_equity_pct: float, fee_factor: float, init_stop_pct: float,
+                 tp_half_pct: float, cooldown_bars: int,
+                 lock_arm_pct: float = 0.0, lock_profit_pct: float = 0.0,
+                 progress: Optional[Callable[[int, int, Dict[str, Any]], None]] = None):
+    """Run the hedged long/short state machine over arrays.
+
+    Returns (events, curves, ending_equity). events holds bar, side (SIDE_*),
+    type (EV_* codes), price, qty, stop, pnl; curves maps "combined", "long"
+    and "short" to (bar, equity) array pairs, one point per realized exit.
+    progress works as in pine_long_kernel.
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    low = np.ascontiguousarray(low, dtype=np.float64)
+    high = np.ascontiguousarray(high, dtype=np.float64)
+    bull = np.ascontiguousarray(bull, dtype=np.bool_)
+    bear = np.ascontiguousarray(bear, dtype=np.bool_)
+    setup_bear = np.ascontiguousarray(setup_bear, dtype=np.bool_)
+    setup_bull = np.ascontiguousarray(setup_bull, dtype=np.bool_)
+    lt_recent = np.ascontiguousarray(lt_recent, dtype=np.bool_)
+    st_recent = np.ascontiguousarray(st_recent, dtype=np.bool_)
+    # each entry yields at most enter + half TP + exit
+    n_long = int(bull.sum())
+    n_short = int(bear.sum())
+    cap = 3 * (n_long + n_short) + 2
+    ev_bar = np.empty(cap, dtype=np.int64)
+    ev_side = np.empty(cap, dtype=np.int8)
+    ev_type = np.empty(cap, dtype=np.int8)
+    ev_price = np.empty(cap, dtype=np.float64)
+    ev_qty = np.empty(cap, dtype=np.float64)
+    ev_stop = np.empty(cap, dtype=np.float64)
+    ev_pnl = np.empty(cap, dtype=np.float64)
+    eq_bar = np.empty(cap, dtype=np.int64)
+    eq_val = np.empty(cap, dtype=np.float64)
+    eql_bar = np.empty(2 * n_long + 1, dtype=np.int64)
+    eql_val = np.empty(2 * n_long + 1, dtype=np.float64)
+    eqs_bar = np.empty(2 * n_short + 1, dtype=np.int64)
+    eqs_val = np.empty(2 * n_short + 1, dtype=np.float64)
+    n = close.shape[0]
+    leg = float(initial_capital) * float(size_equity_pct)
+    state = _initial_state(_HEDGE_STATE, equity=float(initial_capital), eqL=leg, eqS=leg,
+                           long_entry=np.nan, long_stop=np.nan, short_entry=np.nan, short_stop=np.nan)
+    k = ke = kl = ks = 0
+    equity = float(initial_capital)
+    for a, b in _bar_ranges(n, progress):
+        k, ke, kl, ks, equity = _hedge_kernel(
+            close, low, high, bull, bear, setup_bear, setup_bull, lt_recent, st_recent,
+            float(initial_capital), float(size_equity_pct), float(fee_factor), float(init_stop_pct),
+            float(tp_half_pct), int(cooldown_bars), float(lock_arm_pct), float(lock_profit_pct),
+            ev_bar, ev_side, ev_type, ev_price, ev_qty, ev_stop, ev_pnl,
+            eq_bar, eq_val, eql_bar, eql_val, eqs_bar, eqs_val,
+            a, b, state,
+        )
+        _report(progress, b, n, equity, ev_type[:k])
+    events = {
+        "bar": ev_bar[:k],
+        "side": ev_side[:k],
+        "type": ev_type[:k],
+        "price": ev_price[:k],
+        "qty": ev_qty[:k],
+        "stop": ev_stop[:k],
+        "pnl": ev_pnl[:k],
+    }
+    curves = {
+        "combined": (eq_bar[:ke], eq_val[:ke]),
+        "long": (eql_bar[:kl], eql_val[:kl]),
+        "short": (eqs_bar[:ks], eqs_val[:ks]),
+    }
+    return events, curves, float(equity)
@@ -0,0 +1,106 @@
+"""
+Monte Carlo trade resampling for backtest robustness metrics.
+
+A backtest's Sharpe and drawdown describe one ordering of its trades. Here
+the closed trades are turned into per-trade returns on closed-trade equity
+and resampled into many equity paths at once, either bootstrapped (drawn
+with replacement, so the final return varies too) or shuffled (the same
+trades in a random order, so only the path and its drawdown vary). Paths
+are processed as (paths x trades) NumPy blocks; the result is a set of
+percentiles for total return and max drawdown.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+METHODS = ("bootstrap", "shuffle")
+MAX_PATHS = 100_000
+PERCENTILES = (5, 25, 50, 75, 95)
+_BLOCK_CELLS = 1 << 20  # paths x trades per block
+
+
+def trade_returns(pnl: Sequence[float], ending_equity: float) -> np.ndarray:
+    """Per-trade returns on closed-trade equity.
+
+    The equity before the first listed exit is ending_equity - sum(pnl),
+    so a truncated trade list still yields the right returns for its tail.
+    """
+    pnl = np.asarray(pnl, dtype=np.float64)
+    if pnl.size == 0:
+        return pnl
+    after = float(ending_equity) - pnl.sum() + np.cumsum(pnl)
+    before = np.r_[after[0] - pnl[0], after[:-1]]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = np.where(before > 0, pnl / before, 0.0)
+    return out
+
+
+def _percentiles(values: np.ndarray, percentiles: Sequence[float]) -> Dict[str, float]:
+    qs = np.percentile(values, percentiles)
+    return {f"p{int(p) if float(p).is_integer() else p}": round(float(q), 2) for p, q in zip(percentiles, qs)}
+
+
+def monte_carlo(returns: Sequence[float], paths: int = 10_000, method: str = "bootstrap",
+                seed: Optional[int] = None,
+                percentiles: Sequence[float] = PERCENTILES) -> Dict[str, Any]:
+    """Resample per-trade returns into `paths` equity paths.
+
+    Returns percentiles of total return (%) and max drawdown (%) over the
+    paths, plus the share of paths that end below the starting equity.
+    """
+    if method not in METHODS:
+        raise ValueError(f"monte carlo method must be one of {', '.join(METHODS)}")
+    paths = int(paths)
+    if paths < 1 or paths > MAX_PATHS:
+        raise ValueError(f"monte carlo paths must be between 1 and {MAX_PATHS}")
+    r = np.asarray(returns, dtype=np.float64)
+    n = int(r.size)
+    out: Dict[str, Any] = {"method": method, "paths": paths, "trades": n}
+    if n == 0:
+        zeros = {f"p{p}": 0.0 for p in percentiles}
+        out.update({"total_return_pct": dict(zeros), "max_drawdown_pct": dict(zeros), "prob_loss": 0.0})
+        return out
+
+    rng = np.random.default_rng(seed)
+    log_growth = np.log1p(np.maximum(r, -1.0 + 1e-12))
+    # float32 blocks halve memory traffic; results are reported to 0.01%
+    lg32 = log_growth.astype(np.float32)
+    idx_dtype = np.int16 if n <= np.iinfo(np.int16).max else np.int32
+    order = np.arange(n, dtype=idx_dtype)
+    total = np.empty(paths, dtype=np.float64)
+    mdd = np.empty(paths, dtype=np.float64)
+    step = max(1, _BLOCK_CELLS // n)
+    for lo in range(0, paths, step):
+        m = min(step, paths - lo)
+        if method == "bootstrap":
+            idx = rng.integers(0, n, size=(m, n), dtype=idx_dtype)
+        else:
+            idx = rng.permuted(np.broadcast_to(order, (m, n)), axis=1)
+        # log equity relative to the start (the start itself is 0)
+        curve = lg32[idx]
+        np.cumsum(curve, axis=1, out=curve)
+        total[lo:lo + m] = curve[:, -1]
+        dd = np.maximum.accumulate(curve, axis=1)
+        np.maximum(dd, 0.0, out=dd)
+        np.subtract(curve, dd, out=dd)
+        mdd[lo:lo + m] = dd.min(axis=1)
+    if method == "shuffle":
+        total[:] = log_growth.sum()  # every ordering ends at the same equity
+    total = np.expm1(total) * 100.0
+    mdd = np.expm1(mdd) * 100.0
+    out.update({
+        "total_return_pct": _percentiles(total, percentiles),
+        # p5 is the bad tail: 5% of paths draw down at least this much
+        "max_drawdown_pct": _percentiles(mdd, percentiles),
+        "prob_loss": round(float((total < 0).mean()), 4),
+    })
+    return out
+
+
+def monte_carlo_trades(trades: Iterable[dict], ending_equity: float, **kwargs: Any) -> Dict[str, Any]:
+    """monte_carlo() over the exits of an engine TradeLog (or list of trade dicts)."""
+    from .tradelog import exit_pnl
+
+    return monte_carlo(trade_returns(exit_pnl(trades), ending_equity), **kwargs)
@@ -0,0 +1,163 @@
+"""
+Incremental multi-timeframe context for the bar-by-bar bot backtest.
+
+RemixBot evaluates its filters on ``dfh[dfh.index <= t]`` at every 3m bar:
+1h/4h/1d/1w resamples of that prefix whose last bar is still forming. This
+module keeps the same picture up to date as base rows arrive. Completed bars
+are committed once into incremental EMA/rolling states (engine.incremental);
+the forming bar is evaluated with peek() on top of them. Results match
+bb_squeeze/htf_bias/mid_chop on the prefix, so the bot makes the same
+decisions at O(1) per bar instead of re-resampling the whole history.
+"""
+from __future__ import annotations
+
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from .data import bar_ids
+from .filters import bias_vote, chop_regime, squeeze_ok
+from .incremental import Ewm, RollingSum, RollingVar
+
+
+class _Frame:
+    """Bars of one timeframe: count of completed bars plus the forming one."""
+
+    __slots__ = ("ids", "cur", "done", "high", "low", "close")
+
+    def __init__(self, ids: np.ndarray):
+        self.ids = ids
+        self.cur = -1
+        self.done = 0
+        self.high = self.low = self.close = np.nan
+
+    def __len__(self) -> int:
+        # len(resample_ohlcv(prefix, tf)): completed bars + the forming one
+        return self.done + (1 if self.cur >= 0 else 0)
+
+
+class _Chop:
+    """chop_index() at the last bar of a growing OHLC series."""
+
+    def __init__(self, length: int):
+        self.length = int(length)
+        self._tr = RollingSum(self.length)
+        self._highs: deque = deque(maxlen=max(self.length - 1, 0))
+        self._lows: deque = deque(maxlen=max(self.length - 1, 0))
+        self._count = 0
+        self._prev_close = np.nan
+
+    def _true_range(self, high: float, low: float) -> float:
+        pc = self._prev_close
+        if pc != pc:
+            return np.nan
+        return max(high - low, abs(high - pc), abs(low - pc))
+
+    def commit(self, high: float, low: float, close: float) -> None:
+        self._tr.update(self._true_range(high, low))
+        if self.length > 1:
+            self._highs.append(high)
+            self._lows.append(low)
+        self._count += 1
+        self._prev_close = close
+
+    def value(self, high: float, low: float) -> float:
+        tr_sum = self._tr.peek(self._true_range(high, low))
+        if self._count + 1 < self.length:
+            return np.nan
+        denom = max(high, *self._highs) - min(low, *self._lows)
+        if denom == 0 or tr_sum != tr_sum:
+            return np.nan
+        return 100 * np.log10(np.float64(tr_sum) / denom) / np.log10(self.length)
+
+
+class MTFContext:
+    """1h/4h/1d/1w view of a base OHLC frame, advanced row by row.
+
+    advance(n) makes the first n rows of `base` visible; bb_squeeze(),
+    htf_bias() and mid_chop() then return what the filters module returns
+    for ``base.iloc[:n]``.
+    """
+
+    TFS = ("1h", "4h", "1d", "1w")
+
+    def __init__(self, base: pd.DataFrame, bb_period: int, bb_std: float,
+                 ema_short: int, ema_long: int, chop_length: int):
+        self._high = base["high"].to_numpy(dtype=np.float64)
+        self._low = base["low"].to_numpy(dtype=np.float64)
+        self._close = base["close"].to_numpy(dtype=np.float64)
+        self._frames = {tf: _Frame(bar_ids(base.index, tf)) for tf in self.TFS}
+        self._n = 0
+
+        self.bb_std = float(bb_std)
+        self.ema_long = int(ema_long)
+        self.chop_length = int(chop_length)
+        self._bb_mean = RollingSum(bb_period, mean=True)
+        self._bb_var = RollingVar(bb_period)
+        self._ema_s = Ewm.from_span(ema_short)
+        self._ema_l = Ewm.from_span(ema_long)
+        self._el_hist: deque = deque(maxlen=4)  # eL at the last completed daily bars
+        self._ema_w = Ewm.from_span(50)
+        self._ew_last = np.nan
+        self._chop_1h = _Chop(chop_length)
+        self._chop_4h = _Chop(chop_length)
+
+    def _commit(self, tf: str, fr: _Frame) -> None:
+        if tf == "1h":
+            self._bb_mean.update(fr.close)
+            self._bb_var.update(fr.close)
+            self._chop_1h.commit(fr.high, fr.low, fr.close)
+        elif tf == "4h":
+            self._chop_4h.commit(fr.high, fr.low, fr.close)
+        elif tf == "1d":
+            self._ema_s.update(fr.close)
+            self._el_hist.append(self._ema_l.update(fr.close))
+        else:
+            self._ew_last = self._ema_w.update(fr.close)
+
+    def advance(self, n: int) -> None:
+        for r in range(self._n, int(n)):
+            h = self._high[r]; l = self._low[r]; c = self._close[r]
+            for tf, fr in self._frames.items():
+                bid = fr.ids[r]
+                if bid != fr.cur:
+                    if fr.cur >= 0:
+                        self._commit(tf, fr)
+                        fr.done += 1
+                    fr.cur = bid
+                    fr.high, fr.low = h, l
+                else:
+                    if h > fr.high:
+                        fr.high = h
+                    if l < fr.low:
+                        fr.low = l
+                fr.close = c
+        self._n = max(self._n, int(n))
+
+    def bb_squeeze(self) -> bool:
+        fr = self._frames["1h"]
+        if fr.cur < 0:
+            return False
+        ma = self._bb_mean.peek(fr.close)
+        sd = RollingVar.std_of(self._bb_var.peek(fr.close))
+        up = ma + self.bb_std * sd
+        lo = ma - self.bb_std * sd
+        width = (up - lo) / ma if ma != 0 else np.nan
+        return squeeze_ok(width)
+
+    def htf_bias(self) -> tuple[int, float]:
+        d1 = self._frames["1d"]; w1 = self._frames["1w"]
+        if len(d1) < self.ema_long or len(w1) < 60:
+            return 0, 0.4
+        el_last = self._ema_l.peek(d1.close)
+        return bias_vote(self._ema_s.peek(d1.close), el_last, self._el_hist[-4],
+                         self._ema_w.peek(w1.close), self._ew_last)
+
+    def mid_chop(self) -> tuple[str, float]:
+        h4 = self._frames["4h"]; h1 = self._frames["1h"]
+        L = self.chop_length
+        if len(h4) < L * 3 or len(h1) < L * 3:
+            return "mixed", 0.5
+        ch = (self._chop_4h.value(h4.high, h4.low) + self._chop_1h.value(h1.high, h1.low)) / 2
+        return chop_regime(ch)
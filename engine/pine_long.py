@@ -1,12 +1,17 @@
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 
+from .compact import as_frame
 from .indicators import rsi_wilder
-from .divergence import bull_divergence, bear_divergence, valuewhen
-from .data import mintick, resample_ohlcv
+from .htf_gate import htf_gate
+from .signals import DivergenceSignals, compute_signals
+from .data import mintick
+from .equity import EquitySeries, mark_to_market
+from .kernels import EV_ENTER, pine_long_kernel
+from .tradelog import TradeLog
 
 
 @dataclass
@@ -44,7 +49,10 @@ class PineParams:
 
 
 class PineLongEngine:
-    def __init__(self, params: Optional[Dict] = None):
+    def __init__(self, params: Optional[Dict] = None, use_kernel: bool = True):
+        # use_kernel: run the bar loop through engine.kernels over NumPy arrays
+        # (compiled when numba is available); False keeps the reference loop.
+        self.use_kernel = bool(use_kernel)
         p = PineParams()
         if params:
             for k, v in params.items():
@@ -101,7 +109,33 @@ class PineLongEngine:
         prev = s.shift(1)
         return (prev >= level) & (s < level)
 
-    def backtest(self, symbol: str, df: pd.DataFrame) -> Tuple[Dict, List[dict]]:
+    def signal_params(self) -> Tuple[int, int, int, int, int]:
+        p = self.p
+        return (p.rsi_length, p.lookbackLeft, p.lookbackRight, p.rangeLower, p.rangeUpper)
+
+    def gate_params(self) -> Tuple:
+        """Settings the HTF gate depends on (all gates are open when disabled)."""
+        p = self.p
+        if not p.enableHTFGate:
+            return (False,)
+        return (True, p.htfTF, p.htf_pct_stop, p.htf_rsi_length, p.htf_rsi_overbought, p.htf_rsi_oversold,
+                p.htf_lookbackLeft, p.htf_lookbackRight, p.htf_rangeUpper, p.htf_rangeLower, p.htf_max_wait_bars)
+
+    def htf_gate(self, df: pd.DataFrame, symbol: Optional[str] = None) -> pd.Series:
+        """HTF gate state per LTF bar of df (see engine.htf_gate)."""
+        if not self.p.enableHTFGate:
+            return pd.Series(True, index=df.index)
+        p = self.p
+        return htf_gate(df, p.htfTF, p.htf_rsi_length, p.htf_rsi_overbought, p.htf_rsi_oversold,
+                        p.htf_lookbackLeft, p.htf_lookbackRight, p.htf_rangeLower, p.htf_rangeUpper,
+                        p.htf_max_wait_bars, p.htf_pct_stop, symbol=symbol)
+
+    def backtest(self, symbol: str, df: pd.DataFrame,
+                 signals: Optional[DivergenceSignals] = None,
+                 gate: Optional[pd.Series] = None,
+                 progress: Optional[Callable[[int, int, Dict[str, Any]], None]] = None) -> Tuple[Dict, TradeLog]:
+        """progress(bars_done, bars, {"Ending Equity", "Num Trades"}) is called about 100 times."""
+        df = as_frame(df)
         if df.empty or len(df) < max(200, self.p.lookbackLeft + self.p.lookbackRight + 20):
             return ({
                 "Total Return (%)": 0.0,
@@ -110,22 +144,22 @@ class PineLongEngine:
                 "Avg P&L": 0.0,
                 "Sharpe": 0.0,
                 "Ending Equity": self.p.initial_capital
-            }, [])
+            }, TradeLog.empty(symbol))
 
-        ser = self._compute_series(df)
-        rsi = ser["rsi"].fillna(50)
+        # RSI, divergences and wave lows are shared per run (see engine.signals)
+        if signals is None or not signals.matches(*self.signal_params()):
+            signals = compute_signals(df, *self.signal_params())
+        rsi = signals.rsi
 
         # divergence conditions per bar
         if self.p.calculateDivergence:
-            bullCond = bull_divergence(
-                rsi, df["low"], self.p.lookbackLeft, self.p.lookbackRight, self.p.rangeLower, self.p.rangeUpper
-            )
-            bearCond = bear_divergence(
-                rsi, df["high"], self.p.lookbackLeft, self.p.lookbackRight, self.p.rangeLower, self.p.rangeUpper
-            )
+            bullCond = signals.bull
+            bearCond = signals.bear
+            wave_low = signals.wave_low
         else:
             bullCond = pd.Series(False, index=df.index)
             bearCond = pd.Series(False, index=df.index)
+            wave_low = pd.Series(np.nan, index=df.index)
 
         # LTF setups
         # Arm long when RSI dips below OS; close setup when RSI OB crossunder
@@ -139,60 +173,29 @@ class PineLongEngine:
         rsi_setup_bear = self._crossunder(rsi, self.p.rsi_overbought)
 
         # HTF gate (stateless computation on closed HTF bars, forward-filled to LTF)
-        if self.p.enableHTFGate:
-            htf = resample_ohlcv(df, self.p.htfTF)
-            # Use HTF-specific params if provided
-            htf_len = int(self.p.htf_rsi_length)
-            htf_ob  = int(self.p.htf_rsi_overbought)
-            htf_os  = int(self.p.htf_rsi_oversold)
-            htf_lb_l = int(self.p.htf_lookbackLeft)
-            htf_lb_r = int(self.p.htf_lookbackRight)
-            htf_rng_u = int(self.p.htf_rangeUpper)
-            htf_rng_l = int(self.p.htf_rangeLower)
-            htf_wait  = int(self.p.htf_max_wait_bars)
-
-            rsi_htf = rsi_wilder(htf["close"], htf_len).fillna(50)
-            # Bullish divergence and recently armed on HTF
-            bull_htf = bull_divergence(
-                rsi_htf, htf["low"], htf_lb_l, htf_lb_r, htf_rng_l, htf_rng_u
+        # (a precomputed gate must come from the same df and gate_params())
+        gate_ltf = gate if gate is not None else self.htf_gate(df, symbol)
+
+        if self.use_kernel:
+            trades, equity, eq_curve = self._run_kernel(
+                symbol, df, bullCond, bearCond, recently_armed, rsi_setup_bear, gate_ltf, wave_low, progress
             )
-            # bars since RSI < OS on HTF
-            cond_htf = (rsi_htf < htf_os)
-            idx_arr = np.arange(len(cond_htf), dtype=float)
-            last_true = np.where(cond_htf.values, idx_arr, np.nan)
-            last_true = pd.Series(last_true, index=cond_htf.index).ffill().values
-            bars_since_htf = idx_arr - np.where(np.isnan(last_true), np.inf, last_true)
-            recently_armed_htf = pd.Series(bars_since_htf <= float(htf_wait), index=cond_htf.index)
-            htf_enter_sig = bull_htf & recently_armed_htf
-            htf_close_sig = self._crossunder(rsi_htf, htf_ob)
-
-            # Build gateOpen over HTF bars with 20% HTF stop
-            gate_vals = []
-            gate_open = True
-            htf_entry_price = np.nan
-            htf_stop_price = np.nan
-            for i in range(len(htf)):
-                # apply SL if armed
-                if gate_open and not np.isnan(htf_stop_price):
-                    if float(htf["low"].iloc[i]) <= float(htf_stop_price):
-                        gate_open = False
-                        htf_entry_price = np.nan
-                        htf_stop_price = np.nan
-                # signals on this closed HTF bar
-                if bool(htf_close_sig.iloc[i]):
-                    gate_open = False
-                    htf_entry_price = np.nan
-                    htf_stop_price = np.nan
-                if bool(htf_enter_sig.iloc[i]):
-                    gate_open = True
-                    htf_entry_price = float(htf["close"].iloc[i])
-                    htf_stop_price = htf_entry_price * (1.0 - float(self.p.htf_pct_stop))
-                gate_vals.append(gate_open)
-            gate_htf = pd.Series(gate_vals, index=htf.index)
-            gate_ltf = gate_htf.reindex(df.index, method="ffill").fillna(True)
         else:
-            gate_ltf = pd.Series(True, index=df.index)
-
+            trades, equity, eq_curve = self._run_loop(
+                symbol, df, rsi, bullCond, bearCond, recently_armed, rsi_setup_bear, gate_ltf, wave_low, progress
+            )
+        metrics = self._metrics(trades, equity, eq_curve)
+        return metrics, trades
+
+    def equity_curve(self, df: pd.DataFrame, trades: TradeLog) -> EquitySeries:
+        """Mark-to-market equity at every bar of df for the trades backtest() returned."""
+        return mark_to_market(trades, as_frame(df), self.p.initial_capital, self.p.fee_bps)
+
+    def _run_loop(self, symbol: str, df: pd.DataFrame, rsi: pd.Series, bullCond: pd.Series,
+                  bearCond: pd.Series, recently_armed: pd.Series, rsi_setup_bear: pd.Series,
+                  gate_ltf: pd.Series, wave_low: pd.Series,
+                  progress=None) -> Tuple[TradeLog, float, List[float]]:
+        """Reference bar loop over pandas series (kept for parity checks)."""
         # We'll use stateless "recently armed" instead of stateful arming for long entries
         awaiting_div_bear = False
         awaiting_bars_bear = 0
@@ -210,12 +213,13 @@ class PineLongEngine:
         fee_factor = self.p.fee_bps / 10_000.0
 
         trades: List[dict] = []
+        n = len(df)
+        report_every = max(1, n // 100)
 
-        # Helpful shifted series for Pine-like wave_low at pivot
-        lowR = df["low"].shift(self.p.lookbackRight)
-        highR = df["high"].shift(self.p.lookbackRight)
-
-        for i in range(len(df)):
+        for i in range(n):
+            if progress is not None and i and i % report_every == 0:
+                progress(i, n, {"Ending Equity": round(equity, 2),
+                                "Num Trades": sum(1 for tr in trades if tr["type"] == "enter")})
             t = df.index[i]
             price = float(df["close"].iloc[i])
             r = float(rsi.iloc[i])
@@ -239,12 +243,12 @@ class PineLongEngine:
             canEnter = (not inCooldown) and bool(gate_ltf.iloc[i])
             if entry_condition_raw and canEnter:
                 # stop candidate: min(last wave low (price) at pivot, pct stop)
-                wave_low = float(valuewhen(bullCond, lowR, 0).iloc[i]) if not np.isnan(valuewhen(bullCond, lowR, 0).iloc[i]) else np.nan
+                wave_low_i = float(wave_low.iloc[i])
                 entry_price = price
                 pct_stop_price = entry_price * (1 - self.p.use_pct_stop)
                 stop_price = pct_stop_price
-                if not np.isnan(wave_low):
-                    stop_price = min(wave_low, pct_stop_price)
+                if not np.isnan(wave_low_i):
+                    stop_price = min(wave_low_i, pct_stop_price)
                 if stop_price >= entry_price:
                     stop_price = pct_stop_price
                 min_stop_dist = m_tick * 3.0
@@ -313,9 +317,39 @@ class PineLongEngine:
                 if cdBarsLeft == 0:
                     inCooldown = False
 
-        # metrics
-        df_tr = pd.DataFrame(trades)
-        if df_tr.empty:
+        return TradeLog.from_dicts(symbol, trades), equity, eq_curve
+
+    def _run_kernel(self, symbol: str, df: pd.DataFrame, bullCond: pd.Series, bearCond: pd.Series,
+                    recently_armed: pd.Series, rsi_setup_bear: pd.Series,
+                    gate_ltf: pd.Series, wave_low: pd.Series,
+                    progress=None) -> Tuple[TradeLog, float, List[float]]:
+        """Same state machine as _run_loop, run by engine.kernels over plain arrays."""
+        events, equity = pine_long_kernel(
+            df["close"].to_numpy(dtype=float),
+            df["low"].to_numpy(dtype=float),
+            bullCond.to_numpy(dtype=bool),
+            bearCond.to_numpy(dtype=bool),
+            rsi_setup_bear.to_numpy(dtype=bool),
+            recently_armed.to_numpy(dtype=bool),
+            gate_ltf.to_numpy(dtype=bool),
+            wave_low.to_numpy(dtype=float),
+            max_wait_bars=self.p.max_wait_bars,
+            cooldown_bars=self.p.cooldownBars,
+            use_pct_stop=self.p.use_pct_stop,
+            min_stop_dist=mintick(symbol) * 3.0,
+            percent_risk=self.p.percent_risk,
+            fee_factor=self.p.fee_bps / 10_000.0,
+            initial_capital=float(self.p.initial_capital),
+            lock_arm_pct=self.p.lock_arm_pct,
+            lock_profit_pct=self.p.lock_profit_pct,
+            progress=progress,
+        )
+        trades = TradeLog.from_events(symbol, df.index, events)
+        eq_curve = [float(self.p.initial_capital)] + events["equity"][events["type"] != EV_ENTER].tolist()
+        return trades, equity, eq_curve
+
+    def _metrics(self, trades: TradeLog, equity: float, eq_curve: List[float]) -> Dict:
+        if len(trades) == 0:
             metrics = {
                 "Total Return (%)": 0.0,
                 "Num Trades": 0,
@@ -326,8 +360,7 @@ class PineLongEngine:
                 "Ending Equity": round(equity, 2)
             }
         else:
-            exits = df_tr[df_tr["type"].str.startswith("exit")]
-            pnl = exits["pnl"] if not exits.empty else pd.Series(dtype=float)
+            pnl = pd.Series(trades.pnl[trades.is_exit], dtype=float)
             total_return = (equity / self.p.initial_capital - 1.0) * 100.0
             winrate = float((pnl > 0).mean() * 100) if not pnl.empty else 0.0
             avg_pnl = float(pnl.mean()) if not pnl.empty else 0.0
@@ -340,15 +373,14 @@ class PineLongEngine:
             mdd = float(min(0.0, dd.min()))
             metrics = {
                 "Total Return (%)": round(total_return, 2),
-                "Num Trades": int((df_tr["type"] == "enter").sum()),
+                "Num Trades": trades.num_entries,
                 "Win Rate (%)": round(winrate, 2),
                 "Avg P&L": round(avg_pnl, 2),
                 "Sharpe": round(sharpe, 2),
                 "Max Drawdown (%)": round(mdd, 2),
                 "Ending Equity": round(equity, 2)
             }
-
-        return metrics, trades[-500:]
+        return metrics
 
     def signal_snapshot(self, symbol: str, df: pd.DataFrame) -> Dict:
         # compute back to generate events; then return last state + compact chart payload
@@ -366,7 +398,7 @@ class PineLongEngine:
         ]
         markers = [
             {"t": tr.get("t"), "type": tr["type"], "price": tr.get("price")}
-            for tr in trades if tr.get("t") is not None
+            for tr in trades[-200:]
         ]
         last = trades[-1] if trades else None
         action = "HOLD"
@@ -379,8 +411,10 @@ class PineLongEngine:
             "symbol": symbol,
             "action": action,
             "metrics": metrics,
-            "trades": trades,
-            "chart": {"candles": candles, "markers": markers[-200:]},
+            # the snapshot carries the latest trades; trades_total says how many there are
+            "trades": trades[-500:].to_dicts(),
+            "trades_total": len(trades),
+            "chart": {"candles": candles, "markers": markers},
         }
         return snapshot
 
@@ -7,13 +7,17 @@ Defaults:
 - rsi_len=15, ob=81, os=17, max_wait=15, pivots 5/5, percent_stop=0.015, cooldown 20 bars
 """
 from dataclasses import dataclass
-from typing import Dict, List, Tuple, Optional
+from typing import Any, Callable, Dict, List, Tuple, Optional
 
 import numpy as np
 import pandas as pd
 
+from .compact import as_frame
+from .equity import EquitySeries, mark_to_market
 from .indicators import rsi_wilder
-from .divergence import bear_divergence, bull_divergence, valuewhen
+from .kernels import EV_ENTER, EV_EXIT_NORMAL, EV_EXIT_SL
+from .signals import DivergenceSignals, compute_signals
+from .tradelog import TradeLog
 
 
 @dataclass
@@ -61,7 +65,15 @@ class PineShortEngine:
         prev = s.shift(1)
         return (prev <= level) & (s > level)
 
-    def backtest(self, symbol: str, df: pd.DataFrame) -> Tuple[Dict, List[dict]]:
+    def signal_params(self) -> Tuple[int, int, int, int, int]:
+        p = self.p
+        return (p.rsi_length, p.lookbackLeft, p.lookbackRight, p.rangeLower, p.rangeUpper)
+
+    def backtest(self, symbol: str, df: pd.DataFrame,
+                 signals: Optional[DivergenceSignals] = None,
+                 progress: Optional[Callable[[int, int, Dict[str, Any]], None]] = None) -> Tuple[Dict, TradeLog]:
+        """progress(bars_done, bars, {"Ending Equity", "Num Trades"}) is called about 100 times."""
+        df = as_frame(df)
         if df.empty or len(df) < max(200, self.p.lookbackLeft + self.p.lookbackRight + 20):
             return ({
                 "Total Return (%)": 0.0,
@@ -71,11 +83,14 @@ class PineShortEngine:
                 "Sharpe": 0.0,
                 "Ending Equity": self.p.initial_capital,
                 "Max Drawdown (%)": 0.0,
-            }, [])
-
-        rsi = self._series(df)["rsi"].fillna(50)
-        bearCond = bear_divergence(rsi, df["high"], self.p.lookbackLeft, self.p.lookbackRight, self.p.rangeLower, self.p.rangeUpper)
-        bullCond = bull_divergence(rsi, df["low"], self.p.lookbackLeft, self.p.lookbackRight, self.p.rangeLower, self.p.rangeUpper)
+            }, TradeLog.empty(symbol, has_stop=False))
+
+        if signals is None or not signals.matches(*self.signal_params()):
+            signals = compute_signals(df, *self.signal_params())
+        rsi = signals.rsi
+        bearCond = signals.bear
+        bullCond = signals.bull
+        wave_highs = signals.wave_high
         rsi_setup_short = self._crossunder(rsi, self.p.rsi_overbought)
         rsi_setup_bull = self._crossover(rsi, self.p.rsi_oversold)
 
@@ -85,12 +100,10 @@ class PineShortEngine:
         qty = 0.0
         fee_factor = self.p.fee_bps / 10_000.0
         equity = float(self.p.initial_capital)
-        trades: List[dict] = []
+        events: List[tuple] = []  # (bar, EV_* code, price, qty, pnl)
         cooldown = 0
         runup_peak = 0.0
 
-        highR = df["high"].shift(self.p.lookbackRight)
-
         # Precompute recently armed
         # Arm when RSI spends time in overbought or just crossed down from it
         cond = rsi >= self.p.rsi_overbought
@@ -102,17 +115,21 @@ class PineShortEngine:
 
         dd_peak = equity
         dd_min = equity
+        n = len(df)
+        report_every = max(1, n // 100)
 
-        for i in range(len(df)):
+        for i in range(n):
+            if progress is not None and i and i % report_every == 0:
+                progress(i, n, {"Ending Equity": round(equity, 2),
+                                "Num Trades": sum(1 for e in events if e[1] == EV_ENTER)})
             price = float(df["close"].iloc[i])
-            t = df.index[i]
 
             if cooldown > 0 and not in_pos:
                 cooldown -= 1
 
             # entry
             if (not in_pos) and (recently_armed.iloc[i] or bool(rsi_setup_short.iloc[i])) and bool(bearCond.iloc[i]) and cooldown == 0:
-                wave_high = float(valuewhen(bearCond, highR, 0).iloc[i]) if not np.isnan(valuewhen(bearCond, highR, 0).iloc[i]) else np.nan
+                wave_high = float(wave_highs.iloc[i])
                 entry_p = price
                 pct_stop = entry_p * (1 + self.p.use_pct_stop)
                 stop_p = pct_stop
@@ -125,7 +142,7 @@ class PineShortEngine:
                 entry = entry_p
                 stop = stop_p
                 runup_peak = 0.0
-                trades.append({"symbol":symbol, "t": t.isoformat(), "type":"enter", "price": entry, "qty": qty})
+                events.append((i, EV_ENTER, entry, qty, np.nan))
 
             # exit via bull divergence after OS setup
             if in_pos and bool(rsi_setup_bull.iloc[i]) and bool(bullCond.iloc[i]):
@@ -135,7 +152,7 @@ class PineShortEngine:
                 equity += pnl
                 in_pos = False
                 cooldown = self.p.cooldownBars
-                trades.append({"symbol":symbol, "t": t.isoformat(), "type":"exit_normal", "price": exit_p, "qty": qty, "pnl": pnl})
+                events.append((i, EV_EXIT_NORMAL, exit_p, qty, pnl))
 
             # stop
             if in_pos and float(df["high"].iloc[i]) >= stop:
@@ -145,7 +162,7 @@ class PineShortEngine:
                 equity += pnl
                 in_pos = False
                 cooldown = self.p.cooldownBars
-                trades.append({"symbol":symbol, "t": t.isoformat(), "type":"exit_sl", "price": exit_p, "qty": qty, "pnl": pnl})
+                events.append((i, EV_EXIT_SL, exit_p, qty, pnl))
 
             # Experimental: lock profit stop after runup >= arm
             if in_pos:
@@ -162,13 +179,23 @@ class PineShortEngine:
             dd_min = min(dd_min, equity)
 
         max_dd_pct = 0.0 if dd_peak <= 0 else (1.0 - (dd_min/dd_peak)) * 100.0
+        cols = list(zip(*events)) or [(), (), (), (), ()]
+        trades = TradeLog.from_events(symbol, df.index, {
+            "bar": np.array(cols[0], dtype=np.int64), "type": cols[1], "price": cols[2], "qty": cols[3],
+            "stop": np.full(len(events), np.nan), "pnl": cols[4],
+        }, has_stop=False)
+        pnl = trades.pnl[trades.is_exit]
         metrics = {
             "Total Return (%)": round((equity/self.p.initial_capital - 1.0)*100, 2),
-            "Num Trades": int(sum(1 for t in trades if t.get("type") == "enter")),
-            "Win Rate (%)": round(100.0 * (np.mean([t.get("pnl", 0) > 0 for t in trades if t["type"].startswith("exit")]) if any(t["type"].startswith("exit") for t in trades) else 0.0), 2),
-            "Avg P&L": round(np.mean([t.get("pnl", 0) for t in trades if t["type"].startswith("exit")]) if any(t["type"].startswith("exit") for t in trades) else 0.0, 2),
+            "Num Trades": trades.num_entries,
+            "Win Rate (%)": round(100.0 * (np.mean(pnl > 0) if pnl.size else 0.0), 2),
+            "Avg P&L": round(np.mean(pnl) if pnl.size else 0.0, 2),
             "Sharpe": 0.0,
             "Ending Equity": round(equity,2),
             "Max Drawdown (%)": round(max_dd_pct,2),
         }
         return metrics, trades
+
+    def equity_curve(self, df: pd.DataFrame, trades: TradeLog) -> EquitySeries:
+        """Mark-to-market equity at every bar of df for the trades backtest() returned."""
+        return mark_to_market(trades, as_frame(df), self.p.initial_capital, self.p.fee_bps, side="short")
@@ -30,10 +30,9 @@ def _ensure_table(con: sqlite3.Connection) -> None:
 def save_preset(product: str, symbol: str, slot: str, params: Dict) -> None:
     sym = _norm_symbol(symbol)
     now = int(time.time() * 1000)
-    # Prefer engine.storage connection context if available
+    # Prefer engine.storage connection context if available (its schema includes presets)
     if hasattr(_st, "_conn"):
         with _st._conn() as con:  # type: ignore[attr-defined]
-            _ensure_table(con)
             con.execute(
                 "INSERT INTO presets(product,symbol,slot,params,updated_at) VALUES (?,?,?,?,?)\n"
                 "ON CONFLICT(product,symbol,slot) DO UPDATE SET params=excluded.params, updated_at=excluded.updated_at",
@@ -59,8 +58,7 @@ def get_presets(product: str, symbol: str) -> Dict[str, Dict]:
     sym = _norm_symbol(symbol)
     out: Dict[str, Dict] = {"bull": {}, "bear": {}, "chop": {}}
     if hasattr(_st, "_conn"):
-        with _st._conn() as con:  # type: ignore[attr-defined]
-            _ensure_table(con)
+        with _st._conn(readonly=True) as con:  # type: ignore[attr-defined]
             cur = con.execute(
                 "SELECT slot, params, updated_at FROM presets WHERE product=? AND symbol=?",
                 (product, sym),
@@ -94,7 +92,6 @@ def delete_preset(product: str, symbol: str, slot: str) -> None:
     sym = _norm_symbol(symbol)
     if hasattr(_st, "_conn"):
         with _st._conn() as con:  # type: ignore[attr-defined]
-            _ensure_table(con)
             con.execute("DELETE FROM presets WHERE product=? AND symbol=? AND slot=?", (product, sym, slot))
             return
     # Fallback
@@ -0,0 +1,75 @@
+"""
+One process pool for the CPU-bound requests: /backtest symbols, sweeps and
+walk-forward runs.
+
+The pool is created on first use and shared. A pool per request meant
+forking the (multithreaded) server, or a full spawn and re-import on
+Windows, each time, and concurrent requests each started a CPU's worth of
+processes. It has MYSTRIX_BACKTEST_PROCS processes (default one per CPU);
+a request's `workers` only caps how many of its tasks are in flight at
+once. A pool whose worker died is dropped and the next request starts a
+fresh one.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+_PROCS: Optional[ProcessPoolExecutor] = None
+_PROCS_LOCK = threading.Lock()
+
+
+def pool_size() -> int:
+    try:
+        return max(1, int(os.environ.get("MYSTRIX_BACKTEST_PROCS", "") or (os.cpu_count() or 1)))
+    except ValueError:
+        return os.cpu_count() or 1
+
+
+def process_pool() -> ProcessPoolExecutor:
+    global _PROCS
+    with _PROCS_LOCK:
+        if _PROCS is None:
+            _PROCS = ProcessPoolExecutor(max_workers=pool_size())
+        return _PROCS
+
+
+def drop_process_pool(pool: ProcessPoolExecutor) -> None:
+    """Forget a pool whose worker died, so the next request starts a fresh one."""
+    global _PROCS
+    with _PROCS_LOCK:
+        if _PROCS is pool:
+            _PROCS = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def bounded_map(fn: Callable, calls: Iterable[tuple], cap: int) -> Iterator[Any]:
+    """fn(*call) for every call on the shared pool, in order, with at most cap in flight.
+
+    Tasks not yet started are cancelled when the consumer stops early or a
+    task raises; a broken pool is dropped before the error propagates.
+    """
+    pool = process_pool()
+    calls = iter(calls)
+    pending: deque = deque()
+    try:
+        for call in calls:
+            pending.append(pool.submit(fn, *call))
+            if len(pending) >= max(1, int(cap)):
+                break
+        while pending:
+            result = pending.popleft().result()
+            for call in calls:
+                pending.append(pool.submit(fn, *call))
+                break
+            yield result
+    except BrokenProcessPool:
+        drop_process_pool(pool)
+        raise
+    finally:
+        for fut in pending:
+            fut.cancel()
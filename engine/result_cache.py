@@ -0,0 +1,185 @@
+"""
+Persistent cache for rendered /backtest results.
+
+The web UI repeats identical backtests (page reloads, shared presets, the
+admin defaults). Each finished symbol run is stored here as its final JSON
+body, zlib-compressed, in the SQLite `backtest_results` table, keyed by
+(engine, normalized params, symbol, timeframe, range, data fingerprint).
+
+The data fingerprint is taken over the bars cached in `ohlcv` (or the
+Parquet/segment bar store, see storage._bar_store) for the range (count,
+first/last ts and column totals), so any added or replaced bar changes the
+key and an outdated result is never served; ensure_range_in_db also drops the stored
+results overlapping a range it has just written, so they do not wait for
+eviction. The table is bounded by the total compressed size and evicted
+least recently used first.
+
+Environment:
+    MYSTRIX_RESULT_CACHE_MB  size budget in MiB (default 256, 0 disables)
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+from .columnar import bars_digest
+from .storage import _WRITE_LOCK, _conn, _bar_store
+
+log = logging.getLogger("engine.result_cache")
+
+# bump when engine changes alter results for the same params and data
+CACHE_VERSION = 3
+
+
+def data_fingerprint(symbol: str, timeframe: str, start_ms: int, end_ms: int) -> Optional[str]:
+    """Digest of the cached bars in [start_ms, end_ms] (see columnar.bars_digest); None when there are none."""
+    store = _bar_store()
+    if store is not None:
+        return store.fingerprint("ohlcv", symbol, timeframe, start_ms, end_ms)
+    with _conn(readonly=True) as con:
+        row = con.execute(
+            "SELECT COUNT(*), MIN(ts), MAX(ts), TOTAL(open), TOTAL(high), TOTAL(low), TOTAL(close), TOTAL(volume) "
+            "FROM ohlcv WHERE symbol=? AND timeframe=? AND ts BETWEEN ? AND ?",
+            (symbol, timeframe, int(start_ms), int(end_ms)),
+        ).fetchone()
+    if not row:
+        return None
+    return bars_digest(row[0], row[1], row[2], row[3:])
+
+
+def result_key(engine: str, params: Dict[str, Any], symbol: str, timeframe: str,
+               start_ms: int, end_ms: int, fingerprint: str, extra: Any = None) -> str:
+    spec = [CACHE_VERSION, engine, params, symbol, timeframe, int(start_ms), int(end_ms), fingerprint, extra]
+    blob = json.dumps(spec, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.blake2b(blob.encode(), digest_size=20).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, max_mb: Optional[float] = None):
+        if max_mb is None:
+            try:
+                max_mb = float(os.environ.get("MYSTRIX_RESULT_CACHE_MB", "256"))
+            except ValueError:
+                max_mb = 256.0
+        self.max_bytes = int(max(0.0, max_mb) * 1024 * 1024)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, key: str) -> Optional[Tuple[Dict[str, Any], str]]:
+        """(metrics, JSON body) for a stored run, or None."""
+        if not self.enabled:
+            return None
+        try:
+            with _conn(readonly=True) as con:
+                row = con.execute("SELECT metrics, body FROM backtest_results WHERE key=?", (key,)).fetchone()
+        except Exception:
+            log.exception("result cache lookup failed")
+            row = None
+        if row is not None:
+            # LRU bookkeeping in its own transaction, under the write lock like put()
+            try:
+                with _WRITE_LOCK:
+                    with _conn() as con:
+                        con.execute("UPDATE backtest_results SET last_hit=?, hits=hits+1 WHERE key=?",
+                                    (time.time(), key))
+            except Exception:
+                log.exception("result cache hit update failed")
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0]), zlib.decompress(row[1]).decode("utf-8")
+
+    def put(self, key: str, symbol: str, timeframe: str, start_ms: int, end_ms: int,
+            metrics: Dict[str, Any], body: str) -> None:
+        if not self.enabled:
+            return
+        blob = zlib.compress(body.encode("utf-8"), 6)
+        meta = json.dumps(metrics, separators=(",", ":"), default=str)
+        size = len(blob) + len(meta)
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        try:
+            with _WRITE_LOCK:
+                with _conn() as con:
+                    con.execute(
+                        "INSERT OR REPLACE INTO backtest_results(key, symbol, timeframe, start_ms, end_ms, metrics, "
+                        "body, size, created_at, last_hit, hits) VALUES (?,?,?,?,?,?,?,?,?,?,0)",
+                        (key, symbol, timeframe, int(start_ms), int(end_ms), meta, blob, size, now, now),
+                    )
+                    evicted = self._evict(con)
+        except Exception:
+            log.exception("result cache store failed")
+            return
+        with self._lock:
+            self.stores += 1
+            self.evictions += evicted
+
+    def _evict(self, con) -> int:
+        total = con.execute("SELECT TOTAL(size) FROM backtest_results").fetchone()[0] or 0
+        if total <= self.max_bytes:
+            return 0
+        drop = []
+        for key, size in con.execute("SELECT key, size FROM backtest_results ORDER BY last_hit ASC"):
+            if total <= self.max_bytes:
+                break
+            drop.append((key,))
+            total -= size
+        con.executemany("DELETE FROM backtest_results WHERE key=?", drop)
+        return len(drop)
+
+    def invalidate(self, symbol: str, timeframe: str,
+                   start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> int:
+        """Drop stored results whose range overlaps [start_ms, end_ms]."""
+        q = "DELETE FROM backtest_results WHERE symbol=? AND timeframe=?"
+        args: list = [symbol, timeframe]
+        if end_ms is not None:
+            q += " AND start_ms <= ?"; args.append(int(end_ms))
+        if start_ms is not None:
+            q += " AND end_ms >= ?"; args.append(int(start_ms))
+        with _WRITE_LOCK:
+            with _conn() as con:
+                n = con.execute(q, tuple(args)).rowcount
+        with self._lock:
+            self.invalidations += n
+        return n
+
+    def clear(self) -> None:
+        with _WRITE_LOCK:
+            with _conn() as con:
+                con.execute("DELETE FROM backtest_results")
+
+    def stats(self) -> Dict[str, Any]:
+        with _conn(readonly=True) as con:
+            entries, size = con.execute("SELECT COUNT(*), TOTAL(size) FROM backtest_results").fetchone()
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": int(entries),
+                "bytes": int(size or 0),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+result_cache = ResultCache()
@@ -0,0 +1,214 @@
+"""
+Memory-mapped OHLCV segments: fixed-width column files the engines read in place.
+
+Every (table, symbol, timeframe) is one directory of raw little-endian
+column files, one value per bar in ts order:
+
+    <root>/<table>/<symbol, URI-encoded>/<tf>/g<N>/ts.i8      int64 epoch ms
+                                                  /open.f8    float64, likewise
+                                                  ...         the other columns
+
+Readers np.memmap the files read-only and slice them by a binary search on
+ts, so get_ohlcv() returns a DataFrame whose value columns are views of
+the page cache (only the DatetimeIndex is built). Processes that map the
+same segment share those pages instead of each holding a private copy;
+pool workers get a SegmentRef (a few strings and ints to pickle) and map it
+themselves through as_frame().
+
+Bars newer than the last one are appended to the files. The row count is
+the shortest file's length, so a reader racing an append sees the old or
+the new rows, never a torn row. Any other write (earlier bars, replaced
+bars) builds the merged columns in a new generation directory g<N+1> that
+is renamed into place; readers pick the highest generation, and maps of an
+older one stay valid until they are dropped. A reader that picked a
+generation just before it was replaced and removed finds it gone when it
+maps the files and starts over on the new one. Writers in one process are
+serialized by a lock.
+
+engine.storage uses this with MYSTRIX_OHLCV_BACKEND=segments, under
+MYSTRIX_SEGMENT_ROOT (default ohlcv_segments/ next to data_cache.db).
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from .columnar import COLUMNS, array_digest, shared_store
+
+TS_FILE = "ts.i8"
+_READ_RETRIES = 5  # a reader racing that many rebuilds in a row gives up
+_TS = np.dtype("<i8")
+_VAL = np.dtype("<f8")
+
+
+@dataclass(frozen=True)
+class SegmentRef:
+    """Picklable handle to a bar range; load() maps it (see as_frame)."""
+    root: str
+    table: str
+    symbol: str
+    timeframe: str
+    start_ms: Optional[int]
+    end_ms: Optional[int]
+
+    def load(self) -> pd.DataFrame:
+        return segment_store(Path(self.root)).frame(self.table, self.symbol, self.timeframe,
+                                                    self.start_ms, self.end_ms)
+
+
+class SegmentStore:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+
+    def _series_dir(self, table: str, symbol: str, timeframe: str) -> Path:
+        return self.root / table / quote(symbol, safe="") / quote(timeframe, safe="")
+
+    @staticmethod
+    def _generations(base: Path) -> List[Tuple[int, Path]]:
+        if not base.is_dir():
+            return []
+        gens = [(int(p.name[1:]), p) for p in base.iterdir()
+                if p.is_dir() and p.name[:1] == "g" and p.name[1:].isdigit()]
+        return sorted(gens)
+
+    def _current(self, table: str, symbol: str, timeframe: str) -> Optional[Path]:
+        gens = self._generations(self._series_dir(table, symbol, timeframe))
+        return gens[-1][1] if gens else None
+
+    @staticmethod
+    def _rows(gen: Path, names: Sequence[str]) -> int:
+        sizes = [(gen / TS_FILE).stat().st_size // _TS.itemsize]
+        sizes += [(gen / f"{c}.f8").stat().st_size // _VAL.itemsize for c in names]
+        return min(sizes)
+
+    @staticmethod
+    def _map(path: Path, dtype: np.dtype, n: int) -> np.ndarray:
+        if n == 0:
+            return np.empty(0, dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=(n,))
+
+    def read(self, table: str, symbol: str, timeframe: str, start_ms: Optional[int] = None,
+             end_ms: Optional[int] = None, columns: Optional[Sequence[str]] = None) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """(ts, {column: float64}) for start_ms <= ts <= end_ms as read-only views of the files.
+
+        Readers take no lock: a generation replaced and removed between
+        finding it and mapping it is retried on the new current one.
+        """
+        cols = list(columns) if columns is not None else list(COLUMNS[table])
+        for attempt in range(_READ_RETRIES):
+            gen = self._current(table, symbol, timeframe)
+            if gen is None:
+                return np.empty(0, _TS), {c: np.empty(0, _VAL) for c in cols}
+            try:
+                return self._read(gen, table, start_ms, end_ms, cols)
+            except FileNotFoundError:
+                if attempt == _READ_RETRIES - 1:
+                    raise
+
+    def _read(self, gen: Path, table: str, start_ms: Optional[int], end_ms: Optional[int],
+              cols: List[str]) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        n = self._rows(gen, COLUMNS[table])
+        ts = self._map(gen / TS_FILE, _TS, n)
+        lo = 0 if start_ms is None else int(np.searchsorted(ts, int(start_ms), side="left"))
+        hi = n if end_ms is None else int(np.searchsorted(ts, int(end_ms), side="right"))
+        return ts[lo:hi], {c: self._map(gen / f"{c}.f8", _VAL, n)[lo:hi] for c in cols}
+
+    def frame(self, table: str, symbol: str, timeframe: str, start_ms: Optional[int] = None,
+              end_ms: Optional[int] = None, columns: Optional[Sequence[str]] = None,
+              index_name: str = "timestamp") -> pd.DataFrame:
+        """DataFrame over the mapped columns; only the index is materialized."""
+        ts, cols = self.read(table, symbol, timeframe, start_ms, end_ms, columns)
+        idx = pd.DatetimeIndex(ts.astype("datetime64[ms]").astype("datetime64[ns]"), name=index_name)
+        return pd.DataFrame(cols, index=idx, copy=False)
+
+    def ref(self, table: str, symbol: str, timeframe: str, start_ms: Optional[int] = None,
+            end_ms: Optional[int] = None) -> SegmentRef:
+        return SegmentRef(str(self.root), table, symbol, timeframe,
+                          None if start_ms is None else int(start_ms), None if end_ms is None else int(end_ms))
+
+    def write(self, table: str, symbol: str, timeframe: str, ts: np.ndarray, cols: Dict[str, np.ndarray]) -> int:
+        """Insert or replace bars; returns the number of bars written."""
+        ts = np.asarray(ts, dtype=np.int64)
+        if ts.size == 0:
+            return 0
+        names = COLUMNS[table]
+        order = np.argsort(ts, kind="stable")[::-1]
+        # newest duplicate wins, as with INSERT OR REPLACE
+        ts_rev = ts[order]
+        _, first = np.unique(ts_rev, return_index=True)
+        pick = order[first]
+        ts = ts[pick]
+        new = {c: np.asarray(cols.get(c, np.zeros(pick.size)), dtype=np.float64)[pick] for c in names}
+        base = self._series_dir(table, symbol, timeframe)
+        with self._lock:
+            gen = self._current(table, symbol, timeframe)
+            n = self._rows(gen, names) if gen is not None else 0
+            if gen is not None and (n == 0 or ts[0] > self._map(gen / TS_FILE, _TS, n)[-1]):
+                self._append(gen, n, names, ts, new)
+                return int(ts.size)
+            if gen is not None:
+                old_ts, old = self.read(table, symbol, timeframe)
+                keep = ~np.isin(old_ts, ts)
+                ts_all = np.concatenate([old_ts[keep], ts])
+                merged = {c: np.concatenate([old[c][keep], new[c]]) for c in names}
+                order = np.argsort(ts_all, kind="stable")
+                ts, new = ts_all[order], {c: v[order] for c, v in merged.items()}
+            self._rebuild(base, gen, names, ts, new)
+        return int(pick.size)
+
+    @staticmethod
+    def _append(gen: Path, n: int, names: Sequence[str], ts: np.ndarray, cols: Dict[str, np.ndarray]) -> None:
+        # cut any rows a failed append left past the common length, then add the new ones
+        for path, arr, width in [(gen / TS_FILE, ts.astype(_TS), _TS.itemsize)] + \
+                [(gen / f"{c}.f8", cols[c].astype(_VAL), _VAL.itemsize) for c in names]:
+            with open(path, "r+b") as fh:
+                fh.truncate(n * width)
+                fh.seek(0, os.SEEK_END)
+                fh.write(arr.tobytes())
+
+    @staticmethod
+    def _rebuild(base: Path, gen: Optional[Path], names: Sequence[str], ts: np.ndarray,
+                 cols: Dict[str, np.ndarray]) -> None:
+        nxt = 0 if gen is None else int(gen.name[1:]) + 1
+        tmp = base / f".g{nxt}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        ts.astype(_TS).tofile(tmp / TS_FILE)
+        for c in names:
+            cols[c].astype(_VAL).tofile(tmp / f"{c}.f8")
+        os.rename(tmp, base / f"g{nxt}")
+        # older generations go once nobody maps them (on Windows that may be later)
+        for num, path in SegmentStore._generations(base):
+            if num < nxt:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def write_frame(self, table: str, symbol: str, timeframe: str, df: pd.DataFrame) -> int:
+        if df is None or df.empty:
+            return 0
+        ts = pd.DatetimeIndex(df.index).as_unit("ms").asi8
+        return self.write(table, symbol, timeframe, ts,
+                          {c: df[c].to_numpy(dtype=np.float64) for c in COLUMNS[table] if c in df.columns})
+
+    def bounds(self, table: str, symbol: str, timeframe: str) -> Tuple[Optional[int], Optional[int]]:
+        ts, _ = self.read(table, symbol, timeframe, columns=[])
+        if ts.size == 0:
+            return None, None
+        return int(ts[0]), int(ts[-1])
+
+    def fingerprint(self, table: str, symbol: str, timeframe: str, start_ms: int, end_ms: int) -> Optional[str]:
+        """Digest of the bars in [start_ms, end_ms] (see columnar.bars_digest); None when empty."""
+        return array_digest(*self.read(table, symbol, timeframe, start_ms, end_ms))
+
+
+def segment_store(root: Path) -> SegmentStore:
+    """One shared SegmentStore (and write lock) per root directory."""
+    return shared_store(SegmentStore, root)
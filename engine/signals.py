@@ -0,0 +1,64 @@
+"""
+Per-run divergence signal bundle shared by the long, short and hedge engines.
+
+RSI, bull/bear divergence masks and the wave-low/wave-high stop anchors only
+depend on the indicator parameters, so they are computed once per dataset and
+handed to every engine that runs with the same settings.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Tuple
+
+import pandas as pd
+
+from .compact import as_frame
+from .divergence import confirmation_lag, wave_levels
+from .indicator_cache import cached_divergences, cached_rsi_wilder
+
+
+@dataclass
+class DivergenceSignals:
+    key: Tuple[int, int, int, int, int]  # (rsi_length, left, right, range_low, range_up)
+    rsi: pd.Series       # Wilder RSI, NaN filled with 50 like the engines expect
+    bull: pd.Series
+    bear: pd.Series
+    wave_low: pd.Series  # last low[right] at a bull divergence, forward-filled
+    wave_high: pd.Series # last high[right] at a bear divergence, forward-filled
+
+    def matches(self, rsi_length: int, left: int, right: int, range_low: int, range_up: int) -> bool:
+        return self.key == signal_key(rsi_length, left, right, range_low, range_up)
+
+    def window(self, start: int, stop: int) -> "DivergenceSignals":
+        """Signals for rows [start, stop) as a run on the first `stop` rows would see them.
+
+        RSI is causal, and a divergence flag is final once `confirmation_lag`
+        later bars exist, so slicing the full-history bundle and clearing
+        the flags in the last lag bars equals compute_signals(df.iloc[:stop])
+        on the window (wave levels are only read at flagged bars). This lets
+        overlapping windows share one computation.
+        """
+        lag = confirmation_lag(self.key[1], self.key[2])
+        cut = max(start, stop - lag)
+        bull = self.bull.iloc[start:stop].copy()
+        bear = self.bear.iloc[start:stop].copy()
+        bull.iloc[cut - start:] = False
+        bear.iloc[cut - start:] = False
+        return DivergenceSignals(key=self.key, rsi=self.rsi.iloc[start:stop], bull=bull, bear=bear,
+                                 wave_low=self.wave_low.iloc[start:stop], wave_high=self.wave_high.iloc[start:stop])
+
+
+def signal_key(rsi_length: int, left: int, right: int, range_low: int, range_up: int) -> Tuple[int, int, int, int, int]:
+    return (int(rsi_length), int(left), int(right), int(range_low), int(range_up))
+
+
+def compute_signals(df: pd.DataFrame, rsi_length: int, left: int, right: int,
+                    range_low: int, range_up: int) -> DivergenceSignals:
+    key = signal_key(rsi_length, left, right, range_low, range_up)
+    rsi_length, left, right, range_low, range_up = key
+    df = as_frame(df)
+    rsi = cached_rsi_wilder(df["close"], rsi_length).fillna(50)
+    div = cached_divergences(rsi, df["low"], df["high"], left, right, range_low, range_up)
+    bull, bear = div.bull, div.bear
+    wave_low, wave_high = wave_levels(bull, bear, df["low"], df["high"], right)
+    return DivergenceSignals(key=key, rsi=rsi, bull=bull, bear=bear, wave_low=wave_low, wave_high=wave_high)
@@ -4,10 +4,15 @@ import time
 import sqlite3
 import threading
 from contextlib import contextmanager
-from typing import Optional
+from itertools import islice, repeat
+from typing import Callable, Iterable, List, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
 
+from .columnar import ParquetStore, parquet_store
+from .compact import CompactOHLCV
+from .segments import SegmentRef, SegmentStore, segment_store
 from .data import fetch_ccxt_hist_range, resample_ohlcv, synthetic_hourly
 from .bybit_data import fetch_klines, BYBIT_MAINNET
 
@@ -31,34 +36,159 @@ def resolve_db_path(custom: Optional[Path] = None) -> str:
 _WRITE_LOCK = threading.Lock()
 
 
+def _bar_store(custom_db: Optional[Path] = None) -> Optional[Union[ParquetStore, SegmentStore]]:
+    """The bar store picked by MYSTRIX_OHLCV_BACKEND, or None for SQLite (the default).
+
+    parquet:  engine.columnar under MYSTRIX_PARQUET_ROOT (default ohlcv_parquet/)
+    segments: engine.segments under MYSTRIX_SEGMENT_ROOT (default ohlcv_segments/)
+
+    Roots default to the DB's directory and are always there for a custom
+    cache root. Everything else, backtest_results included, stays in SQLite.
+    """
+    backend = os.environ.get("MYSTRIX_OHLCV_BACKEND", "sqlite").strip().lower()
+    if backend == "parquet":
+        env, default, factory = "MYSTRIX_PARQUET_ROOT", "ohlcv_parquet", parquet_store
+    elif backend == "segments":
+        env, default, factory = "MYSTRIX_SEGMENT_ROOT", "ohlcv_segments", segment_store
+    else:
+        return None
+    root = None if custom_db else os.environ.get(env)
+    return factory(Path(root) if root else Path(resolve_db_path(custom_db)).parent / default)
+
+
+# Bump when init_schema() changes: a database whose PRAGMA user_version is
+# older gets init_schema() once, the first time a process opens it.
+SCHEMA_VERSION = 2
+
+# Per-thread connections, (db_path, readonly) -> [connection, open `with` blocks, inode]
+_LOCAL = threading.local()
+_SCHEMA_LOCK = threading.Lock()
+_SCHEMA_READY: dict = {}  # db_path -> inode of the file the schema was checked on
+
+
+def _pool() -> dict:
+    # a forked pool worker must not reuse its parent's connections
+    if getattr(_LOCAL, "pid", None) != os.getpid():
+        _LOCAL.pid = os.getpid()
+        _LOCAL.pool = {}
+    return _LOCAL.pool
+
+
+def _open(db_path: str, readonly: bool) -> sqlite3.Connection:
+    if readonly:
+        con = sqlite3.connect(Path(db_path).resolve().as_uri() + "?mode=ro", uri=True, timeout=30,
+                              check_same_thread=False)
+    else:
+        con = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    try:
+        con.execute("PRAGMA busy_timeout=8000")
+        con.execute("PRAGMA temp_store=MEMORY")
+        if not readonly:
+            con.execute("PRAGMA synchronous=NORMAL")
+    except Exception:
+        pass
+    return con
+
+
+def _ensure_schema(db_path: str) -> int:
+    """Create/migrate the schema once per process and database file; returns its inode."""
+    try:
+        inode = os.stat(db_path).st_ino
+    except FileNotFoundError:
+        inode = None
+    if inode is not None and _SCHEMA_READY.get(db_path) == inode:
+        return inode
+    with _SCHEMA_LOCK:
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        con = sqlite3.connect(db_path, timeout=30)
+        try:
+            try:
+                con.execute("PRAGMA journal_mode=WAL")
+            except Exception:
+                pass
+            if con.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                init_schema(con)
+                con.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            con.commit()
+        finally:
+            con.close()
+        inode = _SCHEMA_READY[db_path] = os.stat(db_path).st_ino
+    return inode
+
+
 @contextmanager
-def _conn(custom_db: Optional[Path] = None):
+def _conn(custom_db: Optional[Path] = None, readonly: bool = False):
+    """This thread's connection to the DB; the outermost `with` commits (or rolls back).
+
+    Nested blocks share the outer block's transaction: an exception raised
+    in an inner block and caught by the caller does not roll anything back,
+    and whatever the inner block wrote is committed with the outer one.
+
+    readonly=True gives a separate `mode=ro` connection for queries, which
+    cannot write and never commits.
+    """
     db_path = resolve_db_path(custom_db)
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    con = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    inode = _ensure_schema(db_path)
+    pool = _pool()
+    entry = pool.get((db_path, readonly))
+    if entry is not None and entry[2] != inode and entry[1] == 0:
+        entry[0].close()  # the file was replaced (tests, restores): reconnect
+        entry = None
+    if entry is None:
+        entry = pool[(db_path, readonly)] = [_open(db_path, readonly), 0, inode]
+    con = entry[0]
+    entry[1] += 1
     try:
-        try:
-            con.execute("PRAGMA journal_mode=WAL")
-            con.execute("PRAGMA synchronous=NORMAL")
-            con.execute("PRAGMA busy_timeout=8000")
-            con.execute("PRAGMA temp_store=MEMORY")
-        except Exception:
-            pass
-        init_schema(con)
         yield con
-        con.commit()
+        if entry[1] == 1 and not readonly:
+            con.commit()
+    except BaseException:
+        if entry[1] == 1 and not readonly:
+            con.rollback()
+        raise
     finally:
-        con.close()
+        entry[1] -= 1
+
+
+# rows per executemany() call in bulk writes (all inside one transaction)
+_UPSERT_CHUNK = 50_000
+
+
+def _ts_ms(df: pd.DataFrame) -> np.ndarray:
+    """Epoch milliseconds of the index (naive timestamps are UTC)."""
+    return pd.DatetimeIndex(df.index).as_unit("ms").asi8
 
 
-def _df_to_rows(df: pd.DataFrame):
-    for ts, row in df.iterrows():
-        yield int(pd.Timestamp(ts).timestamp() * 1000), float(row["open"]), float(row["high"]), float(row["low"]), float(row["close"]), float(row.get("volume", 0.0))
+def _column(df: pd.DataFrame, name: str, default: float = 0.0) -> np.ndarray:
+    if name in df.columns:
+        return df[name].to_numpy(dtype=np.float64)
+    return np.full(len(df), default)
+
+
+def _df_to_rows(df: pd.DataFrame, *prefix) -> Iterable[tuple]:
+    """(*prefix, ts_ms, open, high, low, close, volume) rows built from whole columns."""
+    cols = [_ts_ms(df).tolist()] + [_column(df, c).tolist() for c in ("open", "high", "low", "close", "volume")]
+    return zip(*(repeat(v) for v in prefix), *cols)
+
+
+def _executemany_chunked(con: sqlite3.Connection, sql: str, rows: Iterable[tuple],
+                         chunk: int = _UPSERT_CHUNK) -> int:
+    it = iter(rows)
+    total = 0
+    while True:
+        part = list(islice(it, chunk))
+        if not part:
+            return total
+        con.executemany(sql, part)
+        total += len(part)
 
 
 def cached_bounds(symbol: str, timeframe: str, cache_root: Optional[Path] = None) -> tuple[Optional[int], Optional[int]]:
     """Return (min_ts_ms, max_ts_ms) in cache for symbol/tf."""
-    with _conn(cache_root) as con:
+    store = _bar_store(cache_root)
+    if store is not None:
+        return store.bounds("ohlcv", symbol, timeframe)
+    with _conn(cache_root, readonly=True) as con:
         cur = con.execute("SELECT MIN(ts), MAX(ts) FROM ohlcv WHERE symbol=? AND timeframe=?", (symbol, timeframe))
         row = cur.fetchone()
         if not row or (row[0] is None and row[1] is None):
@@ -66,50 +196,155 @@ def cached_bounds(symbol: str, timeframe: str, cache_root: Optional[Path] = None
         return (int(row[0]) if row[0] is not None else None, int(row[1]) if row[1] is not None else None)
 
 
+_TF_MINUTES = {
+    "1m": 1, "3m": 3, "5m": 5, "15m": 15, "30m": 30,
+    "1h": 60, "2h": 120, "4h": 240, "12h": 720, "1d": 1440,
+}
+
+
 def _bar_ms(tf: str) -> int:
-    minutes = {
-        "1m": 1, "3m": 3, "5m": 5, "15m": 15, "30m": 30,
-        "1h": 60, "2h": 120, "4h": 240, "12h": 720, "1d": 1440,
-    }.get(tf, 60)
-    return minutes * 60_000
+    return _TF_MINUTES.get(tf, 60) * 60_000
+
+
+def _coverage_store(store: Optional[Union[ParquetStore, SegmentStore]]) -> str:
+    """Key of the bar store in ohlcv_coverage: coverage of one store says nothing about another."""
+    if store is None:
+        return "sqlite"
+    kind = "parquet" if isinstance(store, ParquetStore) else "segments"
+    return f"{kind}:{store.root}"
+
+
+def _covered(con: sqlite3.Connection, key: str, symbol: str, timeframe: str,
+             start_ms: int, end_ms: int) -> List[Tuple[int, int]]:
+    """Known-complete [start, end] intervals touching [start_ms, end_ms], by start."""
+    return con.execute(
+        "SELECT start_ms, end_ms FROM ohlcv_coverage WHERE store=? AND symbol=? AND timeframe=? "
+        "AND start_ms <= ? AND end_ms >= ? ORDER BY start_ms",
+        (key, symbol, timeframe, int(end_ms), int(start_ms)),
+    ).fetchall()
+
+
+def _missing(covered: List[Tuple[int, int]], start_ms: int, end_ms: int, bar_ms: int) -> List[Tuple[int, int]]:
+    """Sub-intervals of [start_ms, end_ms] outside `covered` that can hold a bar."""
+    out = []
+    pos = start_ms  # first instant not known to be covered
+    for lo, hi in covered:
+        if lo - bar_ms >= pos:
+            out.append((pos, min(lo - bar_ms, end_ms)))
+        pos = max(pos, hi + bar_ms)
+        if pos > end_ms:
+            return out
+    if pos <= end_ms:
+        out.append((pos, end_ms))
+    return out
+
+
+def _add_coverage(con: sqlite3.Connection, key: str, symbol: str, timeframe: str,
+                  start_ms: int, end_ms: int, bar_ms: int) -> None:
+    """Record [start_ms, end_ms] as complete, merged with touching intervals."""
+    near = _covered(con, key, symbol, timeframe, start_ms - bar_ms, end_ms + bar_ms)
+    if near:
+        start_ms = min(start_ms, near[0][0])
+        end_ms = max(end_ms, max(hi for _lo, hi in near))
+        con.executemany(
+            "DELETE FROM ohlcv_coverage WHERE store=? AND symbol=? AND timeframe=? AND start_ms=?",
+            [(key, symbol, timeframe, lo) for lo, _hi in near],
+        )
+    con.execute(
+        "INSERT OR REPLACE INTO ohlcv_coverage(store, symbol, timeframe, start_ms, end_ms) VALUES(?,?,?,?,?)",
+        (key, symbol, timeframe, int(start_ms), int(end_ms)),
+    )
+
 
+def _seed_coverage(con: sqlite3.Connection, store: Optional[Union[ParquetStore, SegmentStore]], key: str,
+                   symbol: str, timeframe: str, bar_ms: int) -> None:
+    """Derive coverage from the bars already cached, once per series.
 
-def ensure_range_in_db(symbol: str, timeframe: str, start: str, end: str, cache_root: Optional[Path] = None):
-    """Ensure requested range is cached; fetch only missing head/tail."""
+    Bars cached before the coverage table existed count as complete runs,
+    split wherever a bar is missing, so holes get fetched once. Timeframes
+    without a known bar length keep the old MIN..MAX assumption.
+    """
+    if con.execute("SELECT 1 FROM ohlcv_coverage WHERE store=? AND symbol=? AND timeframe=? LIMIT 1",
+                   (key, symbol, timeframe)).fetchone():
+        return
+    if store is not None:
+        ts = np.asarray(store.read("ohlcv", symbol, timeframe, columns=[])[0], dtype=np.int64)
+    else:
+        ts = np.array([r[0] for r in con.execute(
+            "SELECT ts FROM ohlcv WHERE symbol=? AND timeframe=? ORDER BY ts", (symbol, timeframe))], dtype=np.int64)
+    if ts.size == 0:
+        return
+    if timeframe in _TF_MINUTES:
+        breaks = np.flatnonzero(np.diff(ts) > bar_ms)
+        starts, ends = np.r_[ts[0], ts[breaks + 1]], np.r_[ts[breaks], ts[-1]]
+    else:
+        starts, ends = ts[:1], ts[-1:]
+    con.executemany(
+        "INSERT OR REPLACE INTO ohlcv_coverage(store, symbol, timeframe, start_ms, end_ms) VALUES(?,?,?,?,?)",
+        [(key, symbol, timeframe, int(a), int(b)) for a, b in zip(starts, ends)],
+    )
+
+
+def ensure_range_in_db(symbol: str, timeframe: str, start: str, end: str, cache_root: Optional[Path] = None,
+                       progress: Optional[Callable[[int, int], None]] = None):
+    """Ensure requested range is cached; fetch only the sub-ranges not known to be complete.
+
+    The ohlcv_coverage table lists, per bar store, symbol and timeframe,
+    the [start_ms, end_ms] intervals already fetched in full. A request
+    fetches only its gaps against them (a hole in the middle included),
+    then merges what it got into the intervals. A fetch covers from its
+    start (the ccxt pager starts there, so earlier bars do not exist) or
+    first bar (the backwards bybit pager) to its last bar. A range that
+    returned nothing is recorded as complete when the exchange answered
+    and the range's last bar has closed (a hole the exchange has no bars
+    for); after a failed fetch, or while the range reaches the forming bar,
+    it stays missing and is retried next time.
+
+    progress(chunks_done, chunks_expected) is called after every fetched
+    chunk of up to 1000 bars; it may raise to abort the fetch.
+    """
     start_ms = int(pd.to_datetime(start).timestamp() * 1000)
     end_ms = int(pd.to_datetime(end).timestamp() * 1000)
     bar_ms = _bar_ms(timeframe)
-    min_cached, max_cached = cached_bounds(symbol, timeframe, cache_root=cache_root)
+    store = _bar_store(cache_root)
+    key = _coverage_store(store)
+    with _conn(cache_root) as con:
+        _seed_coverage(con, store, key, symbol, timeframe, bar_ms)
+        ranges = _missing(_covered(con, key, symbol, timeframe, start_ms, end_ms), start_ms, end_ms, bar_ms)
 
     # Fully covered, skip network
-    if min_cached is not None and max_cached is not None and start_ms >= min_cached and end_ms <= max_cached:
+    if not ranges:
         return
 
-    ranges = []
-    if min_cached is None or start_ms < (min_cached - bar_ms):
-        fetch_start = start_ms
-        fetch_end = min(min_cached - bar_ms if min_cached else end_ms, end_ms)
-        ranges.append((fetch_start, fetch_end))
-    if max_cached is None or end_ms > (max_cached + bar_ms):
-        fetch_start = max(start_ms, (max_cached + bar_ms) if max_cached else start_ms)
-        if fetch_start <= end_ms:
-            ranges.append((fetch_start, end_ms))
+    expected = sum(max(1, -(-(fe - fs + bar_ms) // (bar_ms * 1000))) for fs, fe in ranges)
+    done = 0
+
+    def _report(_k: int = 0, _m: int = 0) -> None:
+        nonlocal done
+        done += 1
+        if progress is not None:
+            progress(done, max(expected, done))
 
+    now_ms = int(time.time() * 1000)
     for (fs, fe) in ranges:
         df = None
+        answered = False  # the last fetcher tried returned without an error
+        covered_from = fs
         try:
             df = fetch_ccxt_hist_range(
                 symbol,
                 timeframe=timeframe,
                 start=pd.to_datetime(fs, unit="ms").isoformat(),
                 end=pd.to_datetime(fe, unit="ms").isoformat(),
+                progress=_report,
             )
+            answered = True
         except Exception:
             df = None
         if df is None or df.empty:
+            answered = False
             try:
-                tf_minutes = {"1m":1, "3m":3, "5m":5, "15m":15, "30m":30, "1h":60, "2h":120, "4h":240, "12h":720, "1d":1440}.get(timeframe, 60)
-                step_ms = tf_minutes * 60_000 * 1000  # 1000 bars window
+                step_ms = bar_ms * 1000  # 1000 bars window
                 end_cur = fe
                 chunks = []
                 attempts = 0
@@ -120,6 +355,7 @@ def ensure_range_in_db(symbol: str, timeframe: str, start: str, end: str, cache_
                     if by is None or by.empty:
                         break
                     chunks.append(by)
+                    _report()
                     first_ts = int(by.index[0].value // 10**6)
                     if first_ts <= fs:
                         break
@@ -129,29 +365,68 @@ def ensure_range_in_db(symbol: str, timeframe: str, start: str, end: str, cache_
                     by_all = pd.concat(list(reversed(chunks))).sort_index().astype(float)
                     tmp = by_all.rename(columns={"volume_base":"volume"})
                     df = tmp[["open","high","low","close","volume"]]
+                    # paged backwards from fe: a break leaves the head unfetched
+                    covered_from = int(df.index[0].value // 10**6)
+                answered = True
             except Exception:
                 df = None
         if df is None or df.empty:
+            if answered and fe + bar_ms <= now_ms:
+                # no bars here, and none can appear later: do not ask again
+                with _WRITE_LOCK:
+                    with _conn(cache_root) as con:
+                        _add_coverage(con, key, symbol, timeframe, fs, fe, bar_ms)
             continue
 
-        with _conn(cache_root) as con:
-            con.executemany(
-                "INSERT OR REPLACE INTO ohlcv(symbol, timeframe, ts, open, high, low, close, volume) VALUES(?,?,?,?,?,?,?,?)",
-                ((symbol, timeframe, *row) for row in _df_to_rows(df))
-            )
-
-
-def get_ohlcv(symbol: str, timeframe: str, start: str, end: str, cache_root: Optional[Path] = None) -> pd.DataFrame:
-    """Return OHLCV dataframe for the requested range, ensuring cache is populated."""
-    ensure_range_in_db(symbol, timeframe, start, end, cache_root=cache_root)
+        first_ms, last_ms = int(df.index[0].value // 10**6), int(df.index[-1].value // 10**6)
+        if store is not None:
+            store.write_frame("ohlcv", symbol, timeframe, df)
+        with _WRITE_LOCK:
+            with _conn(cache_root) as con:
+                if store is None:
+                    _executemany_chunked(
+                        con,
+                        "INSERT OR REPLACE INTO ohlcv(symbol, timeframe, ts, open, high, low, close, volume) VALUES(?,?,?,?,?,?,?,?)",
+                        _df_to_rows(df, symbol, timeframe),
+                    )
+                _add_coverage(con, key, symbol, timeframe, min(covered_from, first_ms), last_ms, bar_ms)
+                # stored backtest results over these bars are stale now (engine.result_cache)
+                con.execute(
+                    "DELETE FROM backtest_results WHERE symbol=? AND timeframe=? AND start_ms <= ? AND end_ms >= ?",
+                    (symbol, timeframe, last_ms, first_ms),
+                )
+
+
+def get_ohlcv(symbol: str, timeframe: str, start: str, end: str, cache_root: Optional[Path] = None,
+              compact: bool = False, shared: bool = False,
+              ensure: bool = True) -> Union[pd.DataFrame, CompactOHLCV, SegmentRef]:
+    """Return OHLCV dataframe for the requested range, ensuring cache is populated.
+
+    compact=True returns a float32 CompactOHLCV instead (see engine.compact).
+    shared=True on the segments backend returns a SegmentRef for pool
+    workers to map themselves; ignored otherwise. Neither is a DataFrame:
+    engine.compact.as_frame() turns either into one.
+    ensure=False skips ensure_range_in_db, for callers that just ran it.
+    """
+    if ensure:
+        ensure_range_in_db(symbol, timeframe, start, end, cache_root=cache_root)
     start_ms = int(pd.to_datetime(start).timestamp() * 1000)
     end_ms = int(pd.to_datetime(end).timestamp() * 1000)
-    with _conn(cache_root) as con:
+    store = _bar_store(cache_root)
+    if store is not None:
+        if compact:
+            return CompactOHLCV(*store.read("ohlcv", symbol, timeframe, start_ms, end_ms))
+        if shared and isinstance(store, SegmentStore):
+            return store.ref("ohlcv", symbol, timeframe, start_ms, end_ms)
+        return store.frame("ohlcv", symbol, timeframe, start_ms, end_ms)
+    with _conn(cache_root, readonly=True) as con:
         cur = con.execute(
             "SELECT ts, open, high, low, close, volume FROM ohlcv WHERE symbol=? AND timeframe=? AND ts BETWEEN ? AND ? ORDER BY ts ASC",
             (symbol, timeframe, start_ms, end_ms),
         )
         rows = cur.fetchall()
+    if compact:
+        return CompactOHLCV.from_rows(rows, ["open","high","low","close","volume"])
     if not rows:
         return pd.DataFrame(columns=["open","high","low","close","volume"], index=pd.to_datetime([]))
     df = pd.DataFrame(rows, columns=["timestamp","open","high","low","close","volume"]) 
@@ -212,6 +487,68 @@ def init_schema(con: sqlite3.Connection) -> None:
         )
         """
     )
+    # Known-complete bar intervals per bar store (ensure_range_in_db)
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ohlcv_coverage(
+          store TEXT NOT NULL,
+          symbol TEXT NOT NULL,
+          timeframe TEXT NOT NULL,
+          start_ms INTEGER NOT NULL,
+          end_ms INTEGER NOT NULL,
+          PRIMARY KEY(store, symbol, timeframe, start_ms)
+        )
+        """
+    )
+    # Rendered /backtest results (engine.result_cache), body zlib-compressed JSON
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS backtest_results(
+          key TEXT PRIMARY KEY,
+          symbol TEXT NOT NULL,
+          timeframe TEXT NOT NULL,
+          start_ms INTEGER NOT NULL,
+          end_ms INTEGER NOT NULL,
+          metrics TEXT,
+          body BLOB NOT NULL,
+          size INTEGER NOT NULL,
+          created_at REAL,
+          last_hit REAL,
+          hits INTEGER DEFAULT 0
+        )
+        """
+    )
+    con.execute("CREATE INDEX IF NOT EXISTS idx_backtest_results_range ON backtest_results(symbol, timeframe, start_ms)")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_backtest_results_lru ON backtest_results(last_hit)")
+    # Per-symbol parameter presets (engine.presets)
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS presets (
+          product TEXT NOT NULL,
+          symbol  TEXT NOT NULL,
+          slot    TEXT NOT NULL,
+          params  TEXT NOT NULL,
+          updated_at INTEGER NOT NULL,
+          PRIMARY KEY(product, symbol, slot)
+        )
+        """
+    )
+    # Exchange instrument filters (engine.instruments), decimals kept as text
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS instruments(
+          exchange TEXT NOT NULL,
+          symbol TEXT NOT NULL,
+          tick_size TEXT,
+          qty_step TEXT,
+          min_qty TEXT,
+          max_qty TEXT,
+          min_notional TEXT,
+          updated_at INTEGER,
+          PRIMARY KEY(exchange, symbol)
+        )
+        """
+    )
     # Basic auth + user data tables
     con.execute(
         """
@@ -339,43 +676,52 @@ def _ensure_user_columns(con: sqlite3.Connection) -> None:
 def upsert_ohlcv(df: pd.DataFrame, symbol: str, tf: str) -> int:
     if df is None or df.empty:
         return 0
-    df = df.copy()
-    cols = ["open","high","low","close","volume_base","volume_quote","is_closed"]
-    for c in cols:
-        if c not in df.columns:
-            df[c] = 0.0
+    now = int(pd.Timestamp.utcnow().timestamp())
+    store = _bar_store()
+    if store is not None:
+        df = df.copy()
+        for c in ("open", "high", "low", "close", "volume_base", "volume_quote", "is_closed"):
+            if c not in df.columns:
+                df[c] = 0.0
+        df["ingested_at"] = float(now)
+        return store.write_frame("raw_ohlcv", symbol, tf, df)
+    is_closed = df["is_closed"].fillna(0).to_numpy(dtype=np.int64) if "is_closed" in df.columns else np.zeros(len(df), np.int64)
+    rows = zip(
+        repeat(symbol), repeat(tf), _ts_ms(df).tolist(),
+        *(_column(df, c).tolist() for c in ("open", "high", "low", "close", "volume_base", "volume_quote")),
+        is_closed.tolist(), repeat(now),
+    )
     with _WRITE_LOCK:
         with _conn() as con:
-            rows = [
-            (
-                symbol,
-                tf,
-                int(pd.Timestamp(ts).timestamp() * 1000),
-                float(r["open"]), float(r["high"]), float(r["low"]), float(r["close"]),
-                float(r["volume_base"]), float(r.get("volume_quote", 0.0)),
-                int(r.get("is_closed", 1)),
-                int(pd.Timestamp.utcnow().timestamp()),
+            return _executemany_chunked(
+                con,
+                """
+                INSERT OR REPLACE INTO raw_ohlcv(symbol, tf, ts, open, high, low, close, volume_base, volume_quote, is_closed, ingested_at)
+                VALUES (?,?,?,?,?,?,?,?,?,?,?)
+                """,
+                rows,
             )
-            for ts, r in df.iterrows()
-        ]
-        con.executemany(
-            """
-            INSERT OR REPLACE INTO raw_ohlcv(symbol, tf, ts, open, high, low, close, volume_base, volume_quote, is_closed, ingested_at)
-            VALUES (?,?,?,?,?,?,?,?,?,?,?)
-            """,
-            rows,
-        )
-        return len(rows)
 
 
 def latest_ts(symbol: str, tf: str) -> Optional[int]:
-    with _conn() as con:
+    store = _bar_store()
+    if store is not None:
+        return store.bounds("raw_ohlcv", symbol, tf)[1]
+    with _conn(readonly=True) as con:
         cur = con.execute("SELECT MAX(ts) FROM raw_ohlcv WHERE symbol=? AND tf=?", (symbol, tf))
         row = cur.fetchone()
         return int(row[0]) if row and row[0] is not None else None
 
 
-def raw_ohlcv(symbol: str, tf: str, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> pd.DataFrame:
+def raw_ohlcv(symbol: str, tf: str, start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+              compact: bool = False) -> Union[pd.DataFrame, CompactOHLCV]:
+    """Raw bars indexed by ts; compact=True gives a CompactOHLCV (as_frame() expands it)."""
+    store = _bar_store()
+    if store is not None:
+        cols = ["open","high","low","close","volume_base","volume_quote","is_closed"]
+        if compact:
+            return CompactOHLCV(*store.read("raw_ohlcv", symbol, tf, start_ms, end_ms, cols))
+        return store.frame("raw_ohlcv", symbol, tf, start_ms, end_ms, cols, index_name="ts")
     q = "SELECT ts, open, high, low, close, volume_base, volume_quote, is_closed FROM raw_ohlcv WHERE symbol=? AND tf=?"
     args = [symbol, tf]
     if start_ms is not None:
@@ -383,8 +729,10 @@ def raw_ohlcv(symbol: str, tf: str, start_ms: Optional[int] = None, end_ms: Opti
     if end_ms is not None:
         q += " AND ts <= ?"; args.append(int(end_ms))
     q += " ORDER BY ts ASC"
-    with _conn() as con:
+    with _conn(readonly=True) as con:
         rows = con.execute(q, tuple(args)).fetchall()
+    if compact:
+        return CompactOHLCV.from_rows(rows, ["open","high","low","close","volume_base","volume_quote","is_closed"])
     if not rows:
         return pd.DataFrame(columns=["open","high","low","close","volume_base","volume_quote","is_closed"], index=pd.to_datetime([]))
     df = pd.DataFrame(rows, columns=["ts","open","high","low","close","volume_base","volume_quote","is_closed"]) 
@@ -406,7 +754,7 @@ def save_derived(key: str, value_json: str) -> None:
 
 
 def load_derived(key: str) -> Optional[str]:
-    with _conn() as con:
+    with _conn(readonly=True) as con:
         row = con.execute("SELECT value FROM derived_info WHERE key=?", (key,)).fetchone()
     return row[0] if row else None
 
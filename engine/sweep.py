@@ -0,0 +1,210 @@
+"""
+Parameter sweeps for PineLongEngine.
+
+A sweep runs one dataset against many PineParams combinations. Combos are
+grouped by what the expensive series depend on: the divergence signals
+(rsi_length, lookbacks, ranges; see engine.signals) and the HTF gate
+settings. Each group computes its signals and gate once and then only runs
+the bar-loop kernel per combo. Groups run as tasks on the shared process
+pool (engine.procs); a sweep's `workers` caps how many of its tasks are in
+flight. The dataset reaches the workers as a SegmentRef: the one from the
+segments backend, or a temporary segment series the sweep writes once, so a
+task pickles a few strings instead of the bars, and each worker maps the
+bars once per run.
+"""
+from __future__ import annotations
+
+import itertools
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .columnar import COLUMNS
+from .compact import as_frame
+from .pine_long import PineLongEngine
+from .procs import bounded_map, pool_size
+from .segments import SegmentRef, segment_store
+from .signals import compute_signals
+
+MAX_COMBOS = 20_000
+
+_WORKER_DF: Optional[pd.DataFrame] = None
+_WORKER_RUN: Optional[str] = None  # run whose initializer last ran in this process
+
+# temporary segment series of in-memory datasets, one per pooled run
+_SPILL_ROOT = Path(tempfile.gettempdir()) / f"mystrix-runs-{os.getpid()}"
+
+
+def expand_grid(grid: Dict[str, Sequence[Any]]) -> List[Dict[str, Any]]:
+    """Cartesian product of {param: [values]} as a list of param dicts."""
+    keys = list(grid.keys())
+    values = [list(v) if isinstance(v, (list, tuple)) else [v] for v in grid.values()]
+    return [dict(zip(keys, combo)) for combo in itertools.product(*values)]
+
+
+def group_combos(combos: Iterable[Dict[str, Any]]) -> Dict[Tuple, List[Tuple[int, Dict[str, Any]]]]:
+    """Group (index, params) pairs by signal_params() + gate_params()."""
+    groups: Dict[Tuple, List[Tuple[int, Dict[str, Any]]]] = {}
+    for idx, params in enumerate(combos):
+        eng = PineLongEngine(params)
+        key = eng.signal_params() + eng.gate_params()
+        groups.setdefault(key, []).append((idx, params))
+    return groups
+
+
+def run_group(symbol: str, df: pd.DataFrame,
+              combos: List[Tuple[int, Dict[str, Any]]]) -> List[Tuple[int, Dict[str, Any]]]:
+    """Backtest combos that share signals and gate; returns (index, metrics)."""
+    if not combos:
+        return []
+    first = PineLongEngine(combos[0][1])
+    signals = compute_signals(df, *first.signal_params())
+    gate = first.htf_gate(df)
+    out = []
+    for idx, params in combos:
+        metrics, _ = PineLongEngine(params).backtest(symbol, df, signals=signals, gate=gate)
+        out.append((idx, metrics))
+    return out
+
+
+def _init_worker(df: pd.DataFrame) -> None:
+    global _WORKER_DF
+    _WORKER_DF = as_frame(df)
+
+
+def _run_group_worker(symbol: str, combos: List[Tuple[int, Dict[str, Any]]]):
+    return run_group(symbol, _WORKER_DF, combos)
+
+
+def _chunks(groups: Iterable[List], chunk_size: int) -> List[List]:
+    """Every group's members in pieces of at most chunk_size, biggest first."""
+    tasks = []
+    for members in groups:
+        for k in range(0, len(members), chunk_size):
+            tasks.append(members[k:k + chunk_size])
+    # big tasks first so stragglers are short
+    tasks.sort(key=len, reverse=True)
+    return tasks
+
+
+def _pooled_task(run: str, data: Any, initializer: Callable, initargs: tuple, fn: Callable, *args: Any):
+    # a pool worker serves every run: set it up again when the run changes
+    # (the last run's state stays in the worker until then)
+    global _WORKER_RUN
+    if _WORKER_RUN != run:
+        initializer(data, *initargs)
+        _WORKER_RUN = run
+    return fn(*args)
+
+
+def _spillable(df: pd.DataFrame) -> bool:
+    """Whether df round-trips exactly through a segment series (float64 OHLCV, sorted unique index)."""
+    return (isinstance(df, pd.DataFrame) and isinstance(df.index, pd.DatetimeIndex)
+            and list(df.columns) == list(COLUMNS["ohlcv"])
+            and all(dt == np.float64 for dt in df.dtypes)
+            and df.index.is_monotonic_increasing and df.index.is_unique)
+
+
+@contextmanager
+def _worker_map(workers: int, initializer: Callable, data: Any, df: pd.DataFrame,
+                *initargs: Any) -> Iterator[Callable]:
+    """map() over the shared process pool with at most `workers` tasks in flight.
+
+    Each worker runs initializer(data, *initargs) before its first task of
+    this run. data goes out as a SegmentRef when it is one or df can be
+    written as one (removed afterwards); anything else is pickled with
+    every task. workers<=1 runs initializer(df, *initargs) and the tasks in
+    this process.
+    """
+    if workers <= 1:
+        initializer(df, *initargs)
+        yield map
+        return
+    run = uuid.uuid4().hex
+    spill = None
+    if not isinstance(data, SegmentRef) and _spillable(df):
+        store = segment_store(_SPILL_ROOT)
+        store.write_frame("ohlcv", run, "run", df)
+        data, spill = store.ref("ohlcv", run, "run"), _SPILL_ROOT / "ohlcv" / run
+
+    def _map(fn: Callable, *iterables: Iterable) -> Iterator:
+        calls = ((run, data, initializer, initargs, fn, *args) for args in zip(*iterables))
+        return bounded_map(_pooled_task, calls, workers)
+
+    try:
+        yield _map
+    finally:
+        if spill is not None:
+            shutil.rmtree(spill, ignore_errors=True)
+
+
+def rank_key(rank_by: str, ascending: bool = False):
+    """Sort key for (index, metrics) pairs: best first, ties by index."""
+    def _score(item):
+        val = item[1].get(rank_by)
+        try:
+            val = float(val)
+        except (TypeError, ValueError):
+            val = float("nan")
+        if val != val:
+            return (float("inf"), item[0])  # missing metric ranks last either way
+        return (val if ascending else -val, item[0])
+    return _score
+
+
+def run_sweep(symbol: str, df: pd.DataFrame, combos: Sequence[Dict[str, Any]],
+              base: Optional[Dict[str, Any]] = None, rank_by: str = "Total Return (%)",
+              ascending: bool = False, workers: Optional[int] = None,
+              chunk_size: int = 200) -> Dict[str, Any]:
+    """Backtest every combo (merged over `base`) and rank by a metric.
+
+    workers caps the tasks in flight on the shared pool (None: the whole
+    pool, see engine.procs); workers<=1 runs in-process.
+    chunk_size caps combos per task; a large group split over several
+    tasks recomputes its signals once per task.
+    """
+    if not combos:
+        raise ValueError("no parameter combinations to sweep")
+    if len(combos) > MAX_COMBOS:
+        raise ValueError(f"too many combinations ({len(combos)} > {MAX_COMBOS})")
+    base = dict(base or {})
+    full = [{**base, **c} for c in combos]
+    data, df = df, as_frame(df)
+    t0 = time.perf_counter()
+    groups = group_combos(full)
+    tasks = _chunks(groups.values(), max(1, int(chunk_size)))
+    if workers is None:
+        workers = pool_size()
+    workers = max(1, min(int(workers), pool_size(), len(tasks)))
+
+    results: List[Tuple[int, Dict[str, Any]]] = []
+    global _WORKER_DF
+    try:
+        with _worker_map(workers, _init_worker, data, df) as run:
+            for part in run(_run_group_worker, itertools.repeat(symbol), tasks):
+                results.extend(part)
+    finally:
+        _WORKER_DF = None
+
+    results.sort(key=rank_key(rank_by, ascending))
+    rows = []
+    for rank, (idx, metrics) in enumerate(results, start=1):
+        rows.append({"rank": rank, "params": dict(combos[idx]), **metrics})
+    return {
+        "symbol": symbol,
+        "bars": int(len(df)),
+        "combos": len(full),
+        "groups": len(groups),
+        "workers": workers,
+        "rank_by": rank_by,
+        "elapsed_s": round(time.perf_counter() - t0, 3),
+        "results": rows,
+    }
@@ -0,0 +1,267 @@
+"""
+Struct-of-arrays trade log returned by the engines.
+
+A TradeLog holds one row per trade event in typed arrays (t_ms int64, type
+int8 EV_* code, side int8, price/qty/stop/pnl float64) instead of a list of
+dicts with an isoformat string each. It still reads like the old list:
+len(), iteration, log[-1] and log[-5:] give the same dicts as before, built
+on demand, so callers that look at a few trades need no changes. The API
+renders a page of it straight to JSON text with vectorized NumPy string
+formatting (to_json), and whole-log consumers (metrics, Monte Carlo,
+walk-forward) read the arrays.
+
+Dict layout per event, as the engines always produced it:
+    {"symbol", "t", ["side"], "type", "price", "qty",
+     "stop" (entries, when the engine sets stops) | "pnl" (exits),
+     ["total_pnl"] (running realized P&L rounded to cents, hedge engine)}
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .kernels import EV_ENTER, EVENT_TYPES, SIDES
+
+
+def _epoch_ms(index: pd.DatetimeIndex) -> np.ndarray:
+    return pd.DatetimeIndex(index).as_unit("ms").asi8
+
+
+def _fmt(vals: np.ndarray) -> List[str]:
+    # float repr is what json.dumps writes; NaN/inf become null
+    out = list(map(float.__repr__, vals.tolist()))
+    finite = np.isfinite(vals)
+    if not finite.all():
+        for k in np.flatnonzero(~finite).tolist():
+            out[k] = "null"
+    return out
+
+
+class TradeLog:
+    def __init__(self, symbol: str, t_ms: np.ndarray, type_: np.ndarray, price: np.ndarray,
+                 qty: np.ndarray, stop: np.ndarray, pnl: np.ndarray, side: Optional[np.ndarray] = None,
+                 tz: Optional[str] = None, has_stop: bool = True, total_pnl: bool = False):
+        self.symbol = symbol
+        self.t_ms = np.asarray(t_ms, dtype=np.int64)
+        self.type = np.asarray(type_, dtype=np.int8)
+        self.price = np.asarray(price, dtype=np.float64)
+        self.qty = np.asarray(qty, dtype=np.float64)
+        self.stop = np.asarray(stop, dtype=np.float64)
+        self.pnl = np.asarray(pnl, dtype=np.float64)
+        self.side = None if side is None else np.asarray(side, dtype=np.int8)
+        self.tz = tz
+        self.has_stop = bool(has_stop)
+        self.total_pnl = bool(total_pnl)
+        # entries carry a stop, exits a pnl; the other slot is NaN
+        enter = self.type == EV_ENTER
+        self.stop = np.where(enter & self.has_stop, self.stop, np.nan)
+        self.pnl = np.where(enter, np.nan, self.pnl)
+
+    # -- construction -------------------------------------------------------
+
+    @classmethod
+    def empty(cls, symbol: str, **kw: Any) -> "TradeLog":
+        z = np.empty(0)
+        return cls(symbol, z, z, z, z, z, z, **kw)
+
+    @classmethod
+    def from_events(cls, symbol: str, index: pd.DatetimeIndex, events: Mapping[str, np.ndarray],
+                    **kw: Any) -> "TradeLog":
+        """From kernel event arrays (bar, type, price, qty, stop, pnl[, side])."""
+        bars = np.asarray(events["bar"], dtype=np.int64)
+        tz = None if index.tz is None else str(index.tz)
+        return cls(symbol, _epoch_ms(index)[bars], events["type"], events["price"], events["qty"],
+                   events["stop"], events["pnl"], side=events.get("side"), tz=tz, **kw)
+
+    @classmethod
+    def from_dicts(cls, symbol: str, trades: Sequence[Mapping[str, Any]], **kw: Any) -> "TradeLog":
+        """From the dicts of a reference loop."""
+        if not trades:
+            return cls.empty(symbol, **kw)
+        idx = pd.DatetimeIndex([pd.Timestamp(t["t"]) for t in trades])
+        codes = {name: i for i, name in enumerate(EVENT_TYPES)}
+        nan = float("nan")
+        side = None
+        if "side" in trades[0]:
+            side = np.array([SIDES.index(t["side"]) for t in trades], dtype=np.int8)
+        return cls(
+            symbol, _epoch_ms(idx),
+            np.array([codes[t["type"]] for t in trades], dtype=np.int8),
+            np.array([t["price"] for t in trades], dtype=np.float64),
+            np.array([t["qty"] for t in trades], dtype=np.float64),
+            np.array([t.get("stop", nan) for t in trades], dtype=np.float64),
+            np.array([t.get("pnl", nan) for t in trades], dtype=np.float64),
+            side=side, tz=None if idx.tz is None else str(idx.tz), **kw,
+        )
+
+    # -- sequence protocol --------------------------------------------------
+
+    def __len__(self) -> int:
+        return int(self.t_ms.size)
+
+    def _take(self, sel) -> "TradeLog":
+        out = TradeLog(self.symbol, self.t_ms[sel], self.type[sel], self.price[sel], self.qty[sel],
+                       self.stop[sel], self.pnl[sel], None if self.side is None else self.side[sel],
+                       tz=self.tz, has_stop=self.has_stop, total_pnl=False)
+        if self.total_pnl:
+            # the running total covers the trades before the selection too
+            out._cum = self.cum_pnl()[sel]
+            out.total_pnl = True
+        return out
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self._take(key)
+        if not -len(self) <= key < len(self):
+            raise IndexError("trade index out of range")
+        return self.to_dicts(key, 1)[0]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.to_dicts())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, TradeLog):
+            return (self.symbol == other.symbol and len(self) == len(other)
+                    and self.has_stop == other.has_stop and self.total_pnl == other.total_pnl
+                    and (self.side is None) == (other.side is None)
+                    and all(np.array_equal(a, b, equal_nan=a.dtype.kind == "f")
+                            for a, b in zip(self._arrays(), other._arrays())))
+        if isinstance(other, list):
+            return self.to_dicts() == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        h = hashlib.blake2b(digest_size=8)
+        for a in self._arrays():
+            h.update(np.ascontiguousarray(a).tobytes())
+        return f"TradeLog({self.symbol!r}, {len(self)} trades, {h.hexdigest()})"
+
+    @property
+    def nbytes(self) -> int:
+        return int(sum(a.nbytes for a in self._arrays()))
+
+    def _arrays(self) -> List[np.ndarray]:
+        arrs = [self.t_ms, self.type, self.price, self.qty, self.stop, self.pnl]
+        return arrs if self.side is None else arrs + [self.side]
+
+    # -- derived columns ----------------------------------------------------
+
+    @property
+    def is_exit(self) -> np.ndarray:
+        return self.type != EV_ENTER
+
+    @property
+    def num_entries(self) -> int:
+        return int((self.type == EV_ENTER).sum())
+
+    def cum_pnl(self) -> np.ndarray:
+        """Running realized P&L (unrounded), summed in trade order."""
+        cached = getattr(self, "_cum", None)
+        if cached is None:
+            cached = self._cum = np.cumsum(np.where(self.is_exit, self.pnl, 0.0))
+        return cached
+
+    def page(self, offset: int = 0, limit: Optional[int] = None) -> Tuple["TradeLog", int]:
+        """(trades[offset:offset+limit], resolved offset); a negative offset counts from the end."""
+        n = len(self)
+        start = max(0, n + offset) if offset < 0 else min(offset, n)
+        stop = n if limit is None else min(n, start + max(0, int(limit)))
+        return self._take(slice(start, stop)), start
+
+    # -- rendering ----------------------------------------------------------
+
+    def iso(self) -> np.ndarray:
+        """Timestamp.isoformat() of every event, vectorized for naive and UTC indexes."""
+        if self.tz not in (None, "UTC"):
+            idx = pd.to_datetime(self.t_ms, unit="ms", utc=True).tz_convert(self.tz)
+            return np.array([ts.isoformat() for ts in idx], dtype=object).astype(str)
+        dt = self.t_ms.astype("datetime64[ms]")
+        out = np.datetime_as_string(dt, unit="s")
+        frac = (self.t_ms % 1000) != 0
+        if frac.any():
+            out = np.where(frac, np.datetime_as_string(dt.astype("datetime64[us]"), unit="us"), out)
+        if self.tz == "UTC":
+            out = np.char.add(out, "+00:00")
+        return out
+
+    def to_dicts(self, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        part = self.page(offset, limit)[0] if (offset or limit is not None) else self
+        iso = part.iso().tolist()
+        cum = part.cum_pnl().tolist() if part.total_pnl else None
+        out = []
+        for j, (code, price, qty, stop, pnl) in enumerate(zip(part.type.tolist(), part.price.tolist(),
+                                                              part.qty.tolist(), part.stop.tolist(),
+                                                              part.pnl.tolist())):
+            tr: Dict[str, Any] = {"symbol": part.symbol, "t": iso[j]}
+            if part.side is not None:
+                tr["side"] = SIDES[int(part.side[j])]
+            tr.update(type=EVENT_TYPES[code], price=price, qty=qty)
+            if code == EV_ENTER:
+                if part.has_stop:
+                    tr["stop"] = stop
+            else:
+                tr["pnl"] = pnl
+            if cum is not None:
+                tr["total_pnl"] = round(cum[j], 2)
+            out.append(tr)
+        return out
+
+    def to_json(self, offset: int = 0, limit: Optional[int] = None) -> str:
+        """JSON array of the dicts to_dicts() would build, without building them."""
+        part = self.page(offset, limit)[0] if (offset or limit is not None) else self
+        n = len(part)
+        if n == 0:
+            return "[]"
+        head = '{"symbol":' + json.dumps(part.symbol, ensure_ascii=False) + ',"t":"'
+        enter = part.type == EV_ENTER
+        # one stop-or-pnl slot per row, so each number is formatted once
+        tail_key = np.array([',"stop":', ',"pnl":'], dtype=object)[(~enter).view(np.int8)]
+        tail = tail_key + np.array(_fmt(np.where(enter, part.stop, part.pnl)), dtype=object)
+        if not part.has_stop:
+            tail[enter] = ""
+        tail = tail.tolist()
+        side = ([""] * n if part.side is None
+                else np.array(['","side":"' + s for s in SIDES], dtype=object)[part.side].tolist())
+        kind = np.array(['","type":"' + t + '","price":' for t in EVENT_TYPES], dtype=object)[part.type].tolist()
+        if part.total_pnl:
+            # Python round() semantics, so the text matches round(cum, 2)
+            tot = [',"total_pnl":' + repr(round(x, 2)) for x in part.cum_pnl().tolist()]
+        else:
+            tot = [""] * n
+        rows = zip(part.iso().tolist(), side, kind, _fmt(part.price), _fmt(part.qty), tail, tot)
+        return "[" + ",".join([f'{head}{t}{sd}{k}{p},"qty":{q}{tl}{tt}}}' for t, sd, k, p, q, tl, tt in rows]) + "]"
+
+    def markers_json(self, side: Optional[str] = None) -> str:
+        """Chart markers ({"t", "price", "type", "side"}) for every event."""
+        n = len(self)
+        if n == 0:
+            return "[]"
+        kind = np.array([',"type":"' + t + '","side":' for t in EVENT_TYPES], dtype=object)[self.type].tolist()
+        if self.side is not None:
+            sides = np.array([json.dumps(s) for s in SIDES], dtype=object)[self.side].tolist()
+        else:
+            sides = [json.dumps(side)] * n
+        rows = zip(self.iso().tolist(), _fmt(self.price), kind, sides)
+        return "[" + ",".join([f'{{"t":"{t}","price":{p}{k}{sd}}}' for t, p, k, sd in rows]) + "]"
+
+    def equity_json(self, initial: float) -> str:
+        """Closed-trade equity points ({"t", "equity"}) at every exit."""
+        exits = self.is_exit
+        if not exits.any():
+            return "[]"
+        # running sum from the start value, in trade order (same rounding as equity += pnl)
+        eq = np.cumsum(np.r_[float(initial), self.pnl[exits]])[1:]
+        rows = zip(self.iso()[exits].tolist(), _fmt(eq))
+        return "[" + ",".join([f'{{"t":"{t}","equity":{e}}}' for t, e in rows]) + "]"
+
+
+def exit_pnl(trades: Iterable[Mapping[str, Any]]) -> np.ndarray:
+    """Exit P&L of a TradeLog or of a list of trade dicts."""
+    if isinstance(trades, TradeLog):
+        return trades.pnl[trades.is_exit]
+    return np.array([float(t.get("pnl", 0.0) or 0.0) for t in trades
+                     if str(t.get("type", "")).startswith("exit")], dtype=np.float64)
@@ -0,0 +1,279 @@
+"""
+Walk-forward optimization for the Pine engines.
+
+History is split into consecutive folds of (train, test) bar ranges: every
+fold's test window follows its train window, and the test windows tile the
+end of the history without overlap. Each candidate combo is backtested on
+every train window, the best one per fold (by `rank_by`) is backtested on
+that fold's test window, and the out-of-sample (OOS) test equity is stitched
+into one compounded curve.
+
+Overlapping windows share their indicators: the divergence signals of a
+combo group are computed once on the full history (through the indicator
+cache) and cut per window with DivergenceSignals.window(), which matches a
+run on the history up to the window end, so no fold sees bars after it.
+The long engine's HTF gate is computed on the same prefix and also goes
+through the indicator cache. (fold, group) tasks run on the shared process
+pool (engine.procs) through engine.sweep's _worker_map, so each worker maps
+the dataset once per run and `workers` only caps the tasks in flight.
+
+engine="long" optimizes PineParams; engine="hedge" optimizes HedgeParams.
+"""
+from __future__ import annotations
+
+import dataclasses
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .compact import as_frame
+from .hedge import HedgeParams, _coerce, _epoch_ms, backtest_hedged
+from .pine_long import PineLongEngine
+from .presets import save_preset
+from .procs import pool_size
+from .signals import DivergenceSignals, compute_signals
+from .sweep import MAX_COMBOS, _chunks, _worker_map, rank_key
+
+ENGINES = ("long", "hedge")
+MIN_WINDOW_BARS = 200  # PineLongEngine.backtest returns flat metrics below this
+
+_HEDGE_FIELDS = {f.name for f in dataclasses.fields(HedgeParams)}
+
+# per-process state for pool workers (and the in-process path)
+_WORKER: Dict[str, Any] = {}
+
+
+def make_folds(n: int, folds: int = 6, train_bars: Optional[int] = None,
+               test_bars: Optional[int] = None, anchored: bool = False,
+               train_ratio: float = 3.0) -> List[Tuple[int, int, int]]:
+    """(train_start, test_start, test_end) bar offsets per fold.
+
+    Test windows are `test_bars` long and end at bar n; each train window is
+    the `train_bars` before its test window (anchored=True: everything from
+    bar 0, with `train_bars` as the first fold's length). Unset sizes split n
+    so that train = train_ratio * test.
+    """
+    folds = int(folds)
+    if folds < 1:
+        raise ValueError("folds must be >= 1")
+    if test_bars is None:
+        if train_bars is None:
+            test_bars = int(n // (folds + float(train_ratio)))
+        else:
+            test_bars = (n - int(train_bars)) // folds
+    test_bars = int(test_bars)
+    if train_bars is None:
+        train_bars = int(test_bars * float(train_ratio))
+    train_bars = int(train_bars)
+    if test_bars < MIN_WINDOW_BARS or train_bars < MIN_WINDOW_BARS:
+        raise ValueError(f"windows too short: train {train_bars} / test {test_bars} bars "
+                         f"(need >= {MIN_WINDOW_BARS} each)")
+    first_test = n - folds * test_bars
+    if first_test < train_bars:
+        raise ValueError(f"{n} bars cannot hold {folds} folds of train {train_bars} + test {test_bars}")
+    out = []
+    for k in range(folds):
+        b = first_test + k * test_bars
+        out.append((0 if anchored else b - train_bars, b, b + test_bars))
+    return out
+
+
+def _params_key(engine: str, params: Dict[str, Any]) -> Tuple:
+    """Settings the expensive series of a combo depend on."""
+    if engine == "long":
+        eng = PineLongEngine(params)
+        return eng.signal_params() + eng.gate_params()
+    unknown = sorted(set(params) - _HEDGE_FIELDS)
+    if unknown:
+        raise ValueError(f"unknown hedge params: {', '.join(unknown)}")
+    p = _coerce(HedgeParams(**params))
+    return (p.rsi_length, p.lookbackLeft, p.lookbackRight, p.rangeLower, p.rangeUpper)
+
+
+def _init_worker(df: pd.DataFrame, symbol: str, engine: str) -> None:
+    _WORKER.clear()
+    _WORKER.update(symbol=symbol, df=as_frame(df), engine=engine, signals={}, gates={})
+
+
+def _signals(sig_params: Tuple) -> DivergenceSignals:
+    memo = _WORKER["signals"]
+    if sig_params not in memo:
+        memo[sig_params] = compute_signals(_WORKER["df"], *sig_params)
+    return memo[sig_params]
+
+
+def _gate(eng: PineLongEngine, stop: int) -> pd.Series:
+    # the gate is built on the history up to the window end (no later bars)
+    key = (eng.gate_params(), stop)
+    memo = _WORKER["gates"]
+    if key not in memo:
+        df = _WORKER["df"]
+        memo[key] = eng.htf_gate(df.iloc[:stop], _WORKER["symbol"])
+    return memo[key]
+
+
+def run_window(params: Dict[str, Any], start: int, stop: int) -> Tuple[Dict[str, Any], List[dict], Any]:
+    """Backtest one combo on bars [start, stop) of the worker dataset.
+
+    Returns (metrics, trades, equity) where equity is an EquitySeries for
+    the hedge engine and None for the long engine.
+    """
+    symbol, df, engine = _WORKER["symbol"], _WORKER["df"], _WORKER["engine"]
+    window = df.iloc[start:stop]
+    if engine == "long":
+        eng = PineLongEngine(params)
+        signals = _signals(eng.signal_params()).window(start, stop)
+        gate = _gate(eng, stop).iloc[start:stop] if eng.p.enableHTFGate else None
+        metrics, trades = eng.backtest(symbol, window, signals=signals, gate=gate)
+        return metrics, trades, None
+    sig_params = _params_key("hedge", params)
+    metrics, trades, equity, _, _ = backtest_hedged(symbol, window, dict(params),
+                                                    signals=_signals(sig_params).window(start, stop))
+    return metrics, trades, equity
+
+
+def _train_task(fold: int, start: int, stop: int, combos: List[Tuple[int, Dict[str, Any]]]):
+    return [(fold, idx, run_window(params, start, stop)[0]) for idx, params in combos]
+
+
+def _test_task(fold: int, start: int, stop: int, params: Dict[str, Any]):
+    metrics, trades, equity = run_window(params, start, stop)
+    df = _WORKER["df"]
+    end_ms = int(_epoch_ms(df.index[stop - 1:stop])[0])
+    exits = trades.is_exit
+    closed = trades.pnl[exits]
+    wins = int((closed > 0).sum())
+    if equity is None:
+        # long engine: closed-trade marks (entry fees land on the next exit)
+        initial = float(PineLongEngine(params).p.initial_capital)
+        t_ms = trades.t_ms[exits]
+        eq = initial + np.cumsum(closed)
+    else:
+        initial = float(_coerce(HedgeParams(**params)).initial_capital)
+        t_ms, eq = equity.t_ms, equity.equity
+    # window end carries the exact ending equity
+    t_ms = np.append(np.asarray(t_ms, dtype=np.int64), end_ms)
+    eq = np.append(np.asarray(eq, dtype=np.float64), float(metrics.get("Ending Equity", initial)))
+    return fold, metrics, t_ms, eq / initial, wins, len(closed)
+
+
+def _call(args):
+    return args[0](*args[1:])
+
+
+def _stitch(tests: List[Tuple], initial: float) -> Tuple[Dict[str, Any], Dict[str, List]]:
+    capital = float(initial)
+    t_all: List[np.ndarray] = []
+    eq_all: List[np.ndarray] = []
+    trades = wins = exits = profitable = 0
+    for _, metrics, t_ms, rel, w, x in tests:
+        t_all.append(t_ms)
+        eq_all.append(capital * rel)
+        capital *= float(rel[-1])
+        trades += int(metrics.get("Num Trades", 0) or 0)
+        wins += w
+        exits += x
+        profitable += 1 if float(rel[-1]) > 1.0 else 0
+    t = np.concatenate(t_all) if t_all else np.empty(0, np.int64)
+    eq = np.concatenate(eq_all) if eq_all else np.empty(0, np.float64)
+    curve = np.r_[float(initial), eq]
+    peak = np.maximum.accumulate(curve)
+    mdd = float(min(0.0, ((curve / peak - 1.0) * 100.0).min()))
+    metrics = {
+        "Total Return (%)": round((capital / float(initial) - 1.0) * 100.0, 2),
+        "Num Trades": trades,
+        "Win Rate (%)": round(wins / exits * 100.0, 2) if exits else 0.0,
+        "Max Drawdown (%)": round(mdd, 2),
+        "Ending Equity": round(capital, 2),
+        "Profitable Folds": profitable,
+    }
+    return metrics, {"t": t.tolist(), "equity": np.round(eq, 2).tolist()}
+
+
+def run_walkforward(symbol: str, df: pd.DataFrame, combos: Sequence[Dict[str, Any]],
+                    base: Optional[Dict[str, Any]] = None, engine: str = "long",
+                    folds: int = 6, train_bars: Optional[int] = None, test_bars: Optional[int] = None,
+                    anchored: bool = False, rank_by: str = "Total Return (%)", ascending: bool = False,
+                    workers: Optional[int] = None, chunk_size: int = 200,
+                    preset_slot: Optional[str] = None, product: str = "mystrix") -> Dict[str, Any]:
+    """Optimize every combo (merged over `base`) per train window and score the next test window.
+
+    workers caps the tasks in flight on the shared pool (None: the whole
+    pool, see engine.procs); workers<=1 runs in-process.
+    With preset_slot set, the last fold's winner is written with
+    save_preset(product, symbol, preset_slot, params).
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"engine must be one of {', '.join(ENGINES)}")
+    if not combos:
+        raise ValueError("no parameter combinations to optimize")
+    if len(combos) > MAX_COMBOS:
+        raise ValueError(f"too many combinations ({len(combos)} > {MAX_COMBOS})")
+    base = dict(base or {})
+    data, df = df, as_frame(df)
+    full = [{**base, **c} for c in combos]
+    t0 = time.perf_counter()
+    windows = make_folds(len(df), folds, train_bars, test_bars, anchored)
+
+    groups: Dict[Tuple, List[Tuple[int, Dict[str, Any]]]] = {}
+    for idx, params in enumerate(full):
+        groups.setdefault(_params_key(engine, params), []).append((idx, params))
+    # every fold trains on the same chunks, which come biggest first
+    tasks = [(_train_task, k, a, b, chunk)
+             for chunk in _chunks(groups.values(), max(1, int(chunk_size)))
+             for k, (a, b, _) in enumerate(windows)]
+    if workers is None:
+        workers = pool_size()
+    workers = max(1, min(int(workers), pool_size(), len(tasks)))
+
+    train: Dict[int, List[Tuple[int, Dict[str, Any]]]] = {k: [] for k in range(len(windows))}
+    try:
+        with _worker_map(workers, _init_worker, data, df, symbol, engine) as run:
+            for part in run(_call, tasks):
+                for fold, idx, metrics in part:
+                    train[fold].append((idx, metrics))
+            best = {}
+            for k, rows in train.items():
+                rows.sort(key=rank_key(rank_by, ascending))
+                best[k] = rows[0]
+            tests = sorted(run(_call, [(_test_task, k, b, c, full[best[k][0]])
+                                       for k, (_, b, c) in enumerate(windows)]), key=lambda r: r[0])
+    finally:
+        _WORKER.clear()
+
+    initial = (float(PineLongEngine(full[0]).p.initial_capital) if engine == "long"
+               else float(_coerce(HedgeParams(**full[0])).initial_capital))
+    oos, equity_series = _stitch(tests, initial)
+    idx = df.index
+    out_folds = []
+    for k, (a, b, c) in enumerate(windows):
+        best_idx, train_metrics = best[k]
+        out_folds.append({
+            "fold": k,
+            "train": {"start": idx[a].isoformat(), "end": idx[b - 1].isoformat(), "bars": b - a},
+            "test": {"start": idx[b].isoformat(), "end": idx[c - 1].isoformat(), "bars": c - b},
+            "params": dict(combos[best_idx]),
+            "train_metrics": train_metrics,
+            "test_metrics": tests[k][1],
+        })
+    best_params = dict(full[best[len(windows) - 1][0]])
+    if preset_slot:
+        save_preset(product, symbol, preset_slot, best_params)
+    return {
+        "symbol": symbol,
+        "engine": engine,
+        "bars": int(len(df)),
+        "combos": len(full),
+        "groups": len(groups),
+        "folds": out_folds,
+        "workers": workers,
+        "rank_by": rank_by,
+        "anchored": bool(anchored),
+        "oos_metrics": oos,
+        "equity_series": equity_series,
+        "best_params": best_params,
+        "preset_slot": preset_slot,
+        "elapsed_s": round(time.perf_counter() - t0, 3),
+    }
@@ -4,7 +4,7 @@ from __future__ import annotations
 
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Union
 
 import pandas as pd
 
@@ -16,6 +16,7 @@ if str(PROJECT_ROOT) not in sys.path:
 
 from engine.storage import get_ohlcv  # noqa: E402
 from engine.data import fetch_ccxt_hist_range  # noqa: E402
+from engine.compact import CompactOHLCV  # noqa: E402
 
 TF_MINUTES = {
     "1m": 1,
@@ -51,8 +52,12 @@ def fetch_ohlcv(
     chunk_days: int = 90,
     log: Optional[list[str]] = None,
     cache_root: Optional[Path] = None,
-) -> pd.DataFrame:
-    """Fetch OHLCV in manageable chunks (default 90d) with basic failover."""
+    compact: bool = False,
+) -> Union[pd.DataFrame, CompactOHLCV]:
+    """Fetch OHLCV in manageable chunks (default 90d) with basic failover.
+
+    compact=True returns a float32 CompactOHLCV (see engine.compact).
+    """
     start_ts, end_ts = _infer_dates(start, end, timeframe)
     frames: list[pd.DataFrame] = []
     segments = []
@@ -67,13 +72,19 @@ def fetch_ohlcv(
         if log is not None:
             log.append(f"{symbol}: chunk {seg_start.date()} -> {seg_end.date()}")
         try:
-            df_chunk = get_ohlcv(symbol, timeframe, seg_start.isoformat(), seg_end.isoformat(), cache_root=cache_root)
+            df_chunk = get_ohlcv(symbol, timeframe, seg_start.isoformat(), seg_end.isoformat(), cache_root=cache_root,
+                                 compact=compact)
             if df_chunk.empty:
                 raise ValueError("empty chunk")
         except Exception:
-            df_chunk = fetch_ccxt_hist_range(symbol, timeframe, seg_start.isoformat(), seg_end.isoformat())
+            df_chunk = fetch_ccxt_hist_range(symbol, timeframe, seg_start.isoformat(), seg_end.isoformat(),
+                                             compact=compact)
         frames.append(df_chunk)
 
+    if compact:
+        out = CompactOHLCV.concat(frames)
+        print(f"[data] {symbol} aggregated bars: {len(out)} (compact, {out.nbytes / 2**20:.1f} MiB)")
+        return out
     if not frames:
         return pd.DataFrame(columns=["open","high","low","close","volume"], index=pd.to_datetime([]))
     df = pd.concat(frames).sort_index()
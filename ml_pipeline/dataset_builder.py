@@ -16,7 +16,7 @@ import sys
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.append(str(PROJECT_ROOT))
 
-from engine.divergence import bear_divergence, bull_divergence, pivot_high, pivot_low  # noqa: E402
+from engine.indicator_cache import cached_divergences  # noqa: E402
 
 if "ml_pipeline" not in sys.modules:
     from ml_pipeline.data_loader import fetch_ohlcv  # type: ignore # noqa: E402
@@ -139,10 +139,9 @@ def build_trades(
     range_low: int = 5,
     range_up: int = 60,
 ) -> List[Trade]:
-    bull = bull_divergence(df["rsi"], df["low"], lb_left, lb_right, range_low, range_up).fillna(False)
-    bear = bear_divergence(df["rsi"], df["high"], lb_left, lb_right, range_low, range_up).fillna(False)
-    pl_mask = pivot_low(df["rsi"], lb_left, lb_right)
-    ph_mask = pivot_high(df["rsi"], lb_left, lb_right)
+    div = cached_divergences(df["rsi"], df["low"], df["high"], lb_left, lb_right, range_low, range_up)
+    bull, bear = div.bull, div.bear
+    pl_mask, ph_mask = div.pivot_low, div.pivot_high
     trades: List[Trade] = []
     long_entry = None
     short_entry = None
@@ -304,8 +303,9 @@ def build_dataset(
     target_pct: float = 0.015,
     log: list[str] | None = None,
     cache_root: Path | None = None,
+    compact: bool = False,
 ) -> pd.DataFrame:
-    raw = fetch_ohlcv(symbol, timeframe, start_date, end_date, log=log, cache_root=cache_root)
+    raw = fetch_ohlcv(symbol, timeframe, start_date, end_date, log=log, cache_root=cache_root, compact=compact)
     enriched = add_indicators(raw)
     enriched = add_htf_context(enriched)
     enriched = add_sr_context(enriched)
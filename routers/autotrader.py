@@ -15,7 +15,8 @@ except Exception:
     BYBIT_HTTP = None
 
 from schemas.autotrader import AutoTraderBalanceRequest, AutoTraderOrderRequest, AutoTraderDemoRequest, AutoTraderTradingStopRequest
-from engine.bybit_data import fetch_ticker, fetch_instrument_info, BYBIT_MAINNET, BYBIT_TESTNET
+from engine.bybit_data import fetch_ticker, BYBIT_MAINNET, BYBIT_TESTNET
+from engine.instruments import bybit_instrument
 
 
 router = APIRouter(tags=["autotrader"])
@@ -93,21 +94,19 @@ def _format_price(symbol: str, price: float | None, base_url: str) -> str | None
         return None
     if price <= 0:
         return "0"
-    info = fetch_instrument_info(symbol, category="linear", base_url=base_url)
-    price_filter = info.get("priceFilter", {}) if isinstance(info, dict) else {}
-    tick = _dec(price_filter.get("tickSize"))
+    inst = bybit_instrument(symbol, base_url)
+    tick = _dec(inst.tick_size if inst else None)
     price_dec = _dec(price)
     price_dec, precision = _quantize_price(price_dec, tick if tick > 0 else None)
     return _format_qty(price_dec, precision)
 
 
 def _apply_qty_filters(symbol: str, qty: float, price_used: float | None, base_url: str) -> tuple[str, float | None]:
-    info = fetch_instrument_info(symbol, category="linear", base_url=base_url)
-    lot = info.get("lotSizeFilter", {}) if isinstance(info, dict) else {}
-    min_qty = _dec(lot.get("minOrderQty"))
-    max_qty = _dec(lot.get("maxOrderQty"))
-    step = _dec(lot.get("qtyStep"))
-    min_notional = _dec(lot.get("minNotionalValue") or lot.get("minNotional"))
+    inst = bybit_instrument(symbol, base_url)
+    min_qty = _dec(inst.min_qty if inst else None)
+    max_qty = _dec(inst.max_qty if inst else None)
+    step = _dec(inst.qty_step if inst else None)
+    min_notional = _dec(inst.min_notional if inst else None)
 
     qty_dec = _dec(qty)
     qty_dec, precision = _quantize_qty(qty_dec, step if step > 0 else None)
@@ -1,17 +1,37 @@
 from __future__ import annotations
 
+import json
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
 import logging
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
-from fastapi import APIRouter, HTTPException
+import numpy as np
+import pandas as pd
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response, StreamingResponse
 
 from engine.pine_long import PineLongEngine
-from engine.storage import get_ohlcv
+from engine.compact import as_frame
+from engine.data import mintick
+from engine.equity import downsample, max_drawdown_pct
+from engine.procs import drop_process_pool, pool_size, process_pool
+from engine.result_cache import data_fingerprint, result_cache, result_key
+from engine.signals import compute_signals
+from engine.storage import ensure_range_in_db, get_ohlcv
 from experiment.concurrent_backtester import ConcurrentBacktestConfig, run_concurrent_backtest
-from schemas.backtest import BacktestReq, ConcurrentBacktestRequest, DeepBacktestRequest
+from schemas.backtest import (
+    BacktestReq,
+    ConcurrentBacktestRequest,
+    DeepBacktestRequest,
+    SweepRequest,
+    WalkForwardRequest,
+)
+from services.backtest_jobs import BacktestJob, backtest_jobs, sse_format
 from utils.dates import norm_date, validate_date_range
 from utils.symbols import norm_symbol
 
@@ -26,153 +46,440 @@ def _candles_from_df(xdf):
     ]
 
 
+def _equity_json(series) -> str:
+    """JSON array of {"t", "equity"} points built from EquitySeries arrays.
+
+    Timestamps and numbers are formatted with vectorized NumPy string ops
+    (float -> str is the same shortest repr json.dumps uses), so no per-point
+    dicts or Timestamps are created.
+    """
+    if len(series) == 0:
+        return "[]"
+    t_ms = np.asarray(series.t_ms, dtype=np.int64)
+    unit = "us" if (t_ms % 1000).any() else "s"  # matches Timestamp.isoformat()
+    ts = np.datetime_as_string(t_ms.astype("datetime64[ms]"), unit=unit)
+    eq = np.asarray(series.equity, dtype=np.float64)
+    vals = eq.astype(str)
+    if not np.isfinite(eq).all():
+        vals = np.where(np.isfinite(eq), vals, "null")
+    items = np.char.add(np.char.add('{"t":"', ts), '","equity":')
+    items = np.char.add(np.char.add(items, vals), "}")
+    return "[" + ",".join(items.tolist()) + "]"
+
+
+def _json_body(payload: Dict[str, Any], raw: Dict[str, str]) -> str:
+    """Serialize payload and splice in pre-rendered JSON fragments under `raw` keys."""
+    body = json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+    extra = ",".join(f"{json.dumps(k)}:{frag}" for k, frag in raw.items())
+    if extra:
+        body = body[:-1] + ("," if len(body) > 2 else "") + extra + "}"
+    return body
+
+
+def _json_response(payload: Dict[str, Any], raw: Dict[str, str]) -> Response:
+    return Response(content=_json_body(payload, raw), media_type="application/json")
+
+
+def _hedge_params(pine_params: Dict[str, Any]) -> Dict[str, Any]:
+    # Derive init_stop_pct robustly: prefer explicit init_stop_pct (percent),
+    # fall back to use_pct_stop (fraction) if provided, else default 5.
+    _init_stop_pct = pine_params.get("init_stop_pct", None)
+    if _init_stop_pct is None:
+        try:
+            ups = pine_params.get("use_pct_stop", None)
+            if ups is not None:
+                _init_stop_pct = float(ups) * 100.0
+        except Exception:
+            _init_stop_pct = None
+    if _init_stop_pct is None:
+        _init_stop_pct = 5.0
+
+    return {
+        "rsi_length": pine_params.get("rsi_length", 14),
+        "rsi_overbought": pine_params.get("rsi_overbought", 79),
+        "rsi_oversold": pine_params.get("rsi_oversold", 27),
+        "lookbackLeft": pine_params.get("lookbackLeft", 5),
+        "lookbackRight": pine_params.get("lookbackRight", 5),
+        "rangeUpper": pine_params.get("rangeUpper", 60),
+        "rangeLower": pine_params.get("rangeLower", 5),
+        "initial_capital": pine_params.get("initial_capital", 10000.0),
+        "size_equity_pct": pine_params.get("size_equity_pct", 0.50),
+        "fee_bps": pine_params.get("fee_bps", 5.0),
+        "init_stop_pct": _init_stop_pct,
+        "trail_start_pct": pine_params.get("trail_start_pct", 1.0),
+        "trail_bump_pct": pine_params.get("trail_bump_pct", 2.0),
+        "trail_step_pct": pine_params.get("trail_step_pct", 5.0),
+        "tp_half_pct": pine_params.get("tp_half_pct", 7.0),
+        "allow_stop_above_entry": pine_params.get("allow_stop_above_entry", True),
+        "cooldown_bars": pine_params.get("cooldownBars", 0),
+        # experimental profit-lock removed
+    }
+
+
+def _monte_carlo(payload: Dict[str, Any], spec: Optional[Dict[str, Any]], trades) -> Dict[str, Any]:
+    """Add the optional monte_carlo block (trade resampling, see engine.montecarlo)."""
+    if spec is None:
+        return payload
+    from engine.montecarlo import monte_carlo_trades
+
+    unknown = sorted(set(spec) - {"paths", "method", "seed"})
+    if unknown:
+        raise ValueError(f"unknown monte_carlo options: {', '.join(unknown)}")
+    payload["monte_carlo"] = monte_carlo_trades(trades, payload["metrics"]["Ending Equity"], **spec)
+    return payload
+
+
+def _ms(date: str) -> int:
+    return int(pd.to_datetime(date).timestamp() * 1000)
+
+
+def _normalized_params(engine: str, pine_params: Dict[str, Any]) -> Dict[str, Any]:
+    """The parameters the engine actually runs with (defaults filled in, unknown keys dropped)."""
+    if engine == "both":
+        import dataclasses
+
+        from engine.hedge import HedgeParams, _coerce
+
+        return dataclasses.asdict(_coerce(HedgeParams(**_hedge_params(pine_params))))
+    if engine == "short":
+        from engine.pine_short import PineShortEngine as Engine
+    else:
+        Engine = PineLongEngine
+    return dict(vars(Engine(pine_params).p))
+
+
+def _cache_key(symbol: str, engine: str, pine_params: Dict[str, Any], start: str, end: str,
+               timeframe: str, monte_carlo: Optional[Dict[str, Any]] = None,
+               compact: bool = False, view: Tuple = (0, None, 1000)) -> Optional[str]:
+    """Result-cache key for one symbol run, or None when it should not be cached.
+
+    view is (trades_offset, trades_limit, mtm_points), the response options.
+    Call it once the range is in the OHLCV cache: the key covers those bars.
+    """
+    if not result_cache.enabled:
+        return None
+    if monte_carlo is not None and monte_carlo.get("seed") is None:
+        return None  # unseeded resampling differs on every run
+    start_ms, end_ms = _ms(start), _ms(end)
+    fp = data_fingerprint(symbol, timeframe, start_ms, end_ms)
+    if fp is None:
+        return None
+    extra = {"monte_carlo": monte_carlo, "mintick": mintick(symbol), "compact": bool(compact),
+             "view": list(view)}
+    return result_key(engine or "long", _normalized_params(engine, pine_params), symbol, timeframe,
+                      start_ms, end_ms, fp, extra)
+
+
+def _mark_to_market(payload: Dict[str, Any], raw: Dict[str, str], curve, points: Optional[int]) -> None:
+    """Add the per-bar equity_mtm series (at most `points` points) and its drawdown."""
+    if points == 0:
+        return
+    payload["metrics"]["Max Drawdown MTM (%)"] = round(max_drawdown_pct(curve.equity), 2)
+    raw["equity_mtm"] = _equity_json(downsample(curve, points))
+
+
+def _simulation(progress, n: int):
+    """An engine's progress(bars_done, bars, metrics) as the job's simulation phase."""
+    return lambda i, _n, m: progress("simulation", pct=round(100.0 * i / n, 1), bars=i,
+                                     metrics=jsonable_encoder(m))
+
+
+def _run_symbol(symbol: str, df, engine: str, pine_params: Dict[str, Any], start: str, end: str,
+                timeframe: str, monte_carlo: Optional[Dict[str, Any]] = None, trades_offset: int = 0,
+                trades_limit: Optional[int] = None, mtm_points: Optional[int] = 1000,
+                progress=None) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """One symbol's /backtest payload plus pre-rendered JSON fragments (trades, markers, equity).
+
+    The trade list is paged with trades_offset (negative counts from the end)
+    and trades_limit (None: all); trades_total and trades_offset say which
+    part was returned. equity_mtm is the mark-to-market equity of every bar,
+    strided down to mtm_points (None: every bar, 0: left out).
+
+    progress(phase, **info) (a BacktestJob's) gets the indicators,
+    simulation (pct, bars, partial metrics) and render phases.
+    """
+    df = as_frame(df)
+    n = len(df)
+    if engine == "both":
+        from engine.hedge import HedgeParams, _coerce, backtest_hedged, equity_curve_hedged
+
+        hedge_params = _hedge_params(pine_params)
+        if progress is None:
+            metrics, trades, eq, eqL, eqS = backtest_hedged(symbol, df, hedge_params)
+        else:
+            p = _coerce(HedgeParams(**hedge_params))
+            progress("indicators", bars=n)
+            sig = compute_signals(df, p.rsi_length, p.lookbackLeft, p.lookbackRight, p.rangeLower, p.rangeUpper)
+            metrics, trades, eq, eqL, eqS = backtest_hedged(symbol, df, hedge_params, signals=sig,
+                                                            progress=_simulation(progress, n))
+            progress("render")
+        curve = equity_curve_hedged(df, trades, hedge_params) if mtm_points != 0 else None
+        # Diagnostics: log any negative prices before sanitization to trace root cause
+        try:
+            neg = np.flatnonzero((trades.price < 0) | (trades.stop < 0))
+            if neg.size:
+                from datetime import datetime as _dt
+
+                suspects = [{k: _t.get(k) for k in ("t", "side", "type", "price", "qty", "pnl", "stop")}
+                            for _t in (trades[int(j)] for j in neg)]
+                with open("server.err.log", "a", encoding="utf-8") as _logf:
+                    _logf.write(
+                        f"[DEBUG backtest hedge] {symbol} {start}->{end} tf={timeframe} NEGATIVE entries at {_dt.utcnow().isoformat()}Z: {suspects}\n"
+                    )
+        except Exception:
+            pass
+        # Sanitize any negative prices (visual/logging only)
+        np.abs(trades.price, out=trades.price)
+        candles = _candles_from_df(df)
+        # Optional debug field (non-breaking) to surface any negative price trades that slipped through
+        dbg = [trades[int(j)] for j in np.flatnonzero(trades.price < 0)]
+        page, offset = trades.page(trades_offset, trades_limit)
+        payload = {
+            "metrics": jsonable_encoder(metrics),
+            "trades_total": len(trades),
+            "trades_offset": offset,
+            "candles": candles,
+            "debug_negatives": dbg,
+            "used_params": {"init_stop_pct": hedge_params.get("init_stop_pct")},
+        }
+        # equity arrays go straight to JSON text (no per-point dicts)
+        raw = {
+            "trades": page.to_json(),
+            "markers": trades.markers_json(),
+            "equity_series": _equity_json(eq),
+            "equity_series_long": _equity_json(eqL),
+            "equity_series_short": _equity_json(eqS),
+        }
+        _mark_to_market(payload, raw, curve, mtm_points)
+        return _monte_carlo(payload, monte_carlo, trades), raw
+    if engine == "short":
+        from engine.pine_short import PineShortEngine as Engine
+    else:
+        Engine = PineLongEngine
+    eng = Engine(pine_params)
+    if progress is None:
+        metrics, trades = eng.backtest(symbol, df)
+    else:
+        progress("indicators", bars=n)
+        sig = compute_signals(df, *eng.signal_params())
+        metrics, trades = eng.backtest(symbol, df, signals=sig, progress=_simulation(progress, n))
+        progress("render")
+    candles = _candles_from_df(df)
+    page, offset = trades.page(trades_offset, trades_limit)
+    payload = {
+        "metrics": jsonable_encoder(metrics),
+        "trades_total": len(trades),
+        "trades_offset": offset,
+        "candles": candles,
+    }
+    raw = {
+        "trades": page.to_json(),
+        "markers": trades.markers_json(side=engine or "long"),
+        # closed-trade equity from realized PnL
+        "equity_series": trades.equity_json(float(pine_params.get("initial_capital", 10000.0))),
+    }
+    if mtm_points != 0:
+        _mark_to_market(payload, raw, eng.equity_curve(df, trades), mtm_points)
+    return _monte_carlo(payload, monte_carlo, trades), raw
+
+
+def _symbol_worker(symbol: str, df, engine: str, pine_params: Dict[str, Any], start: str, end: str,
+                   timeframe: str, monte_carlo: Optional[Dict[str, Any]] = None, trades_offset: int = 0,
+                   trades_limit: Optional[int] = None, mtm_points: Optional[int] = 1000,
+                   progress=None) -> Tuple[Dict[str, Any], str]:
+    """Run one symbol and render its payload to JSON text (runs in a pool process)."""
+    payload, raw = _run_symbol(symbol, df, engine, pine_params, start, end, timeframe, monte_carlo,
+                               trades_offset, trades_limit, mtm_points, progress)
+    return payload["metrics"], _json_body(payload, raw)
+
+
+def _prefetch(symbols: List[str], timeframe: str, start: str, end: str, compact: bool = False,
+              cache_key=None) -> Tuple[Dict[str, Any], Dict[str, Optional[str]]]:
+    """OHLCV for every symbol, loaded concurrently; failures come back as the exception.
+
+    compact=True keeps each history as float32 CompactOHLCV until its own run.
+    With cache_key (symbol -> key or None), a stored result comes back as its
+    (metrics, body) tuple instead and its bars are not read. Returns
+    (frames, keys).
+    """
+    keys: Dict[str, Optional[str]] = {}
+
+    def _load(sym):
+        try:
+            if cache_key is not None:
+                ensure_range_in_db(sym, timeframe, start, end)
+                keys[sym] = key = cache_key(sym)
+                hit = result_cache.get(key) if key else None
+                if hit is not None:
+                    return hit
+            return get_ohlcv(sym, timeframe, start, end, compact=compact, shared=True,
+                             ensure=cache_key is None)
+        except Exception as exc:
+            return exc
+
+    with ThreadPoolExecutor(max_workers=max(1, min(8, len(symbols)))) as pool:
+        frames = dict(zip(symbols, pool.map(_load, symbols)))
+    return frames, keys
+
+
+def _aggregate(metrics: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Equal-capital basket over the symbols that ran."""
+    if not metrics:
+        return {"Symbols": 0}
+
+    def _num(m, key):
+        try:
+            return float(m.get(key) or 0.0)
+        except (TypeError, ValueError):
+            return 0.0
+
+    rets = {s: _num(m, "Total Return (%)") for s, m in metrics.items()}
+    return {
+        "Symbols": len(metrics),
+        # every symbol starts with the same capital, so the basket return is the mean
+        "Total Return (%)": round(sum(rets.values()) / len(rets), 2),
+        "Num Trades": int(sum(_num(m, "Num Trades") for m in metrics.values())),
+        "Ending Equity": round(sum(_num(m, "Ending Equity") for m in metrics.values()), 2),
+        "Profitable Symbols": sum(1 for r in rets.values() if r > 0),
+        "Best Symbol": max(rets, key=rets.get),
+        "Worst Symbol": min(rets, key=rets.get),
+    }
+
+
+def _view(req: BacktestReq) -> Tuple[int, Optional[int], Optional[int]]:
+    return req.trades_offset, req.trades_limit, req.equity_mtm_points
+
+
+def _backtest_many(req: BacktestReq, symbols: List[str], start: str, end: str, timeframe: str,
+                   pine_params: Dict[str, Any]) -> Response:
+    engine = req.engine or "long"
+    view = _view(req)
+    t0 = time.perf_counter()
+    frames, keys = _prefetch(
+        symbols, timeframe, start, end, compact=req.compact,
+        cache_key=lambda sym: _cache_key(sym, engine, pine_params, start, end, timeframe, req.monte_carlo,
+                                         compact=req.compact, view=view),
+    )
+    errors: Dict[str, str] = {}
+    done: Dict[str, Tuple[Dict[str, Any], str]] = {}
+    jobs = []
+    for sym in symbols:
+        df = frames[sym]
+        if isinstance(df, tuple):
+            done[sym] = df  # stored result
+        elif isinstance(df, ValueError):
+            errors[sym] = str(df)
+        elif isinstance(df, Exception):
+            log.error("backtest data fetch failed for %s: %r", sym, df)
+            errors[sym] = "data fetch failed"
+        else:
+            jobs.append((sym, df))
+
+    workers = req.workers if req.workers is not None else pool_size()
+    workers = max(1, min(int(workers), pool_size(), len(jobs) or 1))
+
+    def _collect(sym, fut_or_fn):
+        try:
+            done[sym] = fut_or_fn()
+        except ValueError as exc:
+            errors[sym] = str(exc)
+        except Exception:
+            log.exception("backtest failed for %s", sym)
+            errors[sym] = "backtest failed"
+
+    if workers <= 1:
+        for sym, df in jobs:
+            _collect(sym, lambda: _symbol_worker(sym, df, engine, pine_params, start, end, timeframe,
+                                                 req.monte_carlo, *view))
+    else:
+        pool = process_pool()
+        pending = {}
+        queue = list(jobs)
+        try:
+            while queue or pending:
+                while queue and len(pending) < workers:
+                    sym, df = queue.pop(0)
+                    pending[pool.submit(_symbol_worker, sym, df, engine, pine_params, start, end, timeframe,
+                                        req.monte_carlo, *view)] = sym
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                broken = False
+                for fut in finished:
+                    if isinstance(fut.exception(), BrokenProcessPool):
+                        broken = True  # its symbol stays pending and is reported below
+                    else:
+                        _collect(pending.pop(fut), fut.result)
+                if broken:
+                    raise BrokenProcessPool("a worker process died")
+        except BrokenProcessPool:
+            log.error("backtest process pool broke; it is replaced on the next request")
+            drop_process_pool(pool)
+            for sym in [*pending.values(), *(s for s, _df in queue)]:
+                errors[sym] = "backtest failed"
+    for sym, _df in jobs:
+        if sym in done and keys.get(sym):
+            result_cache.put(keys[sym], sym, timeframe, _ms(start), _ms(end), *done[sym])
+
+    ok = [s for s in symbols if s in done]
+    results = "{" + ",".join(f"{json.dumps(s)}:{done[s][1]}" for s in ok) + "}"
+    return _json_response(
+        {
+            "symbols": symbols,
+            "engine": engine,
+            "timeframe": timeframe,
+            "start": start,
+            "end": end,
+            "workers": workers,
+            "cached": [s for s in symbols if isinstance(frames[s], tuple)],
+            "elapsed_s": round(time.perf_counter() - t0, 3),
+            "aggregate": _aggregate({s: done[s][0] for s in ok}),
+            "errors": errors,
+        },
+        {"results": results},
+    )
+
+
+def _backtest_one(req: BacktestReq, symbol: str, start: str, end: str, timeframe: str,
+                  pine_params: Dict[str, Any], progress=None) -> str:
+    """JSON body of a single-symbol run, from the result cache when stored.
+
+    progress(phase, **info) also gets the fetch (chunk, chunks), cached and
+    load phases.
+    """
+    fetch = None if progress is None else (lambda k, m: progress("fetch", chunk=k, chunks=m))
+    ensure_range_in_db(symbol, timeframe, start, end, progress=fetch)
+    view = _view(req)
+    key = _cache_key(symbol, req.engine, pine_params, start, end, timeframe, req.monte_carlo, view=view)
+    hit = result_cache.get(key) if key else None
+    if hit is not None:
+        if progress is not None:
+            progress("cached")
+        return hit[1]
+    if progress is not None:
+        progress("load")
+    df = get_ohlcv(symbol, timeframe, start, end, ensure=False)
+    metrics, body = _symbol_worker(symbol, df, req.engine, pine_params, start, end, timeframe,
+                                   req.monte_carlo, *view, progress=progress)
+    if key:
+        result_cache.put(key, symbol, timeframe, _ms(start), _ms(end), metrics, body)
+    return body
+
+
 @router.post("/backtest")
 def backtest(req: BacktestReq):
     try:
-        symbol = norm_symbol(req.symbols[0])
+        symbols = list(dict.fromkeys(norm_symbol(s) for s in req.symbols))
+        if not symbols:
+            raise ValueError("no symbols given")
         start = norm_date(req.start)
         end = norm_date(req.end)
         validate_date_range(start, end)
         timeframe = req.overrides.get("timeframe_hist", "3m")
         pine_params = {k: v for k, v in req.overrides.items() if k not in ("timeframe_hist",)}
-        df = get_ohlcv(symbol, timeframe, start, end)
-
-        if req.engine == "both":
-            from engine.hedge import backtest_hedged
-
-            # Derive init_stop_pct robustly: prefer explicit init_stop_pct (percent),
-            # fall back to use_pct_stop (fraction) if provided, else default 5.
-            _init_stop_pct = pine_params.get("init_stop_pct", None)
-            if _init_stop_pct is None:
-                try:
-                    ups = pine_params.get("use_pct_stop", None)
-                    if ups is not None:
-                        _init_stop_pct = float(ups) * 100.0
-                except Exception:
-                    _init_stop_pct = None
-            if _init_stop_pct is None:
-                _init_stop_pct = 5.0
-
-            hedge_params = {
-                "rsi_length": pine_params.get("rsi_length", 14),
-                "rsi_overbought": pine_params.get("rsi_overbought", 79),
-                "rsi_oversold": pine_params.get("rsi_oversold", 27),
-                "lookbackLeft": pine_params.get("lookbackLeft", 5),
-                "lookbackRight": pine_params.get("lookbackRight", 5),
-                "rangeUpper": pine_params.get("rangeUpper", 60),
-                "rangeLower": pine_params.get("rangeLower", 5),
-                "initial_capital": pine_params.get("initial_capital", 10000.0),
-                "size_equity_pct": pine_params.get("size_equity_pct", 0.50),
-                "fee_bps": pine_params.get("fee_bps", 5.0),
-                "init_stop_pct": _init_stop_pct,
-                "trail_start_pct": pine_params.get("trail_start_pct", 1.0),
-                "trail_bump_pct": pine_params.get("trail_bump_pct", 2.0),
-                "trail_step_pct": pine_params.get("trail_step_pct", 5.0),
-                "tp_half_pct": pine_params.get("tp_half_pct", 7.0),
-                "allow_stop_above_entry": pine_params.get("allow_stop_above_entry", True),
-                "cooldown_bars": pine_params.get("cooldownBars", 0),
-                # experimental profit-lock removed
-            }
-            metrics, trades, eq, eqL, eqS = backtest_hedged(symbol, df, hedge_params)
-            # Diagnostics: log any negative prices before sanitization to trace root cause
-            try:
-                suspects = []
-                for _t in trades:
-                    pr = _t.get("price")
-                    stp = _t.get("stop")
-                    if pr is not None:
-                        try:
-                            if float(pr) < 0:
-                                suspects.append({k: _t.get(k) for k in ("t", "side", "type", "price", "qty", "pnl", "stop")})
-                        except Exception:
-                            pass
-                    if stp is not None:
-                        try:
-                            if float(stp) < 0:
-                                if _t not in suspects:
-                                    suspects.append({k: _t.get(k) for k in ("t", "side", "type", "price", "qty", "pnl", "stop")})
-                        except Exception:
-                            pass
-                if suspects:
-                    from datetime import datetime as _dt
-
-                    with open("server.err.log", "a", encoding="utf-8") as _logf:
-                        _logf.write(
-                            f"[DEBUG backtest hedge] {symbol} {start}->{end} tf={timeframe} NEGATIVE entries at {_dt.utcnow().isoformat()}Z: {suspects}\n"
-                        )
-            except Exception:
-                pass
-            # Sanitize any negative prices (visual/logging only)
-            for _t in trades:
-                try:
-                    if float(_t.get("price", 0)) < 0:
-                        _t["price"] = abs(float(_t.get("price")))
-                except Exception:
-                    pass
-            candles = _candles_from_df(df)
-            markers = [
-                {
-                    "t": t.get("t"),
-                    "price": (abs(float(t.get("price", 0))) if (t.get("price") is not None) else None),
-                    "type": t.get("type"),
-                    "side": t.get("side"),
-                }
-                for t in trades
-                if t.get("type") in ("enter", "exit_sl", "exit_trail", "exit_half_tp", "exit_normal")
-            ]
-            equity_series = [{"t": ts.isoformat(), "equity": float(val)} for ts, val in eq]
-            equity_series_long = [{"t": ts.isoformat(), "equity": float(val)} for ts, val in eqL]
-            equity_series_short = [{"t": ts.isoformat(), "equity": float(val)} for ts, val in eqS]
-            # Optional debug field (non-breaking) to surface any negative price trades that slipped through
-            dbg = []
-            try:
-                for _t in trades:
-                    try:
-                        if _t.get("price") is not None and float(_t.get("price")) < 0:
-                            dbg.append({k: _t.get(k) for k in ("t", "side", "type", "price", "qty", "pnl", "stop")})
-                    except Exception:
-                        pass
-            except Exception:
-                pass
-            return {
-                "metrics": metrics,
-                "trades": trades,
-                "candles": candles,
-                "markers": markers,
-                "equity_series": equity_series,
-                "equity_series_long": equity_series_long,
-                "equity_series_short": equity_series_short,
-                "debug_negatives": dbg,
-                "used_params": {"init_stop_pct": hedge_params.get("init_stop_pct")},
-            }
-        else:
-            if req.engine == "short":
-                from engine.pine_short import PineShortEngine as Engine
-            else:
-                Engine = PineLongEngine
-            eng = Engine(pine_params)
-            metrics, trades = eng.backtest(symbol, df)
-            candles = _candles_from_df(df)
-            markers = [
-                {"t": t.get("t"), "price": t.get("price"), "type": t.get("type"), "side": (req.engine or "long")}
-                for t in trades
-                if t.get("type") in ("enter", "exit_sl", "exit_normal")
-            ]
-            # build equity from realized PnL
-            eq = []
-            equity = float(pine_params.get("initial_capital", 10000.0))
-            for t in trades:
-                if str(t.get("type", "")).startswith("exit"):
-                    equity += float(t.get("pnl", 0))
-                    from datetime import datetime as _dt
-
-                    try:
-                        ts = _dt.fromisoformat(t.get("t").replace("Z", ""))
-                    except Exception:
-                        ts = None
-                    if ts:
-                        eq.append({"t": ts.isoformat(), "equity": equity})
-            return {"metrics": metrics, "trades": trades, "candles": candles, "markers": markers, "equity_series": eq}
+        if len(symbols) > 1:
+            return _backtest_many(req, symbols, start, end, timeframe, pine_params)
+
+        body = _backtest_one(req, symbols[0], start, end, timeframe, pine_params)
+        return Response(content=body, media_type="application/json")
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
     except Exception:
@@ -180,27 +487,34 @@ def backtest(req: BacktestReq):
         raise HTTPException(status_code=500, detail="backtest failed")
 
 
+def _deep_req(req: DeepBacktestRequest) -> BacktestReq:
+    """The single-symbol BacktestReq a deep request stands for (3 years back by default)."""
+    symbol = norm_symbol(req.symbol)
+    today = datetime.utcnow().date()
+    end_raw = req.end or today.isoformat()
+    start_raw = req.start or (today - timedelta(days=365 * 3)).isoformat()
+    start = norm_date(start_raw)
+    end = norm_date(end_raw)
+    validate_date_range(start, end)
+    overrides = dict(req.overrides or {})
+    if "timeframe_hist" not in overrides and req.timeframe:
+        overrides["timeframe_hist"] = req.timeframe
+    return BacktestReq(
+        symbols=[symbol],
+        start=start,
+        end=end,
+        overrides=overrides,
+        engine=req.engine or "long",
+        trades_offset=req.trades_offset,
+        trades_limit=req.trades_limit,
+        equity_mtm_points=req.equity_mtm_points,
+    )
+
+
 @router.post("/backtest/deep")
 def backtest_deep(req: DeepBacktestRequest):
     try:
-        symbol = norm_symbol(req.symbol)
-        today = datetime.utcnow().date()
-        end_raw = req.end or today.isoformat()
-        start_raw = req.start or (today - timedelta(days=365 * 3)).isoformat()
-        start = norm_date(start_raw)
-        end = norm_date(end_raw)
-        validate_date_range(start, end)
-        overrides = dict(req.overrides or {})
-        if "timeframe_hist" not in overrides and req.timeframe:
-            overrides["timeframe_hist"] = req.timeframe
-        bt_req = BacktestReq(
-            symbols=[symbol],
-            start=start,
-            end=end,
-            overrides=overrides,
-            engine=req.engine or "long",
-        )
-        return backtest(bt_req)
+        return backtest(_deep_req(req))
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
     except Exception:
@@ -208,6 +522,134 @@ def backtest_deep(req: DeepBacktestRequest):
         raise HTTPException(status_code=500, detail="backtest failed")
 
 
+def _start_deep_job(req: DeepBacktestRequest) -> BacktestJob:
+    bt_req = _deep_req(req)
+    timeframe = bt_req.overrides.get("timeframe_hist", "3m")
+    pine_params = {k: v for k, v in bt_req.overrides.items() if k not in ("timeframe_hist",)}
+    params = {"symbol": bt_req.symbols[0], "start": bt_req.start, "end": bt_req.end,
+              "timeframe": timeframe, "engine": bt_req.engine}
+    return backtest_jobs.submit("deep", params, lambda job: _backtest_one(
+        bt_req, bt_req.symbols[0], bt_req.start, bt_req.end, timeframe, pine_params, progress=job.progress))
+
+
+def _job_or_404(job_id: str) -> BacktestJob:
+    job = backtest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="unknown or expired job")
+    return job
+
+
+def _sse(job: BacktestJob, after: int = 0) -> StreamingResponse:
+    return StreamingResponse(
+        (sse_format(ev) for ev in job.events(after)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/backtest/deep/stream")
+def backtest_deep_stream(req: DeepBacktestRequest):
+    """Deep backtest as a background job, streamed as Server-Sent Events.
+
+    Events: progress ({"phase": queued|fetch|cached|load|indicators|simulation|render, ...}),
+    then one of result (the /backtest/deep body), error or cancelled. The
+    queued event carries job_id for /backtest/jobs/{job_id}/events and DELETE.
+    """
+    try:
+        return _sse(_start_deep_job(req))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@router.post("/backtest/jobs")
+def backtest_job_create(req: DeepBacktestRequest):
+    try:
+        job = _start_deep_job(req)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"job_id": job.id, "status": job.status, "events": f"/backtest/jobs/{job.id}/events"}
+
+
+@router.get("/backtest/jobs")
+def backtest_job_list():
+    return {"jobs": backtest_jobs.list()}
+
+
+@router.get("/backtest/jobs/{job_id}")
+def backtest_job_status(job_id: str):
+    return _job_or_404(job_id).info()
+
+
+@router.get("/backtest/jobs/{job_id}/events")
+def backtest_job_events(job_id: str, request: Request, after: int = 0):
+    """SSE stream of a job's events; resumes after Last-Event-ID (or ?after=) on reconnect."""
+    job = _job_or_404(job_id)
+    try:
+        after = int(request.headers.get("last-event-id") or after)
+    except ValueError:
+        pass
+    return _sse(job, max(0, after))
+
+
+@router.delete("/backtest/jobs/{job_id}")
+def backtest_job_cancel(job_id: str):
+    job = _job_or_404(job_id)
+    return {"job_id": job.id, "cancelled": job.cancel(), "status": job.status}
+
+
+@router.post("/backtest/sweep")
+def backtest_sweep(req: SweepRequest):
+    try:
+        from engine.sweep import expand_grid, run_sweep
+
+        symbol = norm_symbol(req.symbol)
+        start = norm_date(req.start)
+        end = norm_date(req.end)
+        validate_date_range(start, end)
+        combos = (expand_grid(req.grid) if req.grid else []) + list(req.combos)
+        if not combos:
+            combos = [{}]
+        df = get_ohlcv(symbol, req.timeframe, start, end, shared=True)
+        out = run_sweep(symbol, df, combos, base=req.base, rank_by=req.rank_by,
+                        ascending=req.ascending, workers=req.workers)
+        if req.top and req.top > 0:
+            out["results"] = out["results"][: req.top]
+        out.update({"timeframe": req.timeframe, "start": start, "end": end})
+        return out
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except Exception:
+        log.exception("backtest/sweep failed")
+        raise HTTPException(status_code=500, detail="sweep failed")
+
+
+@router.post("/backtest/walkforward")
+def backtest_walkforward(req: WalkForwardRequest):
+    try:
+        from engine.sweep import expand_grid
+        from engine.walkforward import run_walkforward
+
+        symbol = norm_symbol(req.symbol)
+        start = norm_date(req.start)
+        end = norm_date(req.end)
+        validate_date_range(start, end)
+        combos = (expand_grid(req.grid) if req.grid else []) + list(req.combos)
+        if not combos:
+            combos = [{}]
+        df = get_ohlcv(symbol, req.timeframe, start, end, shared=True)
+        out = run_walkforward(symbol, df, combos, base=req.base, engine=req.engine, folds=req.folds,
+                              train_bars=req.train_bars, test_bars=req.test_bars, anchored=req.anchored,
+                              rank_by=req.rank_by, ascending=req.ascending, workers=req.workers,
+                              preset_slot=req.preset_slot, product=req.product)
+        out.update({"timeframe": req.timeframe, "start": start, "end": end})
+        return out
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except Exception:
+        log.exception("backtest/walkforward failed")
+        raise HTTPException(status_code=500, detail="walk-forward failed")
+
+
 @router.post("/backtest/concurrent")
 def backtest_concurrent(req: ConcurrentBacktestRequest):
     try:
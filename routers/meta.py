@@ -95,3 +95,17 @@ def debug_codehash():
         return {"backtest_sha1": h, "len": len(src)}
     except Exception as e:
         return {"error": str(e)}
+
+
+@router.get("/debug/indicator_cache")
+def debug_indicator_cache():
+    from engine.indicator_cache import indicator_cache
+
+    return indicator_cache.stats()
+
+
+@router.get("/debug/result_cache")
+def debug_result_cache():
+    from engine.result_cache import result_cache
+
+    return result_cache.stats()
@@ -9,7 +9,7 @@ except Exception:
     ccxt = None
 
 from engine.data import fetch_ccxt_recent
-from engine.indicators import rsi_wilder
+from engine.indicator_cache import cached_rsi_wilder
 from engine.pine_long import PineLongEngine
 from engine.storage import get_recent
 from utils.symbols import norm_symbol
@@ -136,7 +136,7 @@ def signals(
                     price = float(tkr.get("last", price))
                 except Exception:
                     pass
-            rsi_last = float(rsi_wilder(df["close"], eng.p.rsi_length).iloc[-1])
+            rsi_last = float(cached_rsi_wilder(df["close"], eng.p.rsi_length).iloc[-1])
             action = "HOLD"
             if trades:
                 last = trades[-1]
@@ -146,7 +146,7 @@ def signals(
                     action = "SELL"
             snap = {"symbol": sy, "price": price, "rsi": rsi_last, "signal": {"action": action}}
             out.append(snap)
-            logs[sy] = trades[-5:]
+            logs[sy] = trades[-5:].to_dicts()
         except Exception as e:
             out.append({"symbol": sym, "error": str(e)})
     return {"signals": out, "logs": logs}
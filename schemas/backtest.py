@@ -11,6 +11,12 @@ class BacktestReq(BaseModel):
     end: str
     overrides: Dict[str, Any] = Field(default_factory=dict)  # timeframe_hist and Pine params
     engine: str = Field(default="long")  # long|short|both
+    workers: Optional[int] = None  # symbols of a multi-symbol run in flight at once (None = the shared pool size)
+    monte_carlo: Optional[Dict[str, Any]] = None  # {"paths", "method": bootstrap|shuffle, "seed"}: adds a monte_carlo block
+    compact: bool = False  # multi-symbol runs: hold prefetched OHLCV as float32 (engine.compact)
+    trades_offset: int = 0  # first trade returned; negative counts from the end (-500: the last 500)
+    trades_limit: Optional[int] = None  # trades per page (None = all)
+    equity_mtm_points: Optional[int] = 1000  # per-bar mark-to-market equity, strided to this many points (None = every bar, 0 = off)
 
 
 class ConcurrentBacktestRequest(BaseModel):
@@ -34,3 +40,40 @@ class DeepBacktestRequest(BaseModel):
     start: Optional[str] = None
     end: Optional[str] = None
     engine: str = Field(default="long")
+    trades_offset: int = 0
+    trades_limit: Optional[int] = None
+    equity_mtm_points: Optional[int] = 1000
+
+
+class SweepRequest(BaseModel):
+    symbol: str = "BTC/USDT"
+    timeframe: str = "3m"
+    start: str
+    end: str
+    base: Dict[str, Any] = Field(default_factory=dict)  # Pine params shared by every combo
+    grid: Dict[str, List[Any]] = Field(default_factory=dict)  # param -> values (cartesian product)
+    combos: List[Dict[str, Any]] = Field(default_factory=list)  # explicit combos, added after the grid
+    rank_by: str = "Total Return (%)"
+    ascending: bool = False
+    top: int = 50
+    workers: Optional[int] = None
+
+
+class WalkForwardRequest(BaseModel):
+    symbol: str = "BTC/USDT"
+    timeframe: str = "3m"
+    start: str
+    end: str
+    engine: str = Field(default="long")  # long|hedge
+    base: Dict[str, Any] = Field(default_factory=dict)
+    grid: Dict[str, List[Any]] = Field(default_factory=dict)
+    combos: List[Dict[str, Any]] = Field(default_factory=list)
+    folds: int = 6
+    train_bars: Optional[int] = None  # default: 3x the test window
+    test_bars: Optional[int] = None   # default: history split over folds + 3
+    anchored: bool = False            # train from the first bar instead of a rolling window
+    rank_by: str = "Total Return (%)"
+    ascending: bool = False
+    workers: Optional[int] = None
+    preset_slot: Optional[str] = None  # bull|bear|chop: store the last fold's winner as a preset
+    product: str = "mystrix"
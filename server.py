@@ -27,9 +27,12 @@ from routers.universe import router as universe_router
 from routers.market import router as market_router
 from routers.admin import router as admin_router
 from services.auth import ensure_admin_user, get_user_from_sid
+from engine.instruments import instrument_store
 
 app = FastAPI(title="TradeBoard API - Pine Long", version="3.0")
 ensure_admin_user()
+# exchange filters for mintick()/order placement, refreshed off the request path
+instrument_store.warm("binance", "bybit")
 
 def _parse_origins(raw: str | None) -> list[str]:
     if not raw:
@@ -0,0 +1,175 @@
+"""Background backtest jobs with a replayable event log for SSE clients.
+
+A job runs in a small thread pool (MYSTRIX_BACKTEST_JOBS workers, default
+2) and appends events to its log: "progress" (phase plus details),
+"result" (the final JSON body), "error" or "cancelled". Readers follow the
+log with events(after=last_seen_id), so a client that reconnects with
+Last-Event-ID picks up where it left off. Finished jobs are kept for
+MYSTRIX_JOB_TTL seconds (default 600).
+
+Cancelling sets a flag that the job's next progress() call turns into
+JobCancelled. It derives from BaseException, like asyncio.CancelledError,
+so the broad `except Exception` fallbacks on the data path do not swallow
+it.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+log = logging.getLogger("services.backtest_jobs")
+
+TERMINAL = ("result", "error", "cancelled")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, str(default)))
+    except ValueError:
+        return default
+
+
+class JobCancelled(BaseException):
+    pass
+
+
+class BacktestJob:
+    def __init__(self, kind: str, params: Dict[str, Any]):
+        self.id = secrets.token_hex(8)
+        self.kind = kind
+        self.params = params
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.status = "queued"
+        self._events: List[Tuple[int, str, str]] = []  # (id, event, JSON data)
+        self._cond = threading.Condition()
+        self._cancel = threading.Event()
+
+    def _emit(self, event: str, data: str) -> None:
+        with self._cond:
+            self._events.append((len(self._events) + 1, event, data))
+            if event in TERMINAL:
+                self.status = {"result": "done"}.get(event, event)
+                self.finished = time.time()
+            self._cond.notify_all()
+
+    def progress(self, phase: str, **info: Any) -> None:
+        """Report progress; raises JobCancelled once the job was cancelled."""
+        if self._cancel.is_set():
+            raise JobCancelled()
+        self.status = "running"
+        self._emit("progress", json.dumps({"phase": phase, **info}, allow_nan=False, default=str))
+
+    def cancel(self) -> bool:
+        """Ask the job to stop at its next progress() call; False if it already ended."""
+        if self.finished is not None:
+            return False
+        self._cancel.set()
+        return True
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def events(self, after: int = 0, keepalive: float = 15.0) -> Iterator[Optional[Tuple[int, str, str]]]:
+        """Events with id > after, blocking for new ones; None every `keepalive` s of silence."""
+        pos = after
+        while True:
+            with self._cond:
+                if len(self._events) <= pos and self.finished is None:
+                    self._cond.wait(keepalive)
+                batch = self._events[pos:]
+                done = self.finished is not None
+            if not batch and not done:
+                yield None
+            for ev in batch:
+                yield ev
+            pos += len(batch)
+            if done and pos >= len(self._events):
+                return
+
+    def info(self) -> Dict[str, Any]:
+        with self._cond:
+            last = next((json.loads(d) for _i, e, d in reversed(self._events) if e == "progress"), None)
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "params": self.params,
+                "status": self.status,
+                "created": self.created,
+                "finished": self.finished,
+                "events": len(self._events),
+                "last_progress": last,
+            }
+
+
+class JobRegistry:
+    def __init__(self, workers: Optional[int] = None, ttl: Optional[float] = None):
+        self.workers = max(1, workers if workers is not None else _env_int("MYSTRIX_BACKTEST_JOBS", 2))
+        self.ttl = float(ttl if ttl is not None else _env_int("MYSTRIX_JOB_TTL", 600))
+        self._jobs: Dict[str, BacktestJob] = {}
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def submit(self, kind: str, params: Dict[str, Any], fn: Callable[[BacktestJob], str]) -> BacktestJob:
+        """Run fn(job) in the background; its return value is the result body (JSON text)."""
+        job = BacktestJob(kind, params)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="backtest-job")
+            pool = self._pool
+        job._emit("progress", json.dumps({"phase": "queued", "job_id": job.id}))
+        pool.submit(self._run, job, fn)
+        return job
+
+    @staticmethod
+    def _run(job: BacktestJob, fn: Callable[[BacktestJob], str]) -> None:
+        try:
+            if job.cancelled:
+                raise JobCancelled()
+            body = fn(job)
+            if job.cancelled:
+                raise JobCancelled()
+        except JobCancelled:
+            job._emit("cancelled", "{}")
+        except ValueError as exc:
+            job._emit("error", json.dumps({"status": 400, "detail": str(exc)}))
+        except Exception:
+            log.exception("backtest job %s failed", job.id)
+            job._emit("error", json.dumps({"status": 500, "detail": "backtest failed"}))
+        else:
+            job._emit("result", body)
+
+    def _prune(self) -> None:
+        now = time.time()
+        for jid in [j.id for j in self._jobs.values() if j.finished is not None and now - j.finished > self.ttl]:
+            del self._jobs[jid]
+
+    def get(self, job_id: str) -> Optional[BacktestJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._prune()
+            jobs = list(self._jobs.values())
+        return [j.info() for j in jobs]
+
+
+def sse_format(ev: Optional[Tuple[int, str, str]]) -> str:
+    """One Server-Sent Events frame; None becomes a keep-alive comment."""
+    if ev is None:
+        return ": keep-alive\n\n"
+    eid, event, data = ev
+    return f"id: {eid}\nevent: {event}\ndata: {data}\n\n"
+
+
+backtest_jobs = JobRegistry()
@@ -10,7 +10,8 @@ from typing import Any, Dict, Iterable, List, Optional, Tuple
 import pandas as pd
 
 from engine.bybit_data import fetch_klines, BYBIT_MAINNET
-from engine.divergence import bear_divergence, bull_divergence, pivot_high, pivot_low
+from engine.divergence import Divergences
+from engine.indicator_cache import cached_divergences
 from ml_pipeline.feature_engineering import add_indicators, base_features
 from ml_pipeline.dataset_builder import (
     add_htf_context,
@@ -44,21 +45,22 @@ def _load_filter(model_path: str) -> MLFilter:
     return MLFilter(Path(model_path))
 
 
-def _latest_divergence_indices(df: pd.DataFrame, direction: int) -> Optional[Tuple[pd.Timestamp, int, int]]:
-    """Return the latest divergence timestamp and pivot indices for strength features."""
+def _divergences(df: pd.DataFrame) -> Divergences:
     lb_left, lb_right, range_low, range_up = 5, 5, 5, 60
+    return cached_divergences(df["rsi"], df["low"], df["high"], lb_left, lb_right, range_low, range_up)
+
+
+def _latest_divergence_indices(div: Divergences, direction: int) -> Optional[Tuple[pd.Timestamp, int, int]]:
+    """Return the latest divergence timestamp and pivot indices for strength features."""
     if direction == 1:
-        mask = bull_divergence(df["rsi"], df["low"], lb_left, lb_right, range_low, range_up)
-        pivots = pivot_low(df["rsi"], lb_left, lb_right)
+        mask, pivot_positions = div.bull, div.low_pivots
     else:
-        mask = bear_divergence(df["rsi"], df["high"], lb_left, lb_right, range_low, range_up)
-        pivots = pivot_high(df["rsi"], lb_left, lb_right)
+        mask, pivot_positions = div.bear, div.high_pivots
     if not mask.any():
         return None
     ts = mask[mask].index[-1]
-    pivot_positions = [i for i, flag in enumerate(pivots) if flag]
-    prev_idx = pivot_positions[-2] if len(pivot_positions) >= 2 else (pivot_positions[-1] if pivot_positions else None)
-    last_idx = pivot_positions[-1] if pivot_positions else None
+    prev_idx = int(pivot_positions[-2]) if len(pivot_positions) >= 2 else (int(pivot_positions[-1]) if len(pivot_positions) else None)
+    last_idx = int(pivot_positions[-1]) if len(pivot_positions) else None
     return ts, prev_idx, last_idx
 
 
@@ -70,16 +72,13 @@ def _cluster_strength(div_mask: pd.Series, window: int = 200, cap: int = 3) -> f
     return min(count, cap) / float(cap)
 
 
-def _build_features(df: pd.DataFrame, ts: pd.Timestamp, direction: int, prev_idx: int | None, last_idx: int | None, symbol: str) -> Dict[str, Any]:
+def _build_features(df: pd.DataFrame, ts: pd.Timestamp, direction: int, prev_idx: int | None, last_idx: int | None,
+                    symbol: str, div: Divergences) -> Dict[str, Any]:
     feats = base_features(df, ts, direction, symbol)
     feats["holding_minutes"] = 0.0  # live signal has no realized hold yet
     feats.update(divergence_strength_features(df, prev_idx, last_idx, direction))
     # cluster strength uses divergence flags of the same direction
-    if direction == 1:
-        div_mask = bull_divergence(df["rsi"], df["low"], 5, 5, 5, 60)
-    else:
-        div_mask = bear_divergence(df["rsi"], df["high"], 5, 5, 5, 60)
-    feats["cluster_strength"] = _cluster_strength(div_mask)
+    feats["cluster_strength"] = _cluster_strength(div.bull if direction == 1 else div.bear)
     return feats
 
 
@@ -135,8 +134,9 @@ def detect_live_divergences(
                 continue
 
             # choose the most recent divergence of either direction
-            bull_info = _latest_divergence_indices(df, direction=1)
-            bear_info = _latest_divergence_indices(df, direction=-1)
+            div = _divergences(df)
+            bull_info = _latest_divergence_indices(div, direction=1)
+            bear_info = _latest_divergence_indices(div, direction=-1)
             pick: Optional[Tuple[pd.Timestamp, int, int, int]] = None  # ts, prev_idx, last_idx, dir
             if bull_info:
                 pick = (bull_info[0], bull_info[1], bull_info[2], 1)
@@ -167,7 +167,7 @@ def detect_live_divergences(
                     }
                 )
 
-            feats = _build_features(df, ts, direction, prev_idx, last_idx, sym)
+            feats = _build_features(df, ts, direction, prev_idx, last_idx, sym, div)
             if filt is not None:
                 decision = filt.score(feats, threshold=threshold)
             else:
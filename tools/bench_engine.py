@@ -0,0 +1,638 @@
+#!/usr/bin/env python3
+"""Engine benchmarks and parity checks on synthetic bars.
+
+Usage:
+  python tools/bench_engine.py pine-kernel --bars 200000
+  python tools/bench_engine.py hedge-kernel --bars 500000
+  python tools/bench_engine.py divergence-stream --bars 100000
+  python tools/bench_engine.py pivots --bars 1000000
+  python tools/bench_engine.py divergences --bars 1000000
+  python tools/bench_engine.py incremental-indicators --bars 50000
+  python tools/bench_engine.py remix-bot --days 365 --symbols 3
+  python tools/bench_engine.py sweep --bars 100000 --workers 4
+  python tools/bench_engine.py indicator-cache --bars 200000
+  python tools/bench_engine.py walk-forward --bars 100000 --folds 6
+  python tools/bench_engine.py monte-carlo --trades 1000 --paths 10000
+  python tools/bench_engine.py compact-ohlcv --bars 1000000
+  python tools/bench_engine.py trade-log --bars 500000
+  python tools/bench_engine.py mtm-equity --bars 500000
+  python tools/bench_engine.py ohlcv-store --bars 1000000
+  python tools/bench_engine.py bulk-upsert --bars 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+import numpy as np
+import pandas as pd
+
+from engine.bot import RemixBot
+from engine.compact import CompactOHLCV
+from engine.hedge import backtest_hedged
+from engine.divergence import (
+    DivergenceStream,
+    bear_divergence,
+    bear_divergence_pandas,
+    bull_divergence,
+    bull_divergence_pandas,
+    divergences,
+    pivot_high_rolling,
+    pivot_low_rolling,
+    pivots,
+)
+from engine.indicator_cache import IndicatorCache, indicator_cache
+from engine.indicator_state import IndicatorSet
+from engine.indicators import atr, bollinger, ema, rsi_wilder
+from engine.kernels import jit_enabled
+from engine.montecarlo import monte_carlo
+from engine.pine_long import PineLongEngine
+from engine.signals import DivergenceSignals, compute_signals
+from engine.sweep import expand_grid, run_sweep
+from engine.walkforward import make_folds, run_walkforward
+
+
+def synthetic_bars(n: int, seed: int = 7, freq: str = "3min") -> pd.DataFrame:
+    """Random-walk OHLCV with slow regime swings so RSI visits both extremes."""
+    rng = np.random.default_rng(seed)
+    rets = rng.normal(0.0, 0.004, n) + 0.002 * np.sin(np.arange(n) / 300.0)
+    close = 20000 * np.exp(np.cumsum(rets))
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.002, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.002, n)))
+    vol = rng.lognormal(5, 1, n)
+    idx = pd.date_range("2022-01-01", periods=n, freq=freq)
+    return pd.DataFrame({"open": open_, "high": high, "low": low, "close": close, "volume": vol}, index=idx)
+
+
+def _timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - t0
+
+
+def bench_pine_kernel(args: argparse.Namespace) -> None:
+    df = synthetic_bars(args.bars, seed=args.seed)
+    params = {"enableHTFGate": args.gate}
+    kernel = PineLongEngine(params, use_kernel=True)
+    # first call pays the JIT compile; time the second one
+    kernel.backtest("BENCH/USDT", df.iloc[:1000])
+    (k_metrics, k_trades), k_s = _timed(kernel.backtest, "BENCH/USDT", df)
+    print(f"kernel (jit={'on' if jit_enabled() else 'off'}): {len(df)} bars in {k_s:.3f}s "
+          f"-> {len(df) / k_s:,.0f} bars/s, {k_metrics['Num Trades']} trades")
+    if args.skip_reference:
+        return
+    ref_df = df.iloc[: args.reference_bars] if args.reference_bars else df
+    ref = PineLongEngine(params, use_kernel=False)
+    (r_metrics, r_trades), r_s = _timed(ref.backtest, "BENCH/USDT", ref_df)
+    print(f"reference loop: {len(ref_df)} bars in {r_s:.3f}s -> {len(ref_df) / r_s:,.0f} bars/s")
+    if ref_df is not df:
+        k_metrics, k_trades = kernel.backtest("BENCH/USDT", ref_df)
+    if (k_metrics, k_trades) != (r_metrics, r_trades):
+        raise SystemExit("PARITY FAILED: kernel and reference loop disagree")
+    print(f"parity ok: {r_metrics['Num Trades']} trades, ending equity {r_metrics['Ending Equity']}")
+
+
+def bench_hedge_kernel(args: argparse.Namespace) -> None:
+    df = synthetic_bars(args.bars, seed=args.seed)
+    backtest_hedged("BENCH/USDT", df.iloc[:1000], {})  # JIT warm-up
+    k_out, k_s = _timed(backtest_hedged, "BENCH/USDT", df, {})
+    print(f"hedge kernel (jit={'on' if jit_enabled() else 'off'}): {len(df)} bars in {k_s:.3f}s "
+          f"-> {len(df) / k_s:,.0f} bars/s, {k_out[0]['Num Trades']} trades, {len(k_out[2])} equity points")
+    if args.skip_reference:
+        return
+    ref_df = df.iloc[: args.reference_bars] if args.reference_bars else df
+    r_out, r_s = _timed(backtest_hedged, "BENCH/USDT", ref_df, {}, use_kernel=False)
+    print(f"reference loop: {len(ref_df)} bars in {r_s:.3f}s -> {len(ref_df) / r_s:,.0f} bars/s")
+    if ref_df is not df:
+        k_out = backtest_hedged("BENCH/USDT", ref_df, {})
+    same = k_out[:2] == r_out[:2] and all(
+        np.array_equal(a.t_ms, b.t_ms) and np.array_equal(a.equity, b.equity)
+        for a, b in zip(k_out[2:], r_out[2:])
+    )
+    if not same:
+        raise SystemExit("PARITY FAILED: hedge kernel and reference loop disagree")
+    print(f"parity ok: {r_out[0]['Num Trades']} trades, ending equity {r_out[0]['Ending Equity']}")
+
+
+def bench_divergence_stream(args: argparse.Namespace) -> None:
+    df = synthetic_bars(args.bars, seed=args.seed)
+    rsi = rsi_wilder(df["close"], 14).fillna(50)
+    (bull, bear), b_s = _timed(lambda: (bull_divergence(rsi, df["low"], 5, 5, 5, 60),
+                                        bear_divergence(rsi, df["high"], 5, 5, 5, 60)))
+    print(f"batch: {len(df)} bars in {b_s:.3f}s")
+    stream = DivergenceStream(5, 5, 5, 60)
+    s_bull = np.zeros(len(df), dtype=bool)
+    s_bear = np.zeros(len(df), dtype=bool)
+    r, lo, hi = rsi.to_numpy(), df["low"].to_numpy(), df["high"].to_numpy()
+    t0 = time.perf_counter()
+    for k in range(len(df)):
+        out = stream.update(r[k], lo[k], hi[k])
+        if out is not None:
+            s_bull[out[0]], s_bear[out[0]] = out[1], out[2]
+    s_s = time.perf_counter() - t0
+    print(f"stream: {len(df)} updates in {s_s:.3f}s -> {s_s / len(df) * 1e6:.2f} us/bar (lag {stream.lag} bars)")
+    if not ((s_bull == bull.to_numpy()).all() and (s_bear == bear.to_numpy()).all()):
+        raise SystemExit("PARITY FAILED: DivergenceStream disagrees with batch divergences")
+    print(f"parity ok: {int(bull.sum())} bull / {int(bear.sum())} bear")
+
+
+def bench_pivots(args: argparse.Namespace) -> None:
+    df = synthetic_bars(args.bars, seed=args.seed)
+    rsi = rsi_wilder(df["close"], 14)
+    for left, right in ((5, 5), (3, 1), (1, 8)):
+        (ref_low, ref_high), r_s = _timed(lambda: (pivot_low_rolling(rsi, left, right),
+                                                   pivot_high_rolling(rsi, left, right)))
+        (low, high), p_s = _timed(pivots, rsi, left, right)
+        print(f"left={left} right={right}: rolling {r_s:.3f}s, pivots {p_s:.3f}s ({r_s / p_s:.1f}x) "
+              f"over {len(rsi)} bars")
+        if not (low.equals(ref_low) and high.equals(ref_high)):
+            raise SystemExit(f"PARITY FAILED for left={left} right={right}")
+    print("parity ok: pivot masks match the rolling implementation")
+
+
+def bench_divergences(args: argparse.Namespace) -> None:
+    import warnings
+
+    df = synthetic_bars(args.bars, seed=args.seed)
+    rsi = rsi_wilder(df["close"], 14).fillna(50)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)  # valuewhen's replace() downcast
+        (ref_bull, ref_bear), r_s = _timed(lambda: (bull_divergence_pandas(rsi, df["low"], 5, 5, 5, 60),
+                                                    bear_divergence_pandas(rsi, df["high"], 5, 5, 5, 60)))
+    (bull, bear), s_s = _timed(lambda: (bull_divergence(rsi, df["low"], 5, 5, 5, 60),
+                                        bear_divergence(rsi, df["high"], 5, 5, 5, 60)))
+    div, f_s = _timed(divergences, rsi, df["low"], df["high"], 5, 5, 5, 60)
+    print(f"{len(df)} bars: pandas bull+bear {r_s:.3f}s, array bull+bear {s_s:.3f}s, "
+          f"fused divergences() {f_s:.3f}s ({r_s / f_s:.1f}x)")
+    if not (bull.equals(ref_bull) and bear.equals(ref_bear) and div.bull.equals(ref_bull)
+            and div.bear.equals(ref_bear)):
+        raise SystemExit("PARITY FAILED: divergence masks differ from the pandas implementation")
+    print(f"parity ok: {int(div.bull.sum())} bull / {int(div.bear.sum())} bear, "
+          f"{len(div.low_pivots)} pivot lows / {len(div.high_pivots)} pivot highs")
+
+
+def bench_incremental_indicators(args: argparse.Namespace) -> None:
+    import json
+
+    df = synthetic_bars(args.bars, seed=args.seed)
+    spec = {"rsi": ("rsi", 14), "ema21": ("ema", 21), "ema55": ("ema", 55), "atr": ("atr", 14),
+            "hh20": ("max", 20, "high"), "ll20": ("min", 20, "low"), "bb": ("bollinger", 20, 2.0)}
+    upper, mid, lower = bollinger(df["close"], 20, 2.0)
+    batch = {"rsi": rsi_wilder(df["close"], 14), "ema21": ema(df["close"], 21), "ema55": ema(df["close"], 55),
+             "atr": atr(df, 14), "hh20": df["high"].rolling(20).max(), "ll20": df["low"].rolling(20).min(),
+             "bb_upper": upper, "bb_mid": mid, "bb_lower": lower}
+    cols = {c: df[c].to_numpy() for c in ("high", "low", "close")}
+    live = IndicatorSet("BENCH/USDT", "3m", spec)
+    got = {k: np.empty(len(df)) for k in batch}
+    t0 = time.perf_counter()
+    for i, ts in enumerate(df.index):
+        out = live.update(ts, {c: a[i] for c, a in cols.items()})
+        for k, v in out.items():
+            got[k][i] = v
+    u_s = time.perf_counter() - t0
+    print(f"update: {len(df)} bars in {u_s:.3f}s -> {u_s / len(df) * 1e6:.2f} us/bar for {len(batch)} outputs")
+    for k, ref in batch.items():
+        if not np.array_equal(got[k], ref.to_numpy(), equal_nan=True):
+            raise SystemExit(f"PARITY FAILED: incremental {k} disagrees with the batch indicator")
+
+    # restart at a cut point: JSON state of the prefix, then catch up on the full frame
+    cut = len(df) * 2 // 3
+    head = IndicatorSet("BENCH/USDT", "3m", spec)
+    head.catch_up(df.iloc[:cut])
+    blob = json.dumps(head.state(), allow_nan=False)
+    restored, r_s = _timed(IndicatorSet.from_state, json.loads(blob))
+    last, c_s = _timed(restored.catch_up, df)
+    print(f"restore: {len(blob) / 1024:.1f} KiB state in {r_s * 1e3:.2f}ms, "
+          f"catch-up of {len(df) - cut} bars in {c_s:.3f}s")
+    for k, ref in batch.items():
+        if not np.array_equal(np.float64(last[k]), ref.iloc[-1], equal_nan=True):
+            raise SystemExit(f"PARITY FAILED: restored {k} disagrees with the batch indicator")
+    print("parity ok: incremental and restored values match the batch indicators")
+
+
+def bench_remix_bot(args: argparse.Namespace) -> None:
+    cfg = {
+        "symbols": [f"BENCH{k}/USDT" for k in range(args.symbols)],
+        "initial_capital": 10000.0, "fee_bps": 5,
+        "rsi_length": 14, "rsi_overbought": 81, "rsi_oversold": 21,
+        "lb_left": 5, "lb_right": 5, "range_low": 5, "range_up": 60,
+        "max_wait_bars": 25, "pct_stop": 0.018, "cooldown_3m_bars": 20,
+        "ema_short": 12, "ema_long": 26, "chop_length": 14,
+        "use_dxy_filter": False, "bb_period": 20, "bb_std": 2.0, "base_risk_pct": 0.005,
+    }
+    frames = {s: synthetic_bars(args.days * 480, seed=args.seed + k)
+              for k, s in enumerate(cfg["symbols"])}
+    bot = RemixBot(cfg)
+    bot.load_hist = lambda symbol: frames[symbol]
+    metrics, s = _timed(bot.run_backtest)
+    bars = sum(len(f) for f in frames.values())
+    print(f"RemixBot: {len(frames)} symbols x {args.days} days of 3m bars ({bars} bars) in {s:.2f}s "
+          f"-> {bars / s:,.0f} bars/s, {metrics['Num Trades']} trades")
+
+
+def bench_sweep(args: argparse.Namespace) -> None:
+    df = synthetic_bars(args.bars, seed=args.seed)
+    grid = {
+        "rsi_length": [10, 14],
+        "lookbackLeft": [3, 5],
+        "lookbackRight": [3, 5],
+        "rsi_oversold": [20, 25, 30, 35],
+        "rsi_overbought": [70, 75, 80],
+        "use_pct_stop": [0.01, 0.018, 0.03],
+        "max_wait_bars": [15, 25],
+        "cooldownBars": [0, 15],
+    }
+    combos = expand_grid(grid)
+    PineLongEngine().backtest("BENCH/USDT", df.iloc[:1000])  # JIT warm-up
+    out = run_sweep("BENCH/USDT", df, combos, workers=args.workers)
+    print(f"sweep: {out['combos']} combos in {out['groups']} indicator groups over {len(df)} bars, "
+          f"{out['workers']} workers: {out['elapsed_s']:.2f}s -> {out['combos'] / out['elapsed_s']:,.1f} combos/s")
+    best = out["results"][0]
+    print(f"best: {best['params']} -> {best['Total Return (%)']}% over {best['Num Trades']} trades")
+    rng = np.random.default_rng(args.seed)
+    for row in rng.choice(out["results"], size=min(5, len(combos)), replace=False):
+        metrics, _ = PineLongEngine(row["params"]).backtest("BENCH/USDT", df)
+        if any(metrics[k] != row[k] for k in metrics):
+            raise SystemExit(f"PARITY FAILED for {row['params']}")
+    print("parity ok: sampled combos match standalone backtests")
+
+
+def bench_indicator_cache(args: argparse.Namespace) -> None:
+    import tempfile
+
+    from engine import indicator_cache as ic_mod
+    from engine.pine_short import PineShortEngine
+
+    df = synthetic_bars(args.bars, seed=args.seed)
+    PineLongEngine().backtest("BENCH/USDT", df.iloc[:1000])  # JIT warm-up
+
+    def _run():
+        return (PineLongEngine().backtest("BENCH/USDT", df),
+                PineShortEngine().backtest("BENCH/USDT", df),
+                backtest_hedged("BENCH/USDT", df, {})[:2])
+
+    indicator_cache.clear()
+    cold, cold_s = _timed(_run)
+    warm, warm_s = _timed(_run)
+    print(f"long+short+hedge over {len(df)} bars: cold {cold_s:.2f}s, warm {warm_s:.2f}s")
+    print(f"stats: {indicator_cache.stats()}")
+    if repr(cold) != repr(warm):
+        raise SystemExit("PARITY FAILED: cached run differs")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ic_mod.indicator_cache = IndicatorCache(max_bytes=1, spill_dir=tmp)
+        try:
+            spilled_cold = _run()
+            spilled_warm = _run()
+            print(f"spill-only cache: {ic_mod.indicator_cache.stats()}")
+        finally:
+            ic_mod.indicator_cache = indicator_cache
+    if repr(spilled_cold) != repr(cold) or repr(spilled_warm) != repr(cold):
+        raise SystemExit("PARITY FAILED: disk-spilled run differs")
+    print("parity ok: cached, spilled and fresh runs match")
+
+
+def bench_walk_forward(args: argparse.Namespace) -> None:
+    df = synthetic_bars(args.bars, seed=args.seed)
+    base = {"enableHTFGate": True}
+    combos = expand_grid({
+        "rsi_length": [10, 14],
+        "lookbackLeft": [3, 5],
+        "rsi_oversold": [25, 30],
+        "use_pct_stop": [0.01, 0.018, 0.03],
+        "max_wait_bars": [15, 25],
+    })
+    PineLongEngine().backtest("BENCH/USDT", df.iloc[:1000])  # JIT warm-up
+    out = run_walkforward("BENCH/USDT", df, combos, base=base, folds=args.folds, workers=args.workers)
+    print(f"walk-forward: {out['combos']} combos x {args.folds} folds in {out['groups']} indicator groups "
+          f"over {len(df)} bars, {out['workers']} workers: {out['elapsed_s']:.2f}s")
+    print(f"OOS: {out['oos_metrics']}")
+    # each test window must equal a standalone run on the history up to its end
+    for fold, (_, b, c) in zip(out["folds"], make_folds(len(df), args.folds)):
+        eng = PineLongEngine({**base, **fold["params"]})
+        prefix = df.iloc[:c]
+        s = compute_signals(prefix, *eng.signal_params())
+        sig = DivergenceSignals(key=s.key, rsi=s.rsi.iloc[b:], bull=s.bull.iloc[b:], bear=s.bear.iloc[b:],
+                                wave_low=s.wave_low.iloc[b:], wave_high=s.wave_high.iloc[b:])
+        metrics, _ = eng.backtest("BENCH/USDT", prefix.iloc[b:], signals=sig, gate=eng.htf_gate(prefix).iloc[b:])
+        if metrics != fold["test_metrics"]:
+            raise SystemExit(f"PARITY FAILED for fold {fold['fold']}")
+    print("parity ok: test windows match standalone runs on their history prefix")
+
+
+def bench_monte_carlo(args: argparse.Namespace) -> None:
+    rng = np.random.default_rng(args.seed)
+    returns = rng.normal(0.002, 0.02, args.trades)
+    for method in ("bootstrap", "shuffle"):
+        out, secs = _timed(monte_carlo, returns, paths=args.paths, method=method, seed=args.seed)
+        print(f"{method}: {args.paths} paths x {args.trades} trades in {secs:.3f}s")
+        print(f"  total return %: {out['total_return_pct']}")
+        print(f"  max drawdown %: {out['max_drawdown_pct']}")
+    # one path with the trades in their original order is the backtest's own path
+    curve = np.r_[1.0, np.cumprod(1.0 + returns)]
+    mdd = float((curve / np.maximum.accumulate(curve) - 1.0).min() * 100.0)
+    print(f"original order: total {(curve[-1] - 1.0) * 100.0:.2f}%, max drawdown {mdd:.2f}%")
+
+
+def bench_compact_ohlcv(args: argparse.Namespace) -> None:
+    import pickle
+
+    df = synthetic_bars(args.bars, seed=args.seed)
+    df.index.name = "timestamp"
+    compact, c_s = _timed(CompactOHLCV.from_frame, df)
+    frame_mb = df.memory_usage(index=True, deep=True).sum() / 2**20
+    print(f"{len(df)} bars: DataFrame {frame_mb:.1f} MiB, compact {compact.nbytes / 2**20:.1f} MiB "
+          f"({compact.nbytes / 2**20 / frame_mb:.0%}), built in {c_s:.3f}s")
+    print(f"pickled: DataFrame {len(pickle.dumps(df, protocol=5)) / 2**20:.1f} MiB, "
+          f"compact {len(pickle.dumps(compact, protocol=5)) / 2**20:.1f} MiB")
+    back, e_s = _timed(compact.to_frame)
+    if not back.index.equals(df.index):
+        raise SystemExit("PARITY FAILED: timestamps changed in the round trip")
+    rel = max(float(np.max(np.abs(back[c].to_numpy() / df[c].to_numpy() - 1.0))) for c in df.columns)
+    print(f"expand to float64 in {e_s:.3f}s; max relative error {rel:.2e} (bound {2.0 ** -24:.2e})")
+    if rel > 2.0 ** -24:
+        raise SystemExit("PRECISION FAILED: error above the float32 rounding bound")
+    n = min(len(df), args.backtest_bars)
+    ref = PineLongEngine({}).backtest("BENCH/USDT", df.iloc[:n])[0]
+    got = PineLongEngine({}).backtest("BENCH/USDT", compact.between(None, int(compact.ts[n - 1])))[0]
+    for key in ("Num Trades", "Total Return (%)", "Ending Equity"):
+        print(f"  long engine on {n} bars, {key}: float64 {ref[key]} / compact {got[key]}")
+
+
+def bench_trade_log(args: argparse.Namespace) -> None:
+    import json
+
+    df = synthetic_bars(args.bars, seed=args.seed)
+    _metrics, trades, *_ = backtest_hedged("BENCH/USDT", df, {})
+    dicts, d_s = _timed(trades.to_dicts)
+    ref, r_s = _timed(json.dumps, dicts, separators=(",", ":"))
+    got, j_s = _timed(trades.to_json)
+    print(f"{len(trades)} hedge trades: arrays {trades.nbytes / 2**20:.2f} MiB; "
+          f"dicts {d_s:.3f}s + json.dumps {r_s:.3f}s vs to_json {j_s:.3f}s")
+    page, p_s = _timed(trades.to_json, -500, None)
+    print(f"last-500 page rendered in {p_s * 1000:.1f} ms")
+    if got != ref or page != json.dumps(dicts[-500:], separators=(",", ":")):
+        raise SystemExit("PARITY FAILED: to_json differs from json.dumps(to_dicts())")
+    if json.loads(trades.markers_json()) != [
+        {"t": t["t"], "price": t["price"], "type": t["type"], "side": t["side"]} for t in dicts
+    ]:
+        raise SystemExit("PARITY FAILED: markers differ")
+    print("parity ok: to_json and markers_json match the dict rendering")
+
+
+def bench_mtm_equity(args: argparse.Namespace) -> None:
+    from engine.equity import downsample, max_drawdown_pct
+    from engine.hedge import equity_curve_hedged
+
+    df = synthetic_bars(args.bars, seed=args.seed)
+    eng = PineLongEngine()
+    metrics, trades = eng.backtest("BENCH/USDT", df)
+    curve, c_s = _timed(eng.equity_curve, df, trades)
+    print(f"long engine: {len(df)} bars, {len(trades)} events, mark-to-market curve in {c_s * 1000:.1f} ms")
+    print(f"max drawdown: closed-trade {metrics['Max Drawdown (%)']}%, mark-to-market {max_drawdown_pct(curve.equity):.2f}%")
+    # flat after every exit: the curve must equal the engine's realized equity there
+    exits = trades.is_exit
+    realized = eng.p.initial_capital + np.cumsum(
+        np.where(exits, np.nan_to_num(trades.pnl), -trades.price * trades.qty * eng.p.fee_bps / 10_000.0))
+    err = np.abs(curve.equity[np.searchsorted(curve.t_ms, trades.t_ms[exits])] - realized[exits])
+    print(f"max abs difference to realized equity at exits: {err.max() if err.size else 0.0:.2e}")
+    if err.size and err.max() > 1e-6 * eng.p.initial_capital:
+        raise SystemExit("PARITY FAILED: mark-to-market curve misses realized equity")
+    _metrics, h_trades, *_ = backtest_hedged("BENCH/USDT", df, {})
+    h_curve, h_s = _timed(equity_curve_hedged, df, h_trades, {})
+    print(f"hedge engine: curve in {h_s * 1000:.1f} ms, ending {h_curve.equity[-1]:.2f} vs {_metrics['Ending Equity']}")
+    print(f"downsampled to {len(downsample(curve, args.points))} points (--points {args.points})")
+
+
+def bench_ohlcv_store(args: argparse.Namespace) -> None:
+    import os
+    import pickle
+    import tempfile
+
+    from engine import columnar, storage
+    from engine.columnar import parquet_store
+    from engine.segments import segment_store
+
+    df = synthetic_bars(args.bars, seed=args.seed)
+    symbol, tf = "BENCH/USDT", "3m"
+    start, end = df.index[len(df) // 10].isoformat(), df.index[-1].isoformat()
+    backends = ["sqlite", "segments"] + (["parquet"] if columnar.pa is not None else [])
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        with storage._conn(root) as con:
+            _, w_sql = _timed(con.executemany,
+                              "INSERT OR REPLACE INTO ohlcv(symbol, timeframe, ts, open, high, low, close, volume) "
+                              "VALUES(?,?,?,?,?,?,?,?)",
+                              storage._df_to_rows(df, symbol, tf))
+        writes = [f"SQLite {w_sql:.2f}s"]
+        _, secs = _timed(segment_store(root / "ohlcv_segments").write_frame, "ohlcv", symbol, tf, df)
+        writes.append(f"segments {secs:.2f}s")
+        if "parquet" in backends:
+            _, secs = _timed(parquet_store(root / "ohlcv_parquet").write_frame, "ohlcv", symbol, tf, df)
+            writes.append(f"Parquet {secs:.2f}s")
+        print(f"{len(df)} bars written: {', '.join(writes)}")
+        prev = os.environ.get("MYSTRIX_OHLCV_BACKEND")
+        try:
+            out = {}
+            for backend in backends:
+                os.environ["MYSTRIX_OHLCV_BACKEND"] = backend
+                for compact in (False, True):
+                    storage.get_ohlcv(symbol, tf, start, end, cache_root=root, compact=compact)  # warm
+                    out[backend, compact], secs = _timed(storage.get_ohlcv, symbol, tf, start, end,
+                                                         cache_root=root, compact=compact)
+                    print(f"  {backend:8s} get_ohlcv{' compact' if compact else ''}: "
+                          f"{len(out[backend, compact])} bars in {secs * 1000:.1f} ms")
+            os.environ["MYSTRIX_OHLCV_BACKEND"] = "segments"
+            ref = storage.get_ohlcv(symbol, tf, start, end, cache_root=root, shared=True)
+        finally:
+            if prev is None:
+                os.environ.pop("MYSTRIX_OHLCV_BACKEND", None)
+            else:
+                os.environ["MYSTRIX_OHLCV_BACKEND"] = prev
+        sq = out["sqlite", False]
+        for backend in backends[1:]:
+            got = out[backend, False]
+            if not (sq.index.equals(got.index) and np.array_equal(sq.to_numpy(), got.to_numpy())):
+                raise SystemExit(f"PARITY FAILED: {backend} bars differ from SQLite")
+            if not np.array_equal(out["sqlite", True].ts, out[backend, True].ts):
+                raise SystemExit(f"PARITY FAILED: {backend} compact clocks differ")
+        mapped = out["segments", False]
+        col = mapped["close"].values
+        zero_copy = isinstance(col, np.memmap) and np.shares_memory(mapped["close"].to_numpy(dtype=np.float64), col)
+        print(f"segments: engine input is a view of the mapped file: {zero_copy}; "
+              f"pickled to a worker: frame {len(pickle.dumps(sq, protocol=5)) / 2**20:.1f} MiB, "
+              f"SegmentRef {len(pickle.dumps(ref, protocol=5))} bytes")
+        sizes = [f"SQLite {(root / 'data_cache.db').stat().st_size / 2**20:.1f} MiB"]
+        for backend, sub in (("segments", "ohlcv_segments"), ("Parquet", "ohlcv_parquet")):
+            if (root / sub).is_dir():
+                total = sum(f.stat().st_size for f in (root / sub).rglob("*") if f.is_file())
+                sizes.append(f"{backend} {total / 2**20:.1f} MiB")
+        print(f"parity ok; on disk: {', '.join(sizes)}")
+
+
+def bench_bulk_upsert(args: argparse.Namespace) -> None:
+    import os
+    import sqlite3
+    import tempfile
+
+    from engine import storage
+
+    df = synthetic_bars(args.bars, seed=args.seed, freq="1min")
+    raw = df.rename(columns={"volume": "volume_base"}).assign(volume_quote=df["volume"] * df["close"], is_closed=1.0)
+    n_ref = min(len(df), args.reference_bars)
+    sql = ("INSERT OR REPLACE INTO ohlcv(symbol, timeframe, ts, open, high, low, close, volume) "
+           "VALUES(?,?,?,?,?,?,?,?)")
+
+    def _iterrows(frame):
+        # the previous per-row construction, for reference
+        for ts, row in frame.iterrows():
+            yield ("BENCH/USDT", "1m", int(pd.Timestamp(ts).timestamp() * 1000), float(row["open"]), float(row["high"]),
+                   float(row["low"]), float(row["close"]), float(row.get("volume", 0.0)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        with storage._conn(root) as con:
+            _, r_s = _timed(con.executemany, sql, _iterrows(df.iloc[:n_ref]))
+            ref = con.execute("SELECT * FROM ohlcv ORDER BY ts").fetchall()
+            con.execute("DELETE FROM ohlcv")
+        print(f"ohlcv, iterrows rows: {n_ref} bars in {r_s:.2f}s ({n_ref / r_s:,.0f} rows/s)")
+        with storage._conn(root) as con:
+            _, v_s = _timed(storage._executemany_chunked, con, sql, storage._df_to_rows(df, "BENCH/USDT", "1m"))
+        print(f"ohlcv, column rows + chunked executemany: {len(df)} bars in {v_s:.2f}s ({len(df) / v_s:,.0f} rows/s)")
+        with storage._conn(root, readonly=True) as con:
+            got = con.execute("SELECT * FROM ohlcv WHERE ts <= ? ORDER BY ts", (ref[-1][2],)).fetchall()
+        if got != ref:
+            raise SystemExit("PARITY FAILED: vectorized rows differ from the iterrows rows")
+        prev = os.environ.get("MYSTRIX_DB_PATH")
+        os.environ["MYSTRIX_DB_PATH"] = str(root / "data_cache.db")
+        try:
+            _, u_s = _timed(storage.upsert_ohlcv, raw, "BENCH/USDT", "1m")
+        finally:
+            if prev is None:
+                os.environ.pop("MYSTRIX_DB_PATH", None)
+            else:
+                os.environ["MYSTRIX_DB_PATH"] = prev
+        con = sqlite3.connect(root / "data_cache.db")
+        stored = con.execute("SELECT COUNT(*), MIN(is_closed), COUNT(DISTINCT ingested_at) FROM raw_ohlcv").fetchone()
+        con.close()
+        print(f"raw_ohlcv, upsert_ohlcv: {len(raw)} bars in {u_s:.2f}s ({len(raw) / u_s:,.0f} rows/s); "
+              f"stored {stored[0]}, is_closed min {stored[1]}, ingested_at values {stored[2]}")
+        if stored[0] != len(raw):
+            raise SystemExit("UPSERT FAILED: row count differs")
+    print("parity ok")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Engine benchmarks on synthetic bars")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("pine-kernel", help="PineLongEngine kernel vs reference loop")
+    p.add_argument("--bars", type=int, default=500_000)
+    p.add_argument("--seed", type=int, default=7)
+    p.add_argument("--gate", action="store_true", help="enable the 30m HTF gate")
+    p.add_argument("--reference-bars", type=int, default=50_000,
+                   help="bars used for the (slow) reference loop and parity check; 0 = all")
+    p.add_argument("--skip-reference", action="store_true")
+    p.set_defaults(func=bench_pine_kernel)
+
+    p = sub.add_parser("hedge-kernel", help="backtest_hedged kernel vs reference loop")
+    p.add_argument("--bars", type=int, default=500_000)
+    p.add_argument("--seed", type=int, default=7)
+    p.add_argument("--reference-bars", type=int, default=50_000,
+                   help="bars used for the (slow) reference loop and parity check; 0 = all")
+    p.add_argument("--skip-reference", action="store_true")
+    p.set_defaults(func=bench_hedge_kernel)
+
+    p = sub.add_parser("divergence-stream", help="DivergenceStream per-bar updates vs batch divergences")
+    p.add_argument("--bars", type=int, default=100_000)
+    p.add_argument("--seed", type=int, default=7)
+    p.set_defaults(func=bench_divergence_stream)
+
+    p = sub.add_parser("pivots", help="pivot_masks vs rolling pivot_low/pivot_high")
+    p.add_argument("--bars", type=int, default=1_000_000)
+    p.add_argument("--seed", type=int, default=7)
+    p.set_defaults(func=bench_pivots)
+
+    p = sub.add_parser("divergences", help="fused divergences() vs the pandas bull/bear implementation")
+    p.add_argument("--bars", type=int, default=1_000_000)
+    p.add_argument("--seed", type=int, default=7)
+    p.set_defaults(func=bench_divergences)
+
+    p = sub.add_parser("incremental-indicators", help="IndicatorSet updates and restore vs batch indicators")
+    p.add_argument("--bars", type=int, default=50_000)
+    p.add_argument("--seed", type=int, default=7)
+    p.set_defaults(func=bench_incremental_indicators)
+
+    p = sub.add_parser("remix-bot", help="RemixBot.run_backtest on synthetic 3m history")
+    p.add_argument("--days", type=int, default=365)
+    p.add_argument("--symbols", type=int, default=3)
+    p.add_argument("--seed", type=int, default=7)
+    p.set_defaults(func=bench_remix_bot)
+
+    p = sub.add_parser("sweep", help="PineLongEngine parameter sweep (1152 combos)")
+    p.add_argument("--bars", type=int, default=100_000)
+    p.add_argument("--seed", type=int, default=7)
+    p.add_argument("--workers", type=int, default=None)
+    p.set_defaults(func=bench_sweep)
+
+    p = sub.add_parser("indicator-cache", help="repeat long/short/hedge runs through the indicator cache")
+    p.add_argument("--bars", type=int, default=200_000)
+    p.add_argument("--seed", type=int, default=7)
+    p.set_defaults(func=bench_indicator_cache)
+
+    p = sub.add_parser("walk-forward", help="walk-forward optimization of the long engine (48 combos)")
+    p.add_argument("--bars", type=int, default=100_000)
+    p.add_argument("--seed", type=int, default=7)
+    p.add_argument("--folds", type=int, default=6)
+    p.add_argument("--workers", type=int, default=None)
+    p.set_defaults(func=bench_walk_forward)
+
+    p = sub.add_parser("monte-carlo", help="trade-resampling Monte Carlo on synthetic trade returns")
+    p.add_argument("--trades", type=int, default=1000)
+    p.add_argument("--paths", type=int, default=10_000)
+    p.add_argument("--seed", type=int, default=7)
+    p.set_defaults(func=bench_monte_carlo)
+
+    p = sub.add_parser("compact-ohlcv", help="float32 CompactOHLCV memory, round-trip precision and backtest drift")
+    p.add_argument("--bars", type=int, default=1_000_000)
+    p.add_argument("--seed", type=int, default=7)
+    p.add_argument("--backtest-bars", type=int, default=100_000)
+    p.set_defaults(func=bench_compact_ohlcv)
+
+    p = sub.add_parser("trade-log", help="TradeLog vectorized JSON vs dicts + json.dumps")
+    p.add_argument("--bars", type=int, default=500_000)
+    p.add_argument("--seed", type=int, default=7)
+    p.set_defaults(func=bench_trade_log)
+
+    p = sub.add_parser("mtm-equity", help="per-bar mark-to-market equity vs realized equity at exits")
+    p.add_argument("--bars", type=int, default=500_000)
+    p.add_argument("--seed", type=int, default=7)
+    p.add_argument("--points", type=int, default=1000)
+    p.set_defaults(func=bench_mtm_equity)
+
+    p = sub.add_parser("ohlcv-store", help="get_ohlcv range reads from SQLite vs the segment and Parquet stores")
+    p.add_argument("--bars", type=int, default=1_000_000)
+    p.add_argument("--seed", type=int, default=7)
+    p.set_defaults(func=bench_ohlcv_store)
+
+    p = sub.add_parser("bulk-upsert", help="ohlcv/raw_ohlcv insert rows per second, vectorized vs iterrows")
+    p.add_argument("--bars", type=int, default=1_000_000)
+    p.add_argument("--seed", type=int, default=7)
+    p.add_argument("--reference-bars", type=int, default=100_000,
+                   help="bars inserted the old row-by-row way for comparison")
+    p.set_defaults(func=bench_bulk_upsert)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
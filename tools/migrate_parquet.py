@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Copy cached OHLCV bars from data_cache.db into the Parquet (or segment) store.
+
+Usage:
+  python tools/migrate_parquet.py
+  python tools/migrate_parquet.py --db /path/to/data_cache.db --root /path/to/ohlcv_parquet
+  python tools/migrate_parquet.py --tables ohlcv --symbols BTC/USDT ETH/USDT
+  python tools/migrate_parquet.py --to segments
+
+Reads the `ohlcv` and `raw_ohlcv` tables series by series and writes them
+with engine.columnar, or engine.segments for --to segments (existing bars
+with the same ts are replaced, so the copy can be re-run). SQLite is left
+untouched. Afterwards start the server with MYSTRIX_OHLCV_BACKEND=parquet
+or =segments (and MYSTRIX_PARQUET_ROOT / MYSTRIX_SEGMENT_ROOT when --root
+is not the default).
+"""
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.append(str(PROJECT_ROOT))
+
+import numpy as np
+
+from engine.columnar import COLUMNS, parquet_store
+from engine.segments import segment_store
+from engine.storage import resolve_db_path
+
+# column holding the timeframe in each SQLite table
+TF_COLUMN = {"ohlcv": "timeframe", "raw_ohlcv": "tf"}
+# --to: (store factory, default directory next to the DB)
+TARGETS = {"parquet": (parquet_store, "ohlcv_parquet"), "segments": (segment_store, "ohlcv_segments")}
+
+
+def migrate_series(con: sqlite3.Connection, store, table: str, symbol: str, timeframe: str,
+                   chunk: int = 500_000) -> int:
+    cols = COLUMNS[table]
+    cur = con.execute(
+        f"SELECT ts, {', '.join(cols)} FROM {table} WHERE symbol=? AND {TF_COLUMN[table]}=? ORDER BY ts ASC",
+        (symbol, timeframe),
+    )
+    total = 0
+    while True:
+        rows = cur.fetchmany(chunk)
+        if not rows:
+            return total
+        ts = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        # NULLs (older raw_ohlcv rows) become NaN
+        vals = np.array([r[1:] for r in rows], dtype=np.float64)
+        total += store.write(table, symbol, timeframe, ts, {c: vals[:, i] for i, c in enumerate(cols)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy OHLCV bars from SQLite into the Parquet or segment store")
+    parser.add_argument("--to", choices=sorted(TARGETS), default="parquet")
+    parser.add_argument("--db", type=Path, default=None, help="SQLite file (default: the server's data_cache.db)")
+    parser.add_argument("--root", type=Path, default=None, help="store root (default: ohlcv_parquet/ or ohlcv_segments/ next to the DB)")
+    parser.add_argument("--tables", nargs="+", choices=sorted(COLUMNS), default=sorted(COLUMNS))
+    parser.add_argument("--symbols", nargs="+", default=None, help="only these symbols (default: all)")
+    args = parser.parse_args()
+
+    db = args.db or Path(resolve_db_path())
+    if not db.exists():
+        raise SystemExit(f"no database at {db}")
+    factory, default = TARGETS[args.to]
+    store = factory(args.root or db.parent / default)
+    con = sqlite3.connect(f"file:{db}?mode=ro", uri=True)
+    try:
+        for table in args.tables:
+            try:
+                series = con.execute(f"SELECT DISTINCT symbol, {TF_COLUMN[table]} FROM {table}").fetchall()
+            except sqlite3.OperationalError:
+                print(f"{table}: no such table, skipped")
+                continue
+            for symbol, timeframe in sorted(series):
+                if args.symbols and symbol not in args.symbols:
+                    continue
+                t0 = time.perf_counter()
+                n = migrate_series(con, store, table, symbol, timeframe)
+                print(f"{table} {symbol} {timeframe}: {n} bars in {time.perf_counter() - t0:.2f}s")
+    finally:
+        con.close()
+    print(f"done: {store.root}")
+
+
+if __name__ == "__main__":
+    main()